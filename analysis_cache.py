@@ -0,0 +1,210 @@
+"""
+가사 분석 결과(LLM 응답을 파싱한 dict)를 SQLite에 저장해 두고 다시 쓰는 캐시입니다.
+
+- 키: sha256(정규화된 가사 + 프롬프트 버전 + 모델)
+  → 프롬프트를 고치면 PROMPT_VERSION만 올리면 예전 결과와 섞이지 않아요.
+- 정리(eviction): 너무 오래된 항목(MAX_AGE_DAYS)을 지우고,
+  개수(MAX_ENTRIES)나 전체 크기(MAX_BYTES)를 넘으면 오래 안 쓴 것부터 지웁니다.
+- single-flight: 여러 세션이 "같은 가사"를 동시에 분석하면, 한 세션만 실제로 요청하고
+  나머지는 그 결과를 기다렸다가 같이 받습니다. (같은 프로세스 안에서, 스레드/asyncio 모두)
+- 저장 위치: 분석 결과는 사용자와 상관없으니 사용자별 DB가 아니라 공용 DB 파일
+  (db_manager.shared_db_path()) 하나에 둡니다. 그래야 다른 사용자가 같은 노래를 분석해도 캐시가 맞아요.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+
+import db_manager
+
+MAX_ENTRIES = int(os.environ.get("VOCA_ANALYSIS_CACHE_MAX_ENTRIES", "2000"))
+MAX_BYTES = int(os.environ.get("VOCA_ANALYSIS_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+MAX_AGE_DAYS = float(os.environ.get("VOCA_ANALYSIS_CACHE_MAX_AGE_DAYS", "90"))
+
+# 캐시를 읽을 때마다 last_used_at을 쓰면 읽기가 쓰기로 바뀌므로, 이 시간(초)이 지났을 때만 갱신합니다.
+TOUCH_INTERVAL = 3600
+
+
+def normalize_lyrics(lyrics: str) -> str:
+    """
+    캐시 키용으로 가사를 정규화합니다.
+    (전각/반각 통일, 줄마다 앞뒤·중복 공백 정리, 빈 줄 제거)
+    """
+    text = unicodedata.normalize("NFKC", lyrics or "")
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def make_key(lyrics: str, model: str, prompt_version: str) -> str:
+    payload = "\x1f".join((prompt_version, model, normalize_lyrics(lyrics)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(cache_key: str, now=None):
+    """캐시에서 결과를 꺼냅니다. 없거나 너무 오래됐으면 None."""
+    now = time.time() if now is None else now
+    with db_manager.connection(db_manager.shared_db_path()) as conn:
+        row = conn.execute(
+            "SELECT result_json, created_at, last_used_at FROM analysis_cache WHERE cache_key = ?",
+            (cache_key,),
+        ).fetchone()
+    if not row:
+        return None
+    if now - row["created_at"] > MAX_AGE_DAYS * 86400:
+        return None
+
+    if now - row["last_used_at"] > TOUCH_INTERVAL:
+        with db_manager.transaction(invalidate=False, db_path=db_manager.shared_db_path()) as conn:
+            conn.execute(
+                "UPDATE analysis_cache SET last_used_at = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, cache_key),
+            )
+    return json.loads(row["result_json"])
+
+
+def put(cache_key: str, model: str, prompt_version: str, result, now=None) -> None:
+    """결과를 캐시에 저장(업서트)하고, 한도를 넘으면 정리합니다."""
+    now = time.time() if now is None else now
+    result_json = json.dumps(result, ensure_ascii=False)
+    with db_manager.transaction(invalidate=False, db_path=db_manager.shared_db_path()) as conn:
+        conn.execute(
+            """
+            INSERT INTO analysis_cache (
+              cache_key, model, prompt_version, result_json, size_bytes, created_at, last_used_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+              result_json = excluded.result_json,
+              size_bytes = excluded.size_bytes,
+              created_at = excluded.created_at,
+              last_used_at = excluded.last_used_at
+            """,
+            (cache_key, model, prompt_version, result_json, len(result_json.encode("utf-8")), now, now),
+        )
+        _evict(conn, now)
+
+
+def evict(now=None) -> int:
+    """한도(나이/개수/크기)를 넘는 항목을 지우고, 지운 개수를 돌려줍니다."""
+    now = time.time() if now is None else now
+    with db_manager.transaction(invalidate=False, db_path=db_manager.shared_db_path()) as conn:
+        return _evict(conn, now)
+
+
+def _evict(conn, now) -> int:
+    removed = conn.execute(
+        "DELETE FROM analysis_cache WHERE created_at < ?",
+        (now - MAX_AGE_DAYS * 86400,),
+    ).rowcount
+
+    count, total = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache"
+    ).fetchone()
+    if count <= MAX_ENTRIES and total <= MAX_BYTES:
+        return removed
+
+    # 오래 안 쓴 것부터 하나씩 빼면서 한도 안으로 들어올 때까지 지웁니다.
+    victims = []
+    for cache_key, size in conn.execute(
+        "SELECT cache_key, size_bytes FROM analysis_cache ORDER BY last_used_at ASC"
+    ):
+        if count <= MAX_ENTRIES and total <= MAX_BYTES:
+            break
+        victims.append((cache_key,))
+        count -= 1
+        total -= size
+    conn.executemany("DELETE FROM analysis_cache WHERE cache_key = ?", victims)
+    return removed + len(victims)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _join(cache_key):
+    """(진행 중인 호출, 내가 맡았는지)를 돌려줍니다. 처음 온 쪽이 계산을 맡아요."""
+    with _inflight_lock:
+        call = _inflight.get(cache_key)
+        leader = call is None
+        if leader:
+            call = _inflight[cache_key] = _InFlight()
+    return call, leader
+
+
+def _leave(cache_key, call):
+    with _inflight_lock:
+        _inflight.pop(cache_key, None)
+    call.done.set()
+
+
+def get_or_compute(lyrics: str, model: str, prompt_version: str, compute):
+    """
+    캐시에 있으면 바로 돌려주고, 없으면 compute()를 불러 결과를 저장합니다.
+
+    반환값: (result, source)
+    - source == "cache": DB 캐시에서 꺼냄
+    - source == "shared": 다른 세션이 같은 가사를 분석 중이라 그 결과를 같이 받음
+    - source == "fresh": 이번에 직접 compute()를 실행함
+    compute()가 None을 돌려주면(파싱 실패 등) 캐시에 저장하지 않습니다.
+    """
+    cache_key = make_key(lyrics, model, prompt_version)
+    cached = get(cache_key)
+    if cached is not None:
+        return cached, "cache"
+
+    call, leader = _join(cache_key)
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, "shared"
+
+    try:
+        call.result = compute()
+        if call.result is not None:
+            put(cache_key, model, prompt_version, call.result)
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        _leave(cache_key, call)
+    return call.result, "fresh"
+
+
+async def get_or_compute_async(lyrics: str, model: str, prompt_version: str, compute):
+    """
+    get_or_compute의 asyncio 버전입니다. compute는 코루틴 함수(async def)예요.
+    DB는 스레드에서 읽고 쓰고, 같은 _inflight를 쓰니까 스레드 쪽 get_or_compute와도 한 번만 요청합니다.
+    """
+    cache_key = make_key(lyrics, model, prompt_version)
+    cached = await asyncio.to_thread(get, cache_key)
+    if cached is not None:
+        return cached, "cache"
+
+    call, leader = _join(cache_key)
+    if not leader:
+        await asyncio.to_thread(call.done.wait)
+        if call.error is not None:
+            raise call.error
+        return call.result, "shared"
+
+    try:
+        call.result = await compute()
+        if call.result is not None:
+            await asyncio.to_thread(put, cache_key, model, prompt_version, call.result)
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        _leave(cache_key, call)
+    return call.result, "fresh"
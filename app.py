@@ -1,118 +1,135 @@
 import streamlit as st
-import openai
-import json
 import db_manager
+import diary_io
+import functools
+import hashlib
+import lyrics_analyzer
+import lyrics_prep
+import note_store
+import playlist_analyzer
+import query_cache
+import re
+import srs
+import sticker_cards
+import time
+import tracing
+import uuid
+import write_behind
+from contextlib import ExitStack
 from datetime import datetime, timedelta
-from streamlit_calendar import calendar
+from pathlib import Path
 
 # --- 1. 페이지 설정 & 다꾸 스타일 CSS ---
 st.set_page_config(page_title="My Music Diary", layout="wide")
 
-st.markdown("""
-<link href="https://fonts.googleapis.com/css2?family=Gamja+Flower&display=swap" rel="stylesheet">
-<style>
-    /* 폰트 강제 적용 */
-    html, body, [class*="css"], p, div, h1, h2, h3, button, input, textarea {
-        font-family: 'Gamja Flower', cursive !important;
-        font-size: 22px !important;
-    }
-
-    .stApp {
-        background-color: #f9f7f1;
-    }
-
-    /* 버튼 */
-    .stButton>button {
-        background-color: #ff8e8e;
-        color: white;
-        border-radius: 15px 5px 20px 5px;
-        border: 2px dashed #fff;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.1);
-        transition: transform 0.1s;
-    }
-    .stButton>button:hover {
-        background-color: #ff7676;
-        transform: scale(1.02);
-    }
-
-    /* 다이어리 내지 */
-    .diary-paper {
-        background-color: #fff;
-        background-image: linear-gradient(#e5e5e5 1px, transparent 1px);
-        background-size: 100% 40px;
-        line-height: 40px;
-        padding: 40px 40px 60px 50px;
-        margin-top: 20px;
-        border-radius: 5px;
-        box-shadow: 5px 5px 15px rgba(0,0,0,0.1);
-        /* 노트 크기 키우기 */
-        min-height: 780px;
-        position: relative;
-        color: #555;
-    }
-    .diary-paper::before {
-        content: "";
-        position: absolute;
-        left: 20px;
-        top: 0;
-        bottom: 0;
-        width: 2px;
-        border-left: 2px dashed #ccc;
-    }
-
-    /* 스티커 카드 */
-    .sticker-card {
-        background-color: white;
-        padding: 15px;
-        margin: 15px 0;
-        border: 1px solid #eee;
-        box-shadow: 3px 3px 8px rgba(0,0,0,0.15);
-        position: relative;
-        transition: transform 0.2s;
-        text-align: center;
-    }
-    .sticker-card, .sticker-card * {
-        font-family: 'Gamja Flower', cursive !important;
-    }
-    .sticker-card::before {
-        content: "";
-        position: absolute;
-        top: -12px;
-        left: 50%;
-        transform: translateX(-50%);
-        width: 60px;
-        height: 25px;
-        background-color: rgba(255, 213, 79, 0.7);
-        transform: translateX(-50%) rotate(-2deg);
-        box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-    }
-    div[data-testid="column"]:nth-of-type(1) .sticker-card { transform: rotate(-1deg); }
-    div[data-testid="column"]:nth-of-type(2) .sticker-card { transform: rotate(1deg); }
-    div[data-testid="column"]:nth-of-type(3) .sticker-card { transform: rotate(-2deg); }
-    .sticker-card:hover {
-        transform: scale(1.05) rotate(0deg) !important;
-        z-index: 99;
-    }
-
-    .fc-event { border: none !important; background: none !important; cursor: pointer; }
-    .fc-event-title { font-size: 1.5em !important; }
-
-    /* 캘린더 전체 크기 살짝 줄이기 */
-    .fc { font-size: 0.85em; }
-</style>
-""", unsafe_allow_html=True)
+# 성능 추적: 사이드바 "🔬 성능 추적"을 켜면 이번 rerun에서 걸린 시간을 span 나무로 기록합니다.
+# (st.rerun()으로 중간에 끊긴 rerun은 기록이 남지 않아요)
+tracing.reset()
+_trace = tracing.start("rerun") if st.session_state.get("trace_enabled", tracing.ENABLED_BY_DEFAULT) else None
+
+ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+
+
+@st.cache_resource(show_spinner=False)
+def _load_css(name):
+    """
+    assets/의 CSS 파일을 프로세스당 한 번만 읽고 주석/공백을 줄여 둡니다.
+    (rerun마다 파일을 다시 읽거나 긴 문자열을 새로 만들지 않아요)
+    """
+    css = (ASSETS_DIR / name).read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css).strip()
+    return f"<style>{css}</style>"
+
+
+def _inject_css(name):
+    # style 태그만 있는 st.html은 본문 자리를 차지하지 않는 이벤트 영역으로 갑니다.
+    # Streamlit은 이번 rerun에 그리지 않은 요소를 지우기 때문에, 붙이는 것 자체는 매번 해야 해요.
+    st.html(_load_css(name))
+
+
+_inject_css("app.css")
+
+def _auth_configured() -> bool:
+    """.streamlit/secrets.toml에 [auth](st.login 설정)가 있는지"""
+    try:
+        return "auth" in st.secrets
+    except Exception:
+        # secrets.toml이 아예 없으면 읽을 때 예외가 나요.
+        return False
+
+
+def _tenant_for(user) -> str:
+    """로그인한 사람(OIDC sub, 없으면 이메일) → DB 파일 이름. 이메일이 파일 이름에 드러나지 않게 해시해 둡니다."""
+    identity = f"{user.get('iss', '')}|{user.get('sub') or user.get('email')}"
+    return "u_" + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def _current_tenant():
+    """
+    이번 세션의 다이어리 주인(DB 파일 이름)을 정합니다. (사이드바 안에서 불러요)
+
+    - st.login이 설정돼 있으면 로그인한 사람으로만 정해요. 다른 사람 이름을 고를 방법이 없습니다.
+    - 설정이 없으면 예전처럼 이름을 직접 적어요. (?user=이름 이 기본값)
+      이건 파일을 나누는 것일 뿐 접근 제어가 아니에요. 이름을 아는(짐작한) 사람은 누구나
+      그 다이어리를 열고 고치고 내보낼 수 있으니, 혼자 쓰거나 믿는 사람끼리만 쓰세요.
+    """
+    if _auth_configured():
+        if not st.user.get("is_logged_in"):
+            st.button("로그인 🔐", on_click=st.login)
+            return ""
+        st.caption(f"👤 {st.user.get('name') or st.user.get('email') or '로그인됨'}")
+        st.button("로그아웃", on_click=st.logout)
+        return _tenant_for(st.user)
+    st.caption("⚠️ 로그인이 설정되지 않아 이름만으로 다이어리를 골라요. 이름을 아는 사람은 누구나 열 수 있어요.")
+    return st.text_input(
+        "다이어리 주인 👤", key="tenant", value=st.query_params.get("user", ""),
+        help="영문/숫자/_/-만 쓸 수 있어요. 사람마다 다른 DB 파일에 저장돼요. (비밀번호가 아니에요)",
+    ).strip()
+
 
 # --- 2. 사이드바 ---
 with st.sidebar:
     st.title("📒 My Music Diary")
     api_key = st.text_input("API Key 입력 🔑", type="password")
+    # 사용자별 DB(VOCA_TENANT_DIR)를 쓰면 다이어리 주인을 정합니다. (_current_tenant 참고)
+    tenant = _current_tenant() if db_manager.TENANT_DIR else None
     st.write("")
     # 라디오 버튼의 "표시 텍스트"와 아래 if/elif 비교 문자열이 100% 동일해야 화면이 정상적으로 갈립니다.
     # (띄어쓰기/괄호 하나만 달라도 조건이 매칭되지 않아서 아무 화면도 안 뜰 수 있어요.)
-    menu = st.radio("오늘의 할 일", ["🎵 노래 듣고 줍줍", "📅 다꾸 기록장"])
+    menu = st.radio("오늘의 할 일", ["🎵 노래 듣고 줍줍", "🎶 플레이리스트 줍줍", "📅 다꾸 기록장", "🔁 오늘의 복습"])
     st.markdown("---")
 
-db_manager.init_db()
+# 이번 rerun의 DB 함수는 모두 이 사용자의 DB 파일을 씁니다. (세션 스레드의 contextvar)
+if db_manager.TENANT_DIR and not tenant:
+    st.info("👈 사이드바에서 로그인해 주세요." if _auth_configured() else "👈 사이드바에 다이어리 주인 이름을 적어 주세요.")
+    st.stop()
+try:
+    db_manager.set_tenant(tenant)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+# DB 구조 맞추기: 파일(사용자)마다 프로세스당 한 번만 실제로 확인하고, 그 뒤 rerun에서는 바로 넘어갑니다.
+_applied_migrations = db_manager.init_db()
+if _applied_migrations:
+    st.toast("DB를 최신 구조로 업데이트했어요: " + ", ".join(name for _, name in _applied_migrations))
+
+# write-behind(VOCA_WRITE_BEHIND=1)가 켜져 있으면 쓰기는 뒤에서 모아서 저장합니다.
+# 이 세션이 지난 rerun에 넣은 쓰기가 다 저장된 뒤에 읽기 시작해요. (방금 지운 스티커가 다시 보이지 않게)
+_session_id = st.session_state.setdefault("_session_id", uuid.uuid4().hex)
+if write_behind.ENABLED:
+    write_behind.barrier(_session_id)
+
+def _db_write(func, *args, wait=False, **kwargs):
+    """
+    DB 쓰기 함수를 부릅니다. write-behind가 꺼져 있으면 바로 부르고,
+    켜져 있으면 큐에 넣어요. wait=True면 저장이 끝날 때까지 기다려서 결과를 돌려줍니다.
+    """
+    if not write_behind.ENABLED:
+        return func(*args, **kwargs)
+    future = write_behind.submit(func, *args, session=_session_id, **kwargs)
+    return future.result() if wait else None
 
 # --- 2.5 상단 큰 타이틀(처음 접속/어느 메뉴든 공통으로 보이게) ---
 st.markdown(
@@ -132,18 +149,101 @@ st.markdown(
 if 'analyzed_data' not in st.session_state:
     st.session_state['analyzed_data'] = None
 
-# JSON 파싱
-def parse_json_garbage(text):
-    try:
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1]
-        return json.loads(text.strip())
-    except Exception as e:
-        return None
+# 플레이리스트 분석 결과(곡별 스티커 묶음)를 검토하는 대기열
+if 'playlist_queue' not in st.session_state:
+    st.session_state['playlist_queue'] = []
+
+def _save_stickers(items_with_song):
+    """
+    여러 스티커를 한 번에 저장합니다. (DB 커밋 1번)
+    items_with_song: [(item, song_title, artist), ...]
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    rows = [
+        {**item, "date": today, "song_title": song_title, "artist": artist}
+        for item, song_title, artist in items_with_song
+    ]
+    # 몇 개가 새로 붙었는지 알려 줘야 해서 저장이 끝날 때까지 기다립니다.
+    statuses = _db_write(db_manager.add_words, rows, wait=True)
+    inserted = statuses.count("inserted")
+    ignored = statuses.count("ignored")
+    if ignored:
+        st.toast(f"{inserted}개 붙이기 완료! 📒 ({ignored}개는 오늘 이미 붙인 단어예요)")
+    else:
+        st.toast(f"{inserted}개 붙이기 완료! 📒")
+
+def _keyset_page(state_key, fetch, scope=None):
+    """
+    지금 페이지의 단어만 DB에서 가져옵니다. (keyset 커서 방식)
+
+    fetch(cursor) -> (rows, next_cursor)
+    session_state[state_key]에 "지금까지 지나온 페이지의 시작 커서"를 쌓아 두고,
+    이전/다음 버튼은 이 스택만 바꿉니다. (이전 페이지 데이터는 들고 있지 않아요)
+
+    scope: 무엇을 보고 있는지 (검색어, 날짜 등). state_key는 고정으로 두고, scope가 바뀌면
+    첫 페이지로 돌아갑니다. (검색어마다 키를 만들면 session_state에 키가 계속 쌓여요)
+    """
+    scope_key = f"{state_key}_scope"
+    if st.session_state.get(scope_key) != scope:
+        st.session_state[scope_key] = scope
+        st.session_state[state_key] = [None]
+    stack = st.session_state.setdefault(state_key, [None])
+    rows, next_cursor = fetch(stack[-1])
+    # 삭제 등으로 지금 페이지가 비었으면 앞 페이지로 돌아갑니다.
+    while not rows and len(stack) > 1:
+        stack.pop()
+        rows, next_cursor = fetch(stack[-1])
+    return rows, next_cursor, stack
+
+
+def _pager_controls(state_key, stack, next_cursor, total=None):
+    if len(stack) == 1 and next_cursor is None:
+        return
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("◀ 이전", key=f"{state_key}_prev", disabled=len(stack) == 1):
+            stack.pop()
+            st.rerun()
+    with col_info:
+        total_text = f" (총 {total}개)" if total is not None else ""
+        st.caption(f"{len(stack)} 페이지{total_text}")
+    with col_next:
+        if st.button("다음 ▶", key=f"{state_key}_next", disabled=next_cursor is None):
+            stack.append(next_cursor)
+            st.rerun()
+
+def _render_cards(items, variant="study", columns=3, target=st):
+    """스티커 카드 묶음을 그리고, 추적이 켜져 있으면 걸린 시간을 "render.cards"로 남깁니다."""
+    with tracing.span("render.cards", variant=variant, cards=len(items)):
+        target.markdown(sticker_cards.render_cards(items, variant, columns), unsafe_allow_html=True)
+
+def _save_note(tenant, date_str, content):
+    # 자동 저장 타이머 스레드에서 불립니다. (세션의 contextvar가 없으니 사용자를 직접 정해요)
+    # write-behind가 켜져 있으면 그 큐를 거쳐서 다른 쓰기와 같이 커밋하고,
+    # 실패하면 자동 저장기가 다시 시도하도록 예외를 그대로 올려요.
+    # 메모는 다시 만들 수 없는 글이라 디스크에 닿을 때까지(durable) 기다립니다.
+    with db_manager.use_tenant(tenant):
+        if write_behind.ENABLED:
+            return write_behind.submit(db_manager.save_diary_text, date_str, content, durable=True).result()
+        with db_manager.transaction(durable=True):
+            return db_manager.save_diary_text(date_str, content)
+
+@st.cache_resource(show_spinner=False)
+def _note_autosaver(tenant):
+    # 사용자마다 하나만 둡니다. (세션마다 만들면 같은 날짜 메모를 서로 다른 타이머가 저장해요)
+    return note_store.Autosaver(functools.partial(_save_note, tenant))
+
+def _submit_memo(date_str, key):
+    # 메모 칸 on_change: 바로 저장하지 않고 자동 저장기에 넘겨서, 잠깐 멈췄을 때 한 번만 씁니다.
+    _note_autosaver(tenant).submit(date_str, st.session_state[key])
+
+def _format_version(v):
+    saved = time.strftime("%m-%d %H:%M", time.localtime(v["saved_at"])) if v["saved_at"] else "예전 기록"
+    return f"v{v['version']} · {saved} · {v['chars']}자 · {v['preview'] or '(빈 메모)'}"
 
 # --- 3. 메인 기능 ---
+_page_span = ExitStack()
+_page_span.enter_context(tracing.span("page", menu=menu))
 
 # [메뉴 1] 가사 학습
 if menu == "🎵 노래 듣고 줍줍":
@@ -156,176 +256,319 @@ if menu == "🎵 노래 듣고 줍줍":
         artist = st.text_input("가수 이름", placeholder="예) 米津玄師")
         lyrics = st.text_area("가사 입력", height=300, placeholder="가사를 여기에 쏙 넣어주세요...", label_visibility="collapsed")
         analyze_btn = st.button("✨ 스티커 만들기 (분석)")
+        stream_mode = st.toggle("⚡ 받는 대로 바로 보여주기 (스트리밍)", value=True, key="stream_mode")
 
     if analyze_btn and lyrics:
         if not api_key:
             st.warning("API Key가 필요해요!")
         else:
-            client = openai.OpenAI(api_key=api_key)
+            # 스트리밍 모드: 번역/스티커가 도착하는 대로 아래 자리(placeholder)에 바로 그려 줍니다.
+            with col2:
+                stream_translation = st.empty()
+            stream_header = st.empty()
+            stream_cards = st.empty()
+            streamed = {"translation": "", "vocab": [], "painted_at": 0.0}
+
+            def _paint_translation(force=False):
+                # 글자마다 다시 그리면 화면 갱신이 너무 많아서, 0.1초에 한 번만 그립니다.
+                now = time.monotonic()
+                if streamed["translation"] and (force or now - streamed["painted_at"] >= 0.1):
+                    streamed["painted_at"] = now
+                    stream_translation.success(streamed["translation"] + " ▌")
+
+            def _on_stream_event(kind, value):
+                if kind == "translation":
+                    streamed["translation"] = value
+                    _paint_translation()
+                elif kind == "vocab":
+                    streamed["vocab"].append(value)
+                    _paint_translation(force=True)
+                    stream_header.subheader("✂️ 단어 스티커 (만드는 중...)")
+                    _render_cards(streamed["vocab"], target=stream_cards)
+
             with st.spinner("한국어 발음도 적는 중... ✍️"):
                 try:
-                    # 프롬프트 수정: pronunciation 필드 추가 요청
-                    prompt = f"""
-                    너는 친절한 일본어 튜터야. 사용자는 일본어를 전혀 읽지 못해.
-                    가사: {lyrics}
-                    
-                    JLPT N3~N1 수준의 단어 5개를 JSON으로 뽑아줘.
-                    중요: 'pronunciation' 필드에 반드시 한국어 발음을 적어줘 (예: 아이시테루).
-                    그리고 각 단어마다, 위 가사에서 그 단어가 실제로 등장하는 '예문(가사 한 줄/한 문장)'을 1개 골라서
-                    예문도 함께 JSON에 넣어줘.
-                    예문은 아래 4가지를 모두 포함해야 해:
-                    - example: 일본어 예문(가사 원문 그대로)
-                    - example_reading: 예문 후리가나(요미가나)
-                    - example_pronunciation: 예문 한국어 발음
-                    - example_meaning: 예문 한국어 뜻
-                    
-                    형식: 
-                    {{
-                        "translation": "전체 한국어 번역", 
-                        "vocab": [
-                            {{
-                                "word": "단어(한자)", 
-                                "reading": "요미가나", 
-                                "pronunciation": "한국어 발음",
-                                "meaning": "뜻", 
-                                "example": "예문(가사에서 발췌)",
-                                "example_reading": "예문 후리가나",
-                                "example_pronunciation": "예문 한국어 발음",
-                                "example_meaning": "예문 한국어 뜻"
-                            }}
-                        ]
-                    }}
-                    """
-                    response = client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[{"role": "user", "content": prompt}]
+                    # 같은 가사는 저장된 분석 결과를 재사용하고,
+                    # 다른 세션이 같은 가사를 분석 중이면 그 결과를 같이 받습니다.
+                    # 반복 후렴/번역 블록을 빼고 보냅니다. (얼마나 줄었는지 아래에 보여 줘요)
+                    prepared = lyrics_prep.prepare(lyrics)
+                    result, source = lyrics_analyzer.analyze_lyrics(
+                        api_key,
+                        lyrics,
+                        on_event=_on_stream_event if stream_mode else None,
+                        prepared=prepared,
                     )
-                    result = parse_json_garbage(response.choices[0].message.content)
                     if result:
                         st.session_state['analyzed_data'] = result
+                        st.session_state['analyzed_prep'] = prepared.metrics()
+                        if source != "fresh":
+                            st.toast("예전에 분석한 가사라서 바로 불러왔어요 ⚡")
                 except Exception as e:
                     st.error(f"오류: {e}")
+                finally:
+                    # 완성본은 아래에서 다시 그리므로, 스트리밍 중에 쓰던 자리는 비웁니다.
+                    stream_translation.empty()
+                    stream_header.empty()
+                    stream_cards.empty()
 
     if st.session_state['analyzed_data']:
         data = st.session_state['analyzed_data']
         with col2:
-            st.success(data['translation'])
+            st.success(data.get('translation', ''))
+            prep = st.session_state.get('analyzed_prep')
+            if prep and prep["saved_tokens"]:
+                st.caption(
+                    f"가사 정리: 토큰 약 {prep['raw_tokens']} → {prep['sent_tokens']} "
+                    f"({prep['saved_ratio']:.0%} 절약, 겹치는 줄 {prep['dropped_lines']}개 뺌"
+                    + (f", {prep['chunks']}조각으로 나눠 보냄)" if prep["chunks"] > 1 else ")")
+                )
         
         st.markdown("---")
         st.subheader("✂️ 단어 스티커")
         
         vocab_list = data.get('vocab', [])
-        cols = st.columns(3)
-        
-        for idx, item in enumerate(vocab_list):
-            with cols[idx % 3]:
-                # 한국어 발음(pronunciation) 추가 표시
-                pron = item.get('pronunciation', '')
-                
-                # HTML 들여쓰기 제거
-                card_html = f"""
-<div class="sticker-card">
-    <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>{item['word']}</b></div>
-    <div style="color: #555; font-size: 0.9em;">{item['reading']}</div>
-    <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[{pron}]</div>
-    <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>{item['meaning']}</b></div>
-    <div style="font-size: 0.85em; color: #888;">"{item['example']}"</div>
-</div>
-"""
-                st.markdown(card_html, unsafe_allow_html=True)
-                
-                if st.button("📌 붙이기", key=f"save_{idx}"):
-                    today = datetime.now().strftime("%Y-%m-%d")
-                    # 후리가나(reading) + 한국어 발음(pronunciation)까지 함께 저장
-                    reading = item.get('reading', '')
-                    ex_reading = item.get('example_reading', '')
-                    ex_pron = item.get('example_pronunciation', '')
-                    ex_mean = item.get('example_meaning', '')
-                    db_manager.add_word(
-                        today,
-                        item.get('word', ''),
-                        item.get('meaning', ''),
-                        item.get('example', ''),
-                        reading,
-                        pron,
-                        song_title,
-                        artist,
-                        ex_reading,
-                        ex_pron,
-                        ex_mean,
-                    )
-                    st.toast(f"'{item['word']}' 붙이기 완료! 📒")
+        # 카드 전체를 한 번에 그립니다. (카드마다 위젯/버튼을 만들지 않아요)
+        _render_cards(vocab_list)
+
+        # 여러 장을 골라서 한 번에 붙이기 (클릭/저장 1번)
+        if vocab_list:
+            labels = [f"{idx + 1}. {sticker_cards.card_label(item)}" for idx, item in enumerate(vocab_list)]
+            picked = st.multiselect("붙일 스티커 고르기", labels, default=labels, key="study_pick")
+            col_pick, col_all = st.columns(2)
+            with col_pick:
+                if st.button("📌 고른 스티커 붙이기", disabled=not picked):
+                    _save_stickers([
+                        (vocab_list[labels.index(label)], song_title, artist) for label in picked
+                    ])
+            with col_all:
+                if st.button("📌 전부 붙이기"):
+                    _save_stickers([(item, song_title, artist) for item in vocab_list])
+
+# [메뉴 1-2] 플레이리스트(여러 곡) 한꺼번에 분석
+elif menu == "🎶 플레이리스트 줍줍":
+    st.title("플레이리스트 한 번에 줍줍 🎶")
+    st.caption("곡마다 '# 제목 / 가수' 줄을 쓰고, 그 아래에 가사를 붙여 넣어 주세요. 여러 곡을 동시에 분석해요.")
+
+    playlist_text = st.text_area(
+        "플레이리스트 입력",
+        height=320,
+        placeholder="# Lemon / 米津玄師\n夢ならばどれほどよかったでしょう\n...\n\n# 打上花火 / DAOKO\nあれからずっと...",
+        label_visibility="collapsed",
+    )
+    concurrency = st.slider("동시에 분석할 곡 수", 1, 8, playlist_analyzer.MAX_CONCURRENCY)
+    playlist_btn = st.button("✨ 전부 스티커 만들기")
+
+    if playlist_btn:
+        songs = playlist_analyzer.parse_playlist_text(playlist_text)
+        if not songs:
+            st.warning("가사가 들어 있는 곡이 없어요. '# 제목 / 가수' 아래에 가사를 넣어 주세요.")
+        elif not api_key:
+            st.warning("API Key가 필요해요!")
+        else:
+            # 곡마다 진행 상태를 보여 줄 자리
+            status_labels = {
+                "queued": "⏳ 대기 중",
+                "running": "✍️ 분석 중",
+                "done": "✅ 완료",
+                "error": "⚠️ 실패",
+            }
+            overall = st.progress(0.0, text=f"0 / {len(songs)}곡 완료")
+            rows = []
+            for song in songs:
+                rows.append(st.empty())
+            finished = set()
+
+            def _on_progress(index, status, info):
+                song = songs[index]
+                label = f"🎵 {song['title'] or '(제목 없음)'}{(' - ' + song['artist']) if song['artist'] else ''}"
+                if status == "retry":
+                    text = f"🔁 재시도 {info['attempt']}회 ({info['delay']:.1f}초 뒤)"
+                elif status == "done" and info.get("source") == "cache":
+                    text = "⚡ 저장된 결과 사용"
+                else:
+                    text = status_labels.get(status, status)
+                if status == "error":
+                    text += f": {info.get('error')}"
+                rows[index].markdown(f"{label} — {text}")
+                if status in ("done", "error"):
+                    finished.add(index)
+                    overall.progress(len(finished) / len(songs), text=f"{len(finished)} / {len(songs)}곡 완료")
+
+            results = playlist_analyzer.analyze_playlist(
+                api_key, songs, concurrency=concurrency, on_progress=_on_progress
+            )
+            added = 0
+            for entry in results:
+                if entry["status"] != "done":
+                    continue
+                st.session_state['playlist_queue'].append({
+                    "title": entry["title"],
+                    "artist": entry["artist"],
+                    "translation": entry["result"].get("translation", ""),
+                    "vocab": entry["result"].get("vocab", []),
+                })
+                added += 1
+            if added:
+                st.toast(f"{added}곡의 스티커를 검토 목록에 넣었어요 📒")
+
+    queue = st.session_state['playlist_queue']
+    if queue:
+        st.markdown("---")
+        st.subheader("📋 검토할 스티커 (곡별)")
+        if st.button("📌 검토 목록 전부 붙이기"):
+            _save_stickers([
+                (item, group["title"], group["artist"]) for group in queue for item in group["vocab"]
+            ])
+        for q_idx, group in enumerate(list(queue)):
+            header = f"🎵 {group['title'] or '(제목 없음)'}{(' - ' + group['artist']) if group['artist'] else ''} · {len(group['vocab'])}개"
+            with st.expander(header, expanded=(q_idx == 0)):
+                if group.get("translation"):
+                    st.caption(group["translation"])
+                _render_cards(group["vocab"])
+                labels = [f"{idx + 1}. {sticker_cards.card_label(item)}" for idx, item in enumerate(group["vocab"])]
+                picked = st.multiselect("붙일 스티커 고르기", labels, default=labels, key=f"pl_pick_{q_idx}")
+                if st.button("📌 고른 스티커 붙이기", key=f"pl_save_{q_idx}", disabled=not picked):
+                    _save_stickers([
+                        (group["vocab"][labels.index(label)], group["title"], group["artist"])
+                        for label in picked
+                    ])
+                if st.button("🗑 검토 끝 (목록에서 빼기)", key=f"pl_done_{q_idx}"):
+                    queue.pop(q_idx)
+                    st.rerun()
 
 # [메뉴 2] 다꾸 기록장
 elif menu == "📅 다꾸 기록장":
     st.title("나의 다꾸 기록장 📖")
     
-    recorded_dates = db_manager.get_recorded_dates()
+    # 캘린더에는 "지금 보이는 달" 범위의 기록만 보냅니다.
+    # (전체 기간을 다 보내면 기록이 쌓일수록 매 rerun마다 보내는 양이 계속 늘어나요)
+    # 달력 칸은 앞뒤 달 며칠까지 보이므로 앞쪽 7일, 뒤쪽 14일을 여유로 둡니다.
+    if "calendar_range" not in st.session_state:
+        _month_start = datetime.now().date().replace(day=1)
+        st.session_state["calendar_range"] = (
+            (_month_start - timedelta(days=7)).strftime("%Y-%m-%d"),
+            (_month_start + timedelta(days=31 + 14)).strftime("%Y-%m-%d"),
+            _month_start.strftime("%Y-%m-%d"),
+        )
+    cal_start, cal_end, cal_initial = st.session_state["calendar_range"]
+
+    # --- 단어 찾기: 날짜/노래를 몰라도 단어·읽기·뜻·예문 일부로 찾습니다. (FTS5 검색 인덱스) ---
+    search_query = st.text_input(
+        "🔍 단어 찾기",
+        key="diary_search",
+        placeholder="단어, 읽기, 뜻, 예문 일부 (예: かなし / 슬프)",
+    ).strip()
+    if search_query:
+        def _search_page(offset):
+            offset = offset or 0
+            rows = db_manager.search_words(search_query, limit=db_manager.PAGE_SIZE + 1, offset=offset)
+            next_offset = offset + db_manager.PAGE_SIZE if len(rows) > db_manager.PAGE_SIZE else None
+            return rows[:db_manager.PAGE_SIZE], next_offset
+
+        search_page_key = "search_page"
+        results, search_next, search_stack = _keyset_page(search_page_key, _search_page, scope=search_query)
+        if not results:
+            st.info("찾는 단어가 없어요. (다른 글자로 찾아보세요)")
+        else:
+            _render_cards(results, "search")
+            _pager_controls(search_page_key, search_stack, search_next)
+        st.markdown("---")
+
     calendar_events = []
-    for date in recorded_dates:
+    for day in db_manager.get_daily_summary(cal_start, cal_end):
+        date = day["date"]
         calendar_events.append({"title": "🌸", "start": date, "allDay": True, "display": "background", "backgroundColor": "#ffeb3b"})
         calendar_events.append({"title": "🌸참 잘했어요", "start": date})
 
     # 월간 캘린더가 너무 크지 않게 옵션을 조정
-    calendar(
-        events=calendar_events,
-        options={
-            "initialView": "dayGridMonth",
-            "height": 360,
-            "headerToolbar": {"left": "prev,next", "center": "title", "right": "today"},
-        },
-        custom_css="""
-            /* 전체 캘린더 배경을 종이 느낌으로 */
-            .fc {
-              background: rgba(255,255,255,0.75);
-              border: 1px solid rgba(0,0,0,0.06);
-              border-radius: 14px;
-              padding: 10px 10px 6px 10px;
-              box-shadow: 4px 4px 14px rgba(0,0,0,0.08);
-            }
-            /* 타이틀(월) */
-            .fc .fc-toolbar-title {
-              font-size: 20px;
-              letter-spacing: -0.2px;
-            }
-            /* 헤더 버튼(이전/다음/오늘) 귀엽게 */
-            .fc .fc-button {
-              background: rgba(255, 142, 142, 0.85) !important;
-              border: none !important;
-              border-radius: 12px !important;
-              box-shadow: 2px 2px 6px rgba(0,0,0,0.08) !important;
-              padding: 6px 10px !important;
-            }
-            .fc .fc-button:disabled { opacity: 0.5 !important; }
-            /* 요일 헤더 */
-            .fc .fc-col-header-cell-cushion {
-              font-size: 14px;
-              opacity: 0.75;
-            }
-            /* 날짜 숫자 */
-            .fc .fc-daygrid-day-number {
-              padding: 6px 8px;
-              font-size: 14px;
-              opacity: 0.85;
-            }
-            /* 오늘 날짜 하이라이트(스티커 느낌) */
-            .fc .fc-day-today {
-              background: rgba(255, 235, 59, 0.22) !important;
-            }
-            /* 이벤트(🌸)는 둥근 스티커처럼 */
-            .fc .fc-event {
-              border-radius: 999px;
-              padding: 2px 8px;
-              border: 1px dashed rgba(0,0,0,0.12);
-              background: rgba(255, 255, 255, 0.6);
-            }
-            /* 날짜 칸에 살짝 연필선 느낌 */
-            .fc .fc-daygrid-day-frame {
-              border-radius: 10px;
-            }
-        """,
-        key="mini_month_calendar",
-    )
+    with tracing.span("render.calendar"):
+        # streamlit_calendar는 이 페이지에서만 쓰니까 여기서 처음 불러옵니다. (첫 화면이 빨리 뜨게)
+        from streamlit_calendar import calendar
+
+        calendar_state = calendar(
+            events=calendar_events,
+            options={
+                "initialView": "dayGridMonth",
+                "initialDate": cal_initial,
+                "height": 360,
+                "headerToolbar": {"left": "prev,next", "center": "title", "right": "today"},
+            },
+            callbacks=["eventsSet", "dateClick"],
+            custom_css="""
+                /* 전체 캘린더 배경을 종이 느낌으로 */
+                .fc {
+                  background: rgba(255,255,255,0.75);
+                  border: 1px solid rgba(0,0,0,0.06);
+                  border-radius: 14px;
+                  padding: 10px 10px 6px 10px;
+                  box-shadow: 4px 4px 14px rgba(0,0,0,0.08);
+                }
+                /* 타이틀(월) */
+                .fc .fc-toolbar-title {
+                  font-size: 20px;
+                  letter-spacing: -0.2px;
+                }
+                /* 헤더 버튼(이전/다음/오늘) 귀엽게 */
+                .fc .fc-button {
+                  background: rgba(255, 142, 142, 0.85) !important;
+                  border: none !important;
+                  border-radius: 12px !important;
+                  box-shadow: 2px 2px 6px rgba(0,0,0,0.08) !important;
+                  padding: 6px 10px !important;
+                }
+                .fc .fc-button:disabled { opacity: 0.5 !important; }
+                /* 요일 헤더 */
+                .fc .fc-col-header-cell-cushion {
+                  font-size: 14px;
+                  opacity: 0.75;
+                }
+                /* 날짜 숫자 */
+                .fc .fc-daygrid-day-number {
+                  padding: 6px 8px;
+                  font-size: 14px;
+                  opacity: 0.85;
+                }
+                /* 오늘 날짜 하이라이트(스티커 느낌) */
+                .fc .fc-day-today {
+                  background: rgba(255, 235, 59, 0.22) !important;
+                }
+                /* 이벤트(🌸)는 둥근 스티커처럼 */
+                .fc .fc-event {
+                  border-radius: 999px;
+                  padding: 2px 8px;
+                  border: 1px dashed rgba(0,0,0,0.12);
+                  background: rgba(255, 255, 255, 0.6);
+                }
+                /* 날짜 칸에 살짝 연필선 느낌 */
+                .fc .fc-daygrid-day-frame {
+                  border-radius: 10px;
+                }
+            """,
+            key="mini_month_calendar",
+        )
+
+    # 이전/다음 달로 넘기면 컴포넌트가 새 화면 범위(view)를 알려 줍니다.
+    # 범위가 바뀌었을 때만 그 달의 기록을 다시 읽어서 보내요.
+    # (toISOString()이 UTC라서 시간대에 따라 하루가 밀릴 수 있어 앞뒤로 하루씩 여유를 둡니다)
+    calendar_view = None
+    if isinstance(calendar_state, dict):
+        calendar_view = (calendar_state.get(calendar_state.get("callback") or "") or {}).get("view")
+    if calendar_view and calendar_view.get("activeStart") and calendar_view.get("activeEnd"):
+        try:
+            view_start = datetime.strptime(calendar_view["activeStart"][:10], "%Y-%m-%d").date()
+            view_end = datetime.strptime(calendar_view["activeEnd"][:10], "%Y-%m-%d").date()
+            view_current = datetime.strptime(calendar_view["currentStart"][:10], "%Y-%m-%d").date()
+        except (KeyError, ValueError):
+            view_start = None
+        if view_start:
+            new_range = (
+                (view_start - timedelta(days=1)).strftime("%Y-%m-%d"),
+                (view_end + timedelta(days=1)).strftime("%Y-%m-%d"),
+                (view_current + timedelta(days=1)).strftime("%Y-%m-%d"),
+            )
+            if new_range[:2] != st.session_state["calendar_range"][:2]:
+                st.session_state["calendar_range"] = new_range
+                st.rerun()
     
     st.markdown("---")
     col_date, col_content = st.columns([1, 3])
@@ -368,12 +611,13 @@ elif menu == "📅 다꾸 기록장":
     
     with col_content:
         st.markdown(f"### ✏️ {date_str}의 기록")
-        # --- 유틸: None 정리 ---
-        def _clean(v):
-            return "" if v is None else str(v)
-
-        # --- DB에서 단어 목록 로딩 (항상 id 오름차순) ---
-        words = db_manager.get_words_by_date(date_str)
+        # --- DB에서 단어 목록 로딩 (항상 id 오름차순, 한 페이지씩) ---
+        note_page_key = "note_page"
+        words, note_next, note_stack = _keyset_page(
+            note_page_key,
+            lambda cursor: db_manager.get_words_by_date_page(date_str, after_id=cursor),
+            scope=date_str,
+        )
 
         # (요청) 텍스트 추가 창은 제거합니다.
 
@@ -387,72 +631,73 @@ elif menu == "📅 다꾸 기록장":
         # "노트 밖으로 벗어난 것처럼" 보일 수 있습니다.
         # 그래서 노트는 Streamlit 컨테이너(border=True)에 스타일을 입혀서,
         # 내부 위젯이 전부 "노트 안"에 포함되도록 만듭니다.
-        st.markdown(
-            """
-<style>
-/* border=True 컨테이너(노트) 스타일 */
-div[data-testid="stVerticalBlockBorderWrapper"] {
-  background-color: #fff !important;
-  background-image: linear-gradient(#e5e5e5 1px, transparent 1px) !important;
-  background-size: 100% 40px !important;
-  border-radius: 6px !important;
-  box-shadow: 5px 5px 15px rgba(0,0,0,0.1) !important;
-  padding: 20px 18px !important;
-}
-/* 왼쪽 점선 세로줄(노트 제본 느낌) */
-div[data-testid="stVerticalBlockBorderWrapper"]::before {
-  content: "" !important;
-  position: absolute !important;
-  left: 18px !important;
-  top: 0 !important;
-  bottom: 0 !important;
-  width: 2px !important;
-  border-left: 2px dashed #ccc !important;
-  pointer-events: none !important;
-}
-</style>
-""",
-            unsafe_allow_html=True,
-        )
+        _inject_css("diary_note.css")
 
         with st.container(border=True):
             if not words:
                 st.write("(아직 저장된 단어가 없어요)")
             else:
-                for w in words:
-                    wid = w.get("id")
-                    song_line = f"🎵 {_clean(w.get('song_title'))}{(' - ' + _clean(w.get('artist'))) if _clean(w.get('artist')) else ''}"
-
-                    word = _clean(w.get("word"))
-                    reading = _clean(w.get("reading"))
-                    pron = _clean(w.get("pronunciation"))
-                    meaning = _clean(w.get("meaning"))
-
-                    example = _clean(w.get("example"))
-                    ex_reading = _clean(w.get("example_reading"))
-                    ex_pron = _clean(w.get("example_pronunciation"))
-                    ex_meaning = _clean(w.get("example_meaning"))
-
-                    left, right = st.columns([14, 1])
-                    with left:
-                        card_html = f"""
-<div class="sticker-card">
-  <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">{song_line}</div>
-  <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>{word}</b></div>
-  <div style="color: #555; font-size: 0.9em;">{reading}</div>
-  <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[{pron}]</div>
-  <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>{meaning}</b></div>
-  <div style="margin-top:10px; font-size: 0.95em; color: #444;"><b>예문</b>: {example}</div>
-  <div style="font-size: 0.9em; color: #555;">{ex_reading}</div>
-  <div style="font-size: 0.95em; color: #3f51b5; font-weight:bold;">[{ex_pron}]</div>
-  <div style="font-size: 0.95em; color: #666;">뜻: {ex_meaning}</div>
-</div>
-"""
-                        st.markdown(card_html, unsafe_allow_html=True)
-                    with right:
-                        if st.button("✕", key=f"del_note_{date_str}_{wid}", help="삭제"):
-                            db_manager.delete_word(int(wid))
-                            st.rerun()
+                _render_cards(words, "note", columns=2)
+
+                # 카드마다 ✕ 버튼을 두는 대신, 이 페이지에서 지울 단어를 골라 한 번에 지웁니다.
+                with st.form(f"del_note_{date_str}", clear_on_submit=True, border=False):
+                    word_by_id = {w["id"]: w for w in words}
+                    to_delete = st.multiselect(
+                        "지울 스티커",
+                        list(word_by_id),
+                        format_func=lambda wid: sticker_cards.card_label(word_by_id[wid]),
+                    )
+                    if st.form_submit_button("🗑 고른 스티커 삭제") and to_delete:
+                        _db_write(db_manager.delete_words, [int(wid) for wid in to_delete])
+                        st.rerun()
+
+            day_total = db_manager.get_daily_summary(date_str, date_str)
+            _pager_controls(
+                note_page_key, note_stack, note_next,
+                total=day_total[0]["word_count"] if day_total else None,
+            )
+
+        # --- 그날의 메모 (자동 저장 + 버전 기록) ---
+        with st.expander("📝 오늘의 메모 (자동 저장)"):
+            autosaver = _note_autosaver(tenant)
+            memo_key = f"memo_{date_str}"
+            if memo_key not in st.session_state:
+                # 아직 저장 대기 중인 글이 있으면 그걸 먼저 보여 줍니다. (방금 쓴 글이 사라져 보이지 않게)
+                draft = autosaver.get(date_str)
+                st.session_state[memo_key] = draft if draft is not None else db_manager.get_diary_text(date_str)
+            st.text_area(
+                "메모",
+                key=memo_key,
+                height=160,
+                on_change=_submit_memo,
+                args=(date_str, memo_key),
+                label_visibility="collapsed",
+                placeholder="오늘 들은 노래, 기억하고 싶은 가사를 적어 보세요.",
+            )
+            save_error = autosaver.error(date_str)
+            if save_error:
+                st.warning(f"메모를 저장하지 못해서 잠시 뒤 다시 시도할게요. ({save_error})")
+            else:
+                st.caption(
+                    "저장 대기 중…" if autosaver.get(date_str) is not None else "입력을 멈추면 잠시 뒤 자동으로 저장돼요."
+                )
+
+            versions = db_manager.get_diary_text_versions(date_str)
+            if len(versions) > 1:
+                by_version = {v["version"]: v for v in versions[1:]}
+                picked = st.selectbox(
+                    "🕘 이전 버전",
+                    list(by_version),
+                    format_func=lambda ver: _format_version(by_version[ver]),
+                    key=f"memo_version_{date_str}",
+                )
+                with st.popover("미리 보기"):
+                    st.text(db_manager.get_diary_text_version(date_str, picked) or "")
+                if st.button("↩️ 이 버전으로 되돌리기", key=f"memo_restore_{date_str}"):
+                    autosaver.flush(date_str)
+                    _db_write(db_manager.restore_diary_text, date_str, picked, wait=True)
+                    del st.session_state[memo_key]
+                    st.rerun()
 
         st.markdown("---")
         st.markdown("### 🎧 이번주 / 이번달 / 이번연도 들은 노래 정리")
@@ -505,41 +750,29 @@ div[data-testid="stVerticalBlockBorderWrapper"]::before {
             if not selected:
                 return
 
-            # 선택값 파싱(마지막 ' - ' 기준)
-            if " - " in selected:
-                s_title, s_artist = selected.split(" - ", 1)
-            else:
-                s_title, s_artist = selected, ""
-            s_title = (s_title or "").strip()
-            s_artist = (s_artist or "").strip()
-
-            words = db_manager.get_words_by_song(s_title, s_artist, start_s, end_s)
+            # 선택한 줄의 원래 값(제목/가수)을 그대로 사용합니다.
+            # (문자열을 ' - '로 다시 나누면 가수가 비었거나 제목에 ' - '가 있을 때 어긋나요)
+            picked_song = summary[options.index(selected)]
+            s_title = (picked_song.get("song_title") or "").strip()
+            s_artist = (picked_song.get("artist") or "").strip()
+
+            song_page_key = f"song_page_{label}"
+            words, song_next, song_stack = _keyset_page(
+                song_page_key,
+                lambda cursor: db_manager.get_words_by_song_page(
+                    s_title, s_artist, start_s, end_s, cursor=cursor
+                ),
+                scope=(start_s, s_title, s_artist),
+            )
             st.markdown("#### 📌 이 노래에서 저장한 단어")
             if not words:
                 st.write("저장된 단어가 없어요.")
                 return
+            song_total = picked_song.get("word_count")
 
-            for w in words:
-                word = _clean(w.get("word"))
-                reading = _clean(w.get("reading"))
-                pron = _clean(w.get("pronunciation"))
-                meaning = _clean(w.get("meaning"))
-                example = _clean(w.get("example"))
-                saved_date = _clean(w.get("date"))
-
-                st.markdown(
-                    f"""
-<div class="sticker-card">
-  <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">📅 {saved_date}</div>
-  <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>{word}</b></div>
-  <div style="color: #555; font-size: 0.9em;">{reading}</div>
-  <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[{pron}]</div>
-  <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>{meaning}</b></div>
-  <div style="font-size: 0.85em; color: #888;">"{example}"</div>
-</div>
-""",
-                    unsafe_allow_html=True,
-                )
+            _render_cards(words, "song")
+
+            _pager_controls(song_page_key, song_stack, song_next, total=song_total)
 
         with tab_week:
             _render_song_table("이번주", week_start, week_end)
@@ -548,7 +781,154 @@ div[data-testid="stVerticalBlockBorderWrapper"]::before {
         with tab_year:
             _render_song_table("이번연도", year_start, year_end)
 
+elif menu == "🔁 오늘의 복습":
+    st.title("오늘의 복습 🔁")
+
+    # 복습할 카드는 REVIEW_BATCH장씩 가져오고, 답은 모아 두었다가 REVIEW_FLUSH_SIZE장마다
+    # (또는 이번 묶음을 다 보면) 한 번에 저장합니다. 답 버튼마다 DB에 쓰지 않아요.
+    REVIEW_BATCH = 20
+    REVIEW_FLUSH_SIZE = 10
+    review = st.session_state.setdefault(
+        "review_session", {"queue": [], "pending": [], "revealed": False, "done": 0}
+    )
+
+    def _flush_reviews():
+        if review["pending"]:
+            # 바로 뒤에 "복습할 차례"를 다시 읽으므로 저장이 끝날 때까지 기다립니다.
+            _db_write(db_manager.record_reviews, review["pending"], wait=True)
+            review["pending"] = []
+
+    now = time.time()
+    if not review["queue"]:
+        _flush_reviews()
+        review["queue"] = db_manager.get_due_reviews(now, limit=REVIEW_BATCH)
+        review["revealed"] = False
+    # 저장 전인 답은 DB에서 아직 "복습할 차례"라서 빼고 셉니다.
+    remaining = db_manager.count_due_reviews(now) - len(review["pending"])
+
+    if not review["queue"]:
+        st.success("지금 복습할 스티커를 다 봤어요! 🎉")
+        if review["done"]:
+            st.caption(f"이번에 {review['done']}장 복습했어요.")
+    else:
+        card = review["queue"][0]
+        st.caption(f"남은 복습 {remaining}장 · 이번에 {review['done']}장 완료")
+
+        if not review["revealed"]:
+            _render_cards([card], "review", columns=1)
+            if st.button("👀 정답 보기"):
+                review["revealed"] = True
+                st.rerun()
+        else:
+            _render_cards([card], "note", columns=1)
+            answer_cols = st.columns(4)
+            for col, (grade, label) in zip(answer_cols, (
+                ("again", "😵 몰라요"),
+                ("hard", "😅 어려웠어요"),
+                ("good", "🙂 알아요"),
+                ("easy", "😎 쉬웠어요"),
+            )):
+                with col:
+                    preview = srs.schedule(card, grade, now)
+                    if st.button(label, key=f"review_{grade}", help=f"다음 복습: {srs.describe_interval(preview)}"):
+                        review["pending"].append(srs.schedule(card, grade))
+                        review["queue"].pop(0)
+                        review["revealed"] = False
+                        review["done"] += 1
+                        if len(review["pending"]) >= REVIEW_FLUSH_SIZE:
+                            _flush_reviews()
+                        st.rerun()
+
+    if review["pending"]:
+        if st.button(f"💾 지금까지 답한 {len(review['pending'])}장 저장"):
+            _flush_reviews()
+            st.rerun()
+
 else:
     # 혹시라도 메뉴 문자열이 바뀌었는데 if/elif가 못 따라가면,
     # "빈 화면" 대신 원인을 알려주기 위해 안전장치를 둡니다.
-    st.warning("메뉴 선택을 확인해 주세요. (메뉴 문자열이 일치하지 않으면 화면이 비어 보일 수 있어요.)")
\ No newline at end of file
+    st.warning("메뉴 선택을 확인해 주세요. (메뉴 문자열이 일치하지 않으면 화면이 비어 보일 수 있어요.)")
+
+_page_span.close()
+
+# --- 4. 사이드바 하단: 내보내기 / 가져오기 ---
+with st.sidebar:
+    with st.expander("📦 내보내기 / 가져오기", expanded=False):
+        export_kind = st.selectbox(
+            "내보낼 형식",
+            ["ndjson", "csv:words", "csv:diary_text", "csv:diary_layout", "anki"],
+            format_func=lambda k: {
+                "ndjson": "전체 백업 (NDJSON)",
+                "csv:words": "단어 (CSV)",
+                "csv:diary_text": "노트 (CSV)",
+                "csv:diary_layout": "레이아웃 (CSV)",
+                "anki": "Anki 카드 (TSV)",
+            }[k],
+        )
+        export_fmt, _, export_table = export_kind.partition(":")
+        export_ext = {"ndjson": "ndjson", "csv": "csv", "anki": "tsv"}[export_fmt]
+        # data에 함수를 넘기면 버튼을 눌렀을 때만 파일을 만듭니다. (rerun마다 DB 전체를 읽지 않게)
+        st.download_button(
+            "⬇️ 내보내기",
+            data=lambda fmt=export_fmt, table=export_table or "words": diary_io.export_to_file(fmt, table),
+            file_name=f"voca_diary_{export_table or 'all'}.{export_ext}",
+            mime="text/plain",
+        )
+
+        uploaded = st.file_uploader("가져올 파일 (NDJSON / CSV)", type=["ndjson", "jsonl", "csv"])
+        replace_notes = st.checkbox("같은 날짜의 노트/레이아웃은 덮어쓰기", value=False)
+        if uploaded is not None and st.button("⬆️ 가져오기"):
+            import_stats = diary_io.import_file(
+                uploaded, diary_io.guess_format(uploaded.name), replace=replace_notes
+            )
+            st.success(
+                f"{import_stats['inserted']}개 가져왔어요. "
+                f"(이미 있어서 건너뜀 {import_stats['ignored']}개, 잘못된 줄 {import_stats['invalid']}개)"
+            )
+            for line_no, reason in import_stats["errors"][:10]:
+                st.caption(f"{line_no}번째 줄: {reason}")
+
+# --- 5. 사이드바 하단: 읽기 캐시 통계 (페이지를 다 그린 뒤라 이번 rerun까지 반영됨) ---
+with st.sidebar:
+    with st.expander("⚙️ 읽기 캐시 통계", expanded=False):
+        cache_stats = query_cache.stats()
+        st.caption(
+            f"적중 {cache_stats['hits']} · 미스 {cache_stats['misses']} "
+            f"(적중률 {cache_stats['hit_rate']:.0%}) · 항목 {cache_stats['entries']}개 · "
+            f"쓰기 세대 {cache_stats['generation']}"
+        )
+        prep_stats = lyrics_prep.stats()
+        if prep_stats["requests"]:
+            st.caption(
+                f"가사 정리 {prep_stats['requests']}곡 · 토큰 약 {prep_stats['raw_tokens']} → "
+                f"{prep_stats['sent_tokens']} ({prep_stats['saved_ratio']:.0%} 절약)"
+            )
+
+# --- 6. 사이드바 하단: 성능 추적 (이번 rerun의 span 나무) ---
+with st.sidebar:
+    with st.expander("🔬 성능 추적", expanded=False):
+        st.toggle("이번 rerun부터 기록하기", value=tracing.ENABLED_BY_DEFAULT, key="trace_enabled")
+        if _trace is None:
+            st.caption("켜면 다음 rerun부터 DB 조회 / OpenAI 호출 / 카드 그리기 시간이 여기에 보여요.")
+        else:
+            trace_tree = tracing.finish(_trace)
+            st.caption(f"이번 rerun: {trace_tree['duration_ms']:.1f} ms")
+            st.code(
+                "\n".join(
+                    f"{'  ' * depth}{name}  {ms:.2f} ms  {extra}".rstrip()
+                    for depth, name, ms, extra in tracing.iter_lines(trace_tree)
+                ),
+                language=None,
+            )
+            st.caption(
+                "자기 시간이 긴 곳: "
+                + ", ".join(f"{name} {ms:.1f} ms" for name, ms in tracing.hot_spots(trace_tree))
+            )
+            if tracing.LOG_PATH:
+                st.caption(f"JSONL 기록: {tracing.LOG_PATH}")
+            st.download_button(
+                "⬇️ 이번 rerun 기록 (JSONL)",
+                data=tracing.to_jsonl(trace_tree),
+                file_name="voca_trace.jsonl",
+                mime="application/x-ndjson",
+            )
@@ -0,0 +1,382 @@
+"""
+db_manager 벤치마크 + 쿼리 플랜 검사 스크립트입니다.
+
+규모(단어 행 수)마다 synth_data로 가짜 다꾸 DB를 만들고, db_manager의 함수들을
+여러 번 불러서 걸린 시간(중앙값/p95/최소)을 잽니다. 결과는 JSON으로 저장해서
+나중에 --baseline으로 넘기면 함수별로 얼마나 빨라졌는지/느려졌는지 비교해 줘요.
+
+같이 "자주 쓰는 조회"가 실제로 실행한 SQL을 sqlite trace로 잡아서 EXPLAIN QUERY PLAN을 보고,
+인덱스 없이 표 전체를 훑는(SCAN) 단계가 있으면 실패로 표시합니다. (종료 코드 1)
+
+사용법:
+    python bench_db.py --scales 1000,10000,100000 --output bench.json
+    python bench_db.py --scales 100000 --baseline bench.json --max-slowdown 1.5
+    python bench_db.py --plans-only --scales 10000
+
+만든 가짜 DB는 --data-dir에 남겨 두고 다음 실행 때 다시 씁니다. (벤치마크는 그 복사본에서 돌려요)
+"""
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db_manager
+import query_cache
+import srs
+import synth_data
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+DEFAULT_REPEAT = 15
+
+# 쿼리 플랜에서 "전체 SCAN"이 나오면 안 되는 조회들
+PLAN_CHECKED = (
+    "get_songs_summary",
+    "get_words_by_song",
+    "get_recorded_dates",
+    "get_daily_summary",
+    "get_words_by_date",
+    "get_words_by_date_page",
+    "get_words_by_song_page",
+    "get_due_reviews",
+    "search_words",
+)
+
+# 이 정도(ms)보다 작은 차이는 잡음으로 보고 느려졌다고 하지 않습니다.
+NOISE_MS = 0.2
+
+
+# --- 데이터 준비 ---
+
+def prepare_db(rows, data_dir, seed=0):
+    """규모별 가짜 DB를 (없으면 만들고) 작업용 복사본 경로를 돌려줍니다."""
+    os.makedirs(data_dir, exist_ok=True)
+    source = os.path.join(data_dir, f"synth_{rows}_{seed}.db")
+    if not os.path.exists(source):
+        print(f"[{rows:,}] 가짜 데이터 만드는 중... ({source})", flush=True)
+        started = time.perf_counter()
+        synth_data.populate(source, rows, seed=seed)
+        # WAL 내용을 본 파일에 합쳐서 파일 하나만 복사하면 되게 합니다.
+        with db_manager.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db_manager.get_pool().close_all()
+        print(f"[{rows:,}] 완료 {time.perf_counter() - started:.1f}s", flush=True)
+
+    work = os.path.join(data_dir, f"bench_{rows}_{seed}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(source, work)
+    db_manager.configure(db_path=work)
+    db_manager.init_db()
+    return work
+
+
+def _fixtures():
+    """벤치마크 인자로 쓸 "대표 값"(가장 바쁜 날, 가장 많이 들은 노래 등)을 DB에서 고릅니다."""
+    with db_manager.connection() as conn:
+        busiest = conn.execute(
+            "SELECT date FROM daily_summary ORDER BY word_count DESC, date LIMIT 1"
+        ).fetchone()
+        last = conn.execute("SELECT MAX(date) FROM daily_summary").fetchone()[0]
+        song = conn.execute(
+            """
+            SELECT s.title, s.artist
+            FROM song_daily_rollup AS r JOIN song AS s ON s.id = r.song_id
+            GROUP BY r.song_id ORDER BY SUM(r.word_count) DESC LIMIT 1
+            """
+        ).fetchone()
+        long_word = conn.execute(
+            "SELECT word FROM vocab WHERE length(word) >= 3 ORDER BY id LIMIT 1"
+        ).fetchone()
+    last_day = date.fromisoformat(last) if last else date.today()
+    return {
+        "day": busiest[0] if busiest else last_day.isoformat(),
+        "week": ((last_day - timedelta(days=6)).isoformat(), last_day.isoformat()),
+        "month": ((last_day - timedelta(days=30)).isoformat(), last_day.isoformat()),
+        "year": ((last_day - timedelta(days=364)).isoformat(), last_day.isoformat()),
+        "song": (song[0], song[1]) if song else ("", ""),
+        # 3글자 이상은 FTS 인덱스로, 1글자는 LIKE로 찾는 경로를 잽니다.
+        "long_query": long_word[0] if long_word else "かなしい",
+        "short_query": long_word[0][:1] if long_word else "光",
+        "now": time.time(),
+    }
+
+
+# --- 벤치마크 대상 ---
+
+def _cases(fx):
+    """
+    (이름, 함수, 인자를 만드는 함수, 반복 수)를 돌려줍니다.
+    쓰기 함수는 2099년 날짜에만 쓰고, 벤치마크 뒤에 지웁니다.
+    """
+    title, artist = fx["song"]
+    counter = iter(range(10 ** 9))
+
+    def fresh_rows(n):
+        k = next(counter)
+        return [
+            {"date": f"2099-01-{1 + k % 28:02d}", "word": f"bench{k}_{i}", "meaning": "벤치",
+             "song_title": title, "artist": artist}
+            for i in range(n)
+        ]
+
+    def review_states():
+        due = db_manager.get_due_reviews(fx["now"] + 10 ** 9, limit=50)
+        return ([srs.schedule(card, "good", fx["now"]) for card in due],)
+
+    def moved_layout():
+        # 스티커 60장짜리 레이아웃에서 한 장씩 옮기는 "드래그 한 번" 저장을 흉내 냅니다.
+        k = next(counter)
+        stickers = [{"id": i, "x": i * 7, "y": i * 11, "rotate": -2, "word": f"単語{i}"} for i in range(60)]
+        stickers[k % 60]["x"] += k
+        return ("2099-01-01", {"stickers": stickers, "memo": "벤치마크"})
+
+    def bench_ids():
+        with db_manager.connection() as conn:
+            row = conn.execute("SELECT id FROM study_event WHERE date >= '2099-01-01' LIMIT 1").fetchone()
+        return (row[0] if row else -1,)
+
+    reads = [
+        ("get_words_by_date", db_manager.get_words_by_date, lambda: (fx["day"],)),
+        ("get_recorded_dates[all]", db_manager.get_recorded_dates, lambda: ()),
+        ("get_recorded_dates[month]", db_manager.get_recorded_dates, lambda: fx["month"]),
+        ("get_daily_summary[month]", db_manager.get_daily_summary, lambda: fx["month"]),
+        ("get_layout", db_manager.get_layout, lambda: (fx["day"],)),
+        ("get_diary_text", db_manager.get_diary_text, lambda: (fx["day"],)),
+        ("get_songs_summary[week]", db_manager.get_songs_summary, lambda: fx["week"]),
+        ("get_songs_summary[year]", db_manager.get_songs_summary, lambda: fx["year"]),
+        ("get_words_by_song[year]", db_manager.get_words_by_song, lambda: (title, artist, *fx["year"])),
+        ("get_words_by_date_page", db_manager.get_words_by_date_page, lambda: (fx["day"],)),
+        ("get_words_by_song_page[year]", db_manager.get_words_by_song_page,
+         lambda: (title, artist, *fx["year"])),
+        ("search_words[fts]", db_manager.search_words, lambda: (fx["long_query"],)),
+        ("search_words[short]", db_manager.search_words, lambda: (fx["short_query"],)),
+        ("get_due_reviews", db_manager.get_due_reviews, lambda: (fx["now"],)),
+        ("count_due_reviews", db_manager.count_due_reviews, lambda: (fx["now"],)),
+    ]
+    writes = [
+        ("add_words[100]", db_manager.add_words, lambda: (fresh_rows(100),), None),
+        ("add_word", db_manager.add_word,
+         lambda: (lambda r: (r["date"], r["word"], r["meaning"], "", "", "", title, artist))(fresh_rows(1)[0]), None),
+        ("delete_word", db_manager.delete_word, bench_ids, None),
+        ("save_layout", db_manager.save_layout, moved_layout, None),
+        ("save_diary_text", db_manager.save_diary_text,
+         lambda: ("2099-01-01", f"벤치마크 메모 {next(counter)} " + "오늘 들은 노래 " * 40), None),
+        ("record_reviews[50]", db_manager.record_reviews, review_states, None),
+        ("verify_rollups", db_manager.verify_rollups, lambda: (), 3),
+        ("rebuild_rollups", db_manager.rebuild_rollups, lambda: (), 3),
+        ("rebuild_search_index", db_manager.rebuild_search_index, lambda: (), 2),
+    ]
+    return [(name, func, make_args, None) for name, func, make_args in reads] + writes
+
+
+def _cleanup():
+    with db_manager.transaction() as conn:
+        conn.execute("DELETE FROM study_event WHERE date >= '2099-01-01'")
+        conn.execute("DELETE FROM layout_delta WHERE date >= '2099-01-01'")
+        conn.execute("DELETE FROM layout_snapshot WHERE date >= '2099-01-01'")
+        conn.execute("DELETE FROM diary_text WHERE date >= '2099-01-01'")
+        conn.execute("DELETE FROM diary_text_history WHERE date >= '2099-01-01'")
+
+
+def time_call(func, make_args, repeat):
+    """함수를 repeat번 불러 ms 단위 통계를 돌려줍니다. (읽기 캐시는 매번 비워서 DB 시간만 잽니다)"""
+    samples = []
+    for _ in range(repeat):
+        args = make_args()
+        query_cache.clear()
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": len(samples),
+    }
+
+
+def run_benchmarks(repeat=DEFAULT_REPEAT):
+    fx = _fixtures()
+    results = {}
+    for name, func, make_args, fixed_repeat in _cases(fx):
+        results[name] = time_call(func, make_args, fixed_repeat or repeat)
+    _cleanup()
+    return results
+
+
+# --- 쿼리 플랜 검사 ---
+
+def capture_sql(func, *args):
+    """func가 실행한 SELECT 문(인자가 채워진 SQL)을 모읍니다."""
+    query_cache.clear()
+    with db_manager.capture_sql() as statements:
+        func(*args)
+    return [
+        sql for sql in statements
+        if sql.lstrip().upper().startswith(("SELECT", "WITH"))
+        # FTS5가 안에서 자기 보조 표('main'.'vocab_fts_config' 등)를 읽는 문장도 잡혀요. 우리 SQL이 아니라서 뺍니다.
+        and "'main'." not in sql
+    ]
+
+
+def full_scans(conn, sql):
+    """EXPLAIN QUERY PLAN에서 인덱스 없이 표 전체를 훑는 단계(detail)를 돌려줍니다."""
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    # 서브쿼리 결과(MATERIALIZE/CO-ROUTINE)를 훑는 건 원본 표 SCAN이 아니라서 뺍니다.
+    derived = {
+        detail.split(" ", 1)[1].strip()
+        for detail in plan
+        if detail.startswith(("MATERIALIZE ", "CO-ROUTINE "))
+    }
+    # 플랜에는 별칭으로 나와요. (LEFT JOIN vocab_score AS vs → "SCAN vs")
+    for name in list(derived):
+        derived.update(re.findall(rf"\b{re.escape(name)}\s+AS\s+(\w+)", sql, re.IGNORECASE))
+    scans = []
+    for detail in plan:
+        if not detail.startswith("SCAN "):
+            continue
+        if "USING" in detail or "VIRTUAL TABLE" in detail:
+            continue
+        target = detail[len("SCAN "):].split(" ", 1)[0]
+        if target in derived or target.startswith("("):
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check_plans():
+    """
+    PLAN_CHECKED 조회들의 쿼리 플랜을 검사합니다.
+    반환값: {함수 이름: [{"sql": ..., "scans": [...]}, ...]}  (전체 SCAN이 없으면 빈 리스트)
+    """
+    fx = _fixtures()
+    title, artist = fx["song"]
+    calls = {
+        "get_songs_summary": (db_manager.get_songs_summary, fx["year"]),
+        "get_words_by_song": (db_manager.get_words_by_song, (title, artist, *fx["year"])),
+        "get_recorded_dates": (db_manager.get_recorded_dates, fx["month"]),
+        "get_daily_summary": (db_manager.get_daily_summary, fx["month"]),
+        "get_words_by_date": (db_manager.get_words_by_date, (fx["day"],)),
+        "get_words_by_date_page": (db_manager.get_words_by_date_page, (fx["day"],)),
+        "get_words_by_song_page": (db_manager.get_words_by_song_page, (title, artist, *fx["year"])),
+        "get_due_reviews": (db_manager.get_due_reviews, (fx["now"],)),
+        # 1~2글자 검색은 LIKE라서 원래 표를 훑어요. FTS를 타는 3글자 이상만 검사합니다.
+        "search_words": (db_manager.search_words, (fx["long_query"],)),
+    }
+    report = {}
+    for name in PLAN_CHECKED:
+        func, args = calls[name]
+        problems = []
+        statements = capture_sql(func, *args)
+        with db_manager.connection() as conn:
+            for sql in statements:
+                scans = full_scans(conn, sql)
+                if scans:
+                    problems.append({"sql": " ".join(sql.split()), "scans": scans})
+        report[name] = problems
+    return report
+
+
+# --- 결과 비교 ---
+
+def compare(current, baseline, max_slowdown=None):
+    """
+    두 결과(JSON)를 규모/함수별로 비교해서 출력합니다.
+    반환값: max_slowdown배보다 느려진 항목 [(규모, 함수, 배율), ...]
+    """
+    regressions = []
+    for scale, funcs in current["results"].items():
+        old_funcs = baseline.get("results", {}).get(scale)
+        if not old_funcs:
+            continue
+        print(f"\n[{int(scale):,} rows] 기준 대비 (중앙값)")
+        for name, stats in funcs.items():
+            old = old_funcs.get(name)
+            if not old:
+                continue
+            new_ms, old_ms = stats["median_ms"], old["median_ms"]
+            ratio = new_ms / old_ms if old_ms else float("inf")
+            mark = ""
+            if max_slowdown and ratio > max_slowdown and new_ms - old_ms > NOISE_MS:
+                regressions.append((scale, name, ratio))
+                mark = "  ← 느려짐"
+            print(f"  {name:32s} {old_ms:9.3f} → {new_ms:9.3f} ms  x{ratio:5.2f}{mark}")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="db_manager 벤치마크 / 쿼리 플랜 검사")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="단어 행 수 목록 (쉼표로 구분, 예: 1000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "voca_diary_bench"))
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--max-slowdown", type=float, help="기준보다 이 배수 넘게 느려지면 실패")
+    parser.add_argument("--plans-only", action="store_true", help="벤치마크 없이 쿼리 플랜만 검사")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {},
+        "plans": {},
+    }
+    plan_failures = 0
+    for rows in scales:
+        prepare_db(rows, args.data_dir, args.seed)
+        plans = check_plans()
+        report["plans"][str(rows)] = plans
+        for name, problems in plans.items():
+            status = "OK" if not problems else "FULL SCAN"
+            print(f"[{rows:,}] plan {name:28s} {status}")
+            for problem in problems:
+                plan_failures += 1
+                print(f"    {problem['sql'][:160]}")
+                for scan in problem["scans"]:
+                    print(f"      - {scan}")
+        if not args.plans_only:
+            results = run_benchmarks(args.repeat)
+            report["results"][str(rows)] = results
+            for name, stats in results.items():
+                print(f"[{rows:,}] {name:32s} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms")
+        db_manager.get_pool().close_all()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+    regressions = []
+    if args.baseline and not args.plans_only:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_slowdown)
+
+    if plan_failures:
+        print(f"\n쿼리 플랜 검사 실패: 전체 SCAN {plan_failures}건", file=sys.stderr)
+    if regressions:
+        print(f"\n기준보다 느려진 항목 {len(regressions)}개", file=sys.stderr)
+    return 1 if plan_failures or regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,71 +1,678 @@
+import contextvars
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-DB_NAME = "voca_diary.db"
+import layout_store
+import migrations
+import note_store
+import query_cache
+import tracing
+from migrations import normalize_song_key
 
-def init_db():
+# 기본 DB 파일 경로입니다. 환경변수 VOCA_DIARY_DB 또는 configure(db_path=...)로 바꿀 수 있어요.
+DB_NAME = os.environ.get("VOCA_DIARY_DB", "voca_diary.db")
+
+# 연결을 열 때마다 적용하는 PRAGMA 기본값
+# - journal_mode=WAL: 읽기와 쓰기가 서로를 막지 않아서 "database is locked"가 크게 줄어요.
+# - synchronous=NORMAL: WAL에서는 NORMAL로도 안전하고, 커밋마다 fsync를 하지 않아 빨라요.
+# - cache_size: 음수는 KiB 단위입니다(-16000 ≒ 16MB 페이지 캐시).
+# - mmap_size: 파일을 메모리 맵으로 읽어서 read() 시스템콜을 줄여요.
+# - busy_timeout: 다른 세션이 쓰는 중이면 바로 실패하지 않고 이 시간(ms)만큼 기다려요.
+# 환경변수 VOCA_DIARY_PRAGMA_<이름>(예: VOCA_DIARY_PRAGMA_CACHE_SIZE=-32000)으로 덮어쓸 수 있어요.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "mmap_size": 128 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+
+# 사용자(tenant)별 DB 파일을 두는 폴더입니다. 비워 두면 예전처럼 DB_NAME 파일 하나만 써요.
+# 정해 두면 set_tenant("minji") 뒤의 모든 함수가 <TENANT_DIR>/minji.db를 씁니다.
+# 이건 "어느 파일을 쓸지" 고르는 것뿐이고 접근 제어가 아니에요. 누가 어떤 이름을 써도 되는지는
+# 부르는 쪽(app.py: 로그인한 사용자로 정함)이 책임집니다.
+TENANT_DIR = os.environ.get("VOCA_TENANT_DIR") or None
+
+# 동시에 열어 둘 DB 파일(풀) 수. 넘으면 가장 오래 안 쓴 파일의 연결부터 닫아요.
+MAX_OPEN_DBS = int(os.environ.get("VOCA_MAX_OPEN_DBS", "32"))
+
+# 한 DB 파일에 동시에 열어 둘 수 있는 최대 연결 수
+POOL_SIZE = int(os.environ.get("VOCA_DIARY_POOL_SIZE", "4"))
+
+# 풀이 꽉 찼을 때 연결이 반납되기를 기다리는 최대 시간(초)
+POOL_TIMEOUT = 30.0
+
+
+def _pragmas_from_env():
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for name in DEFAULT_PRAGMAS:
+        value = os.environ.get(f"VOCA_DIARY_PRAGMA_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+# capture_sql() 블록 안이면 실행한 SQL 문장을 모으는 리스트
+_sql_sink = contextvars.ContextVar("voca_sql_sink", default=None)
+
+
+def _on_sql(statement):
+    """풀의 모든 연결에 걸어 두는 sqlite trace 콜백입니다."""
+    sink = _sql_sink.get()
+    if sink is not None:
+        sink.append(statement)
+    # 추적(tracing)이 켜진 rerun에서는 실행한 SQL이 지금 열린 span에도 붙습니다.
+    tracing.sql_callback(statement)
+
+
+@contextmanager
+def capture_sql():
     """
-    데이터베이스와 테이블을 생성하고, 구버전 DB일 경우 컬럼/테이블을 추가합니다.
+    블록 안에서 (이 컨텍스트가) 실행한 SQL 문장을 전부 모읍니다. (bench_db 쿼리 플랜 검사용)
+    콜백은 연결마다 이미 걸려 있으니 풀에서 어떤 연결을 받든 다 잡혀요.
+    """
+    statements = []
+    token = _sql_sink.set(statements)
+    try:
+        yield statements
+    finally:
+        _sql_sink.reset(token)
 
-    이 앱은 초보자용이기 때문에 "마이그레이션 도구" 없이도
-    앱 실행만으로 DB가 최신 구조로 맞춰지도록(=자동 보정) 설계합니다.
+
+class ConnectionPool:
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # 1. 테이블 생성 (없을 경우)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS study_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            word TEXT NOT NULL,
-            song_title TEXT,
-            artist TEXT,
-            reading TEXT,
-            meaning TEXT NOT NULL,
-            example TEXT,
-            example_reading TEXT,
-            example_pronunciation TEXT,
-            example_meaning TEXT,
-            pronunciation TEXT,
-            UNIQUE(date, word) 
-        )
-    """)
-    
-    # 2. 기존 사용자를 위한 마이그레이션
-    # - 이미 컬럼이 있으면 OperationalError가 나는데 정상입니다(무시).
-    for col_name, col_type in (
-        ("pronunciation", "TEXT"),
-        ("reading", "TEXT"),
-        ("song_title", "TEXT"),
-        ("artist", "TEXT"),
-        ("example_reading", "TEXT"),
-        ("example_pronunciation", "TEXT"),
-        ("example_meaning", "TEXT"),
-    ):
+    DB 파일 1개에 대한 작은 연결 풀입니다.
+
+    Streamlit은 클릭할 때마다 스크립트를 처음부터 다시 실행하고, 세션(브라우저 탭)마다
+    다른 스레드에서 돌아갑니다. 함수마다 sqlite3.connect()/close()를 하면
+    파일 열기 + 페이지 캐시 워밍업을 매번 다시 해야 해서, 열어 둔 연결을 돌려 씁니다.
+
+    - 최대 max_size개까지만 열고, 다 쓰는 중이면 반납될 때까지 기다립니다.
+    - 연결은 한 번에 한 스레드만 쓰기 때문에 check_same_thread=False로 열어도 안전해요.
+    """
+
+    def __init__(self, db_path, pragmas=None, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._all = []
+        self._busy = 0
+        self._closed = False
+        # 다른 연결(다른 프로세스 포함)의 커밋을 알아채는 용도로만 쓰는 연결 (data_version)
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(_on_sql)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(
+                f"connection pool exhausted ({self.max_size} connections busy)"
+            )
+        with self._lock:
+            self._busy += 1
         try:
-            cursor.execute(f"ALTER TABLE study_log ADD COLUMN {col_name} {col_type}")
-        except sqlite3.OperationalError:
+            return self._idle.get_nowait()
+        except queue.Empty:
             pass
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._busy -= 1
+            self._slots.release()
+            raise
 
-    # 3. 다꾸(레이아웃/메모) 저장용 테이블
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS diary_layout (
-            date TEXT PRIMARY KEY,
-            layout_json TEXT NOT NULL
-        )
-    """)
+    def release(self, conn):
+        # 호출한 쪽이 커밋/롤백을 잊었으면 다음 사용자에게 넘기기 전에 정리합니다.
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+        else:
+            if self._closed:
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+        finally:
+            with self._lock:
+                self._busy -= 1
+            self._slots.release()
+
+    @property
+    def busy(self) -> bool:
+        """빌려 간 연결이 있으면 True"""
+        return self._busy > 0
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def data_version(self):
+        """
+        PRAGMA data_version 값. 이 풀의 연결이든 다른 프로세스든, 누가 커밋하면 값이 바뀝니다.
+        (같은 연결로 물어봐야 비교가 되니까 전용 연결 하나를 따로 열어 둬요)
+        """
+        with self._watch_lock:
+            if self._closed:
+                # 닫힌 풀이면 어떤 값과도 같지 않은 값을 돌려서 캐시가 맞지 않게 합니다.
+                return object()
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def close_all(self):
+        self._closed = True
+        with self._watch_lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.close()
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+# 열려 있는 풀들 {DB 파일 경로: ConnectionPool} — 최근에 쓴 것이 뒤로 갑니다. (LRU)
+_pools = OrderedDict()
+_pool_lock = threading.Lock()
+_pragmas = _pragmas_from_env()
+
+# 지금 세션(스레드/태스크)의 사용자 이름. None이면 DB_NAME을 씁니다.
+_tenant = contextvars.ContextVar("voca_tenant", default=None)
+_TENANT_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def configure(db_path=None, pragmas=None, pool_size=None, tenant_dir=None, max_open_dbs=None):
+    """
+    DB 경로/PRAGMA/풀 크기를 바꿉니다. (앱 시작 시 한 번, 또는 스크립트/실험에서 사용)
+
+    - pragmas는 DEFAULT_PRAGMAS 위에 덮어쓸 값만 주면 됩니다. 예) {"cache_size": -64000}
+    - tenant_dir를 주면 사용자별 DB 파일을 그 폴더에 둡니다. (TENANT_DIR)
+    - 이미 열려 있던 연결은 모두 닫고, 다음 사용 때 새 설정으로 다시 엽니다.
+    """
+    global DB_NAME, POOL_SIZE, TENANT_DIR, MAX_OPEN_DBS, _pragmas
+    with _pool_lock:
+        if db_path is not None:
+            DB_NAME = str(db_path)
+        if pragmas:
+            _pragmas = {**_pragmas, **pragmas}
+        if pool_size is not None:
+            POOL_SIZE = int(pool_size)
+        if tenant_dir is not None:
+            TENANT_DIR = str(tenant_dir) or None
+        if max_open_dbs is not None:
+            MAX_OPEN_DBS = max(1, int(max_open_dbs))
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+# --- 사용자(tenant)별 DB ---
+
+def tenant_db_path(tenant: str) -> str:
+    """사용자 이름 → DB 파일 경로. 이름은 영문/숫자/_/-만 쓸 수 있어요. (경로 조작 방지)"""
+    if TENANT_DIR is None:
+        raise ValueError("사용자별 DB를 쓰려면 VOCA_TENANT_DIR(또는 configure(tenant_dir=...))를 정해 주세요")
+    if not _TENANT_RE.fullmatch(tenant or ""):
+        raise ValueError(f"사용자 이름은 영문/숫자/_/-로 64자까지 쓸 수 있어요: {tenant!r}")
+    return os.path.join(TENANT_DIR, f"{tenant}.db")
+
+
+def set_tenant(tenant):
+    """
+    지금 세션의 사용자를 정합니다. (None이면 DB_NAME 파일 하나를 쓰는 예전 방식)
+    contextvars라서 Streamlit 세션 스레드마다, asyncio 태스크마다 따로 들고 있어요.
+    반환값은 reset_tenant()에 넘길 토큰입니다.
+    """
+    if tenant is not None:
+        tenant_db_path(tenant)
+    return _tenant.set(tenant)
+
+
+def reset_tenant(token) -> None:
+    _tenant.reset(token)
+
+
+def current_tenant():
+    return _tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant):
+    """블록 안에서만 tenant의 DB를 씁니다. (CLI, 백그라운드 스레드 등)"""
+    token = set_tenant(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def list_tenants():
+    """TENANT_DIR에 DB 파일이 있는 사용자 이름들 (정렬)"""
+    if TENANT_DIR is None or not os.path.isdir(TENANT_DIR):
+        return []
+    return sorted(
+        name[:-3] for name in os.listdir(TENANT_DIR)
+        if name.endswith(".db") and _TENANT_RE.fullmatch(name[:-3])
+    )
+
+
+def current_db_path() -> str:
+    """지금 컨텍스트(사용자)가 쓰는 DB 파일 경로"""
+    tenant = _tenant.get()
+    return DB_NAME if tenant is None else tenant_db_path(tenant)
+
+
+def shared_db_path() -> str:
+    """
+    사용자와 상관없이 모두가 같이 쓰는 DB 파일 경로입니다. (가사 분석 캐시 등)
+    사용자별 DB를 안 쓰면 그냥 DB_NAME 파일 하나를 같이 써요.
+    """
+    return DB_NAME
+
+
+def get_pool(db_path=None):
+    """
+    DB 파일의 연결 풀을 돌려줍니다. (기본: 지금 사용자의 파일) 처음 부를 때 만들어요.
+
+    열린 풀이 MAX_OPEN_DBS개를 넘으면 가장 오래 안 쓴 풀부터 닫습니다.
+    연결을 빌려 간 풀(busy)은 건너뛰어요. (그런 풀만 남았으면 잠깐 한도를 넘겨 둡니다)
+    """
+    db_path = current_db_path() if db_path is None else db_path
+    with _pool_lock:
+        pool = _pools.get(db_path)
+        if pool is not None and not pool._closed:
+            _pools.move_to_end(db_path)
+            return pool
+        if db_path != DB_NAME:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        pool = _pools[db_path] = ConnectionPool(db_path, _pragmas, POOL_SIZE)
+        for path in list(_pools):
+            if len(_pools) <= MAX_OPEN_DBS:
+                break
+            if path != db_path and not _pools[path].busy:
+                _pools.pop(path).close_all()
+        return pool
+
+
+@contextmanager
+def _borrow(db_path=None):
+    """
+    (풀, 연결)을 빌립니다. 처음 보는 DB 파일이면 먼저 최신 구조로 맞춰요. (사용자 DB를 처음 쓸 때)
+    풀을 받은 직후 LRU로 닫혔으면 새 풀로 다시 시도합니다.
+    """
+    while True:
+        pool = get_pool(db_path)
+        try:
+            if pool.db_path not in _migrated_paths:
+                _migrate(pool)
+            conn = pool.acquire()
+        except sqlite3.ProgrammingError:
+            if pool._closed:
+                continue
+            raise
+        break
+    try:
+        yield pool, conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def connection(db_path=None):
+    """
+    풀에서 연결을 하나 빌려 쓰고, 블록이 끝나면 자동으로 반납합니다. (읽기용)
+    db_path를 주면 지금 사용자 대신 그 파일을 씁니다. (예: shared_db_path())
+    """
+    with _borrow(db_path) as (_, conn):
+        yield conn
+
+
+# 지금 스레드가 열어 둔 쓰기 트랜잭션 (transaction() 안에서 transaction()을 또 부르면 SAVEPOINT로 이어 써요)
+_tx_local = threading.local()
+
+
+@contextmanager
+def transaction(invalidate=True, durable=False, db_path=None):
+    """
+    쓰기용 연결입니다. BEGIN IMMEDIATE로 시작해서 블록이 끝나면 커밋(에러면 롤백)합니다.
+
+    IMMEDIATE로 쓰기 잠금을 처음부터 잡아 두면, 읽다가 쓰기로 바꾸는 순간에
+    busy_timeout을 무시하고 바로 "database is locked"가 나는 경우를 피할 수 있어요.
+
+    커밋하면 읽기 캐시(query_cache)의 쓰기 세대를 올려서 예전 조회 결과를 버립니다.
+    캐시된 읽기 함수와 상관없는 테이블만 고치는 경우엔 invalidate=False로 주면 돼요.
+
+    - 같은 스레드에서 transaction() 안에서 또 부르면 바깥 트랜잭션에 SAVEPOINT로 들어갑니다.
+      (안쪽 블록이 실패하면 안쪽만 되돌리고, 커밋은 바깥 블록이 끝날 때 한 번)
+      write_behind가 여러 쓰기를 한 트랜잭션으로 묶을 때 이걸 씁니다.
+    - durable=True면 이 커밋만 synchronous=FULL로 해서 커밋이 디스크에 닿은 뒤 돌아옵니다.
+    - db_path를 주면 지금 사용자 대신 그 파일에 씁니다. (connection()과 같음)
+    """
+    outer = getattr(_tx_local, "conn", None)
+    if outer is not None:
+        if _tx_local.path != (current_db_path() if db_path is None else db_path):
+            raise sqlite3.ProgrammingError("다른 사용자 DB의 트랜잭션 안에서는 쓸 수 없어요")
+        name = f"sp_{_tx_local.depth}"
+        _tx_local.depth += 1
+        _tx_local.invalidate = _tx_local.invalidate or invalidate
+        outer.execute(f"SAVEPOINT {name}")
+        try:
+            yield outer
+        except BaseException:
+            outer.execute(f"ROLLBACK TO {name}")
+            outer.execute(f"RELEASE {name}")
+            raise
+        else:
+            outer.execute(f"RELEASE {name}")
+        finally:
+            _tx_local.depth -= 1
+        return
+
+    with _borrow(db_path) as (pool, conn):
+        if durable:
+            conn.execute("PRAGMA synchronous=FULL")
+        _tx_local.conn, _tx_local.depth, _tx_local.invalidate = conn, 0, invalidate
+        _tx_local.path = pool.db_path
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+                if _tx_local.invalidate:
+                    query_cache.bump(pool.db_path)
+        finally:
+            _tx_local.conn = None
+            if durable:
+                conn.execute(f"PRAGMA synchronous={pool.pragmas.get('synchronous', 'NORMAL')}")
+
+
+def _cache_key_prefix():
+    # 사용자마다 DB 파일이 다르니까 캐시 키도 파일 경로로 나눕니다.
+    return current_db_path()
+
+
+def data_version(db_path=None):
+    """DB 파일(기본: 지금 사용자)의 PRAGMA data_version — 다른 프로세스가 커밋해도 바뀝니다."""
+    return get_pool(db_path).data_version()
+
+
+# 읽기 함수용 캐시 데코레이터: 같은 DB + 같은 인자 + 그 사이 쓰기가 없었으면 DB를 다시 읽지 않아요.
+# (다른 프로세스가 같은 파일에 쓴 것은 data_version으로 알아챕니다)
+_cached_read = query_cache.cached(_cache_key_prefix, version=data_version)
+
+
+def _traced(func):
+    """공개 DB 함수를 "db.함수이름" span으로 감쌉니다. (캐시에서 바로 나오면 sql=0으로 보여요)"""
+    return tracing.traced(f"db.{func.__name__}", rows=True)(func)
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def _migrate(pool):
+    """pool의 DB 파일을 최신 구조로 맞춥니다. 프로세스에서 파일마다 한 번만 실제로 확인해요."""
+    db_path = pool.db_path
+    if db_path in _migrated_paths:
+        return []
+    with _migrate_lock:
+        if db_path in _migrated_paths:
+            return []
+        with pool.connection() as conn:
+            applied = migrations.migrate(conn, shared=db_path == shared_db_path())
+        _migrated_paths.add(db_path)
+    # 출력은 부른 쪽이 정합니다. (앱은 toast, CLI는 print, 사용자별 DB/벤치마크는 조용히)
+    return applied
+
+
+@_traced
+def init_db():
+    """
+    데이터베이스를 최신 구조로 맞춥니다. (migrations.py의 번호 붙은 마이그레이션을 적용)
+
+    이 앱은 초보자용이기 때문에 "마이그레이션 도구"를 따로 실행하지 않아도
+    앱 실행만으로 DB가 최신 구조로 맞춰지도록(=자동 보정) 설계합니다.
+
+    Streamlit은 클릭할 때마다 이 함수를 다시 부르지만, 같은 프로세스에서
+    한 번 확인한 DB 파일은 그 뒤로 아무 것도 하지 않고 바로 돌아갑니다.
+    사용자별 DB는 처음 연결을 빌릴 때 알아서 맞춰지지만, 적용 목록을 보여 주려면 이걸 부르면 돼요.
+
+    반환값: 이번에 적용된 마이그레이션 [(번호, 이름), ...] (없으면 빈 리스트)
+    """
+    return _migrate(get_pool())
+
+def _get_song_id(conn, song_title, artist):
+    """
+    (제목, 가수)에 해당하는 song.id를 찾고, 없으면 새로 만듭니다.
+    제목이 비어 있으면 "노래 없음"이라서 None을 돌려줍니다.
+    """
+    title = (song_title or "").strip()
+    if not title:
+        return None
+    artist = (artist or "").strip()
+    title_key, artist_key = normalize_song_key(title), normalize_song_key(artist)
+    row = conn.execute(
+        "SELECT id FROM song WHERE title_key = ? AND artist_key = ?",
+        (title_key, artist_key),
+    ).fetchone()
+    if row:
+        return row[0]
+    cursor = conn.execute(
+        "INSERT INTO song (title, artist, title_key, artist_key) VALUES (?, ?, ?, ?)",
+        (title, artist, title_key, artist_key),
+    )
+    return cursor.lastrowid
+
+
+# add_words()에 넘기는 행(dict)의 키 목록 (빠진 키는 빈 문자열로 저장)
+WORD_FIELDS = (
+    "date",
+    "word",
+    "song_title",
+    "artist",
+    "reading",
+    "meaning",
+    "example",
+    "pronunciation",
+    "example_reading",
+    "example_pronunciation",
+    "example_meaning",
+)
+
+
+# 단어 한 행(예전 study_log 한 행)을 만드는 조인: study_event(e) + vocab(v) + example(x) + song(s)
+WORD_JOINS = """study_event AS e
+    JOIN vocab AS v ON v.id = e.vocab_id
+    LEFT JOIN example AS x ON x.id = e.example_id
+    LEFT JOIN song AS s ON s.id = e.song_id"""
+
+# 예전 study_log 컬럼 → 위 조인에서의 식 (노래/예문이 없으면 예전처럼 빈 글자)
+WORD_COLUMN_SQL = {
+    "id": "e.id",
+    "date": "e.date",
+    "word": "v.word",
+    "song_title": "COALESCE(s.title, '')",
+    "artist": "COALESCE(s.artist, '')",
+    "reading": "v.reading",
+    "meaning": "v.meaning",
+    "example": "COALESCE(x.text, '')",
+    "example_reading": "COALESCE(x.reading, '')",
+    "example_pronunciation": "COALESCE(x.pronunciation, '')",
+    "example_meaning": "COALESCE(x.meaning, '')",
+    "pronunciation": "v.pronunciation",
+    "song_id": "e.song_id",
+}
+
+VOCAB_KEY = ("word", "reading", "meaning", "pronunciation")
+EXAMPLE_KEY = ("example", "example_reading", "example_pronunciation", "example_meaning")
+
+
+def _word_columns(columns=tuple(WORD_COLUMN_SQL)) -> str:
+    return ", ".join(f"{WORD_COLUMN_SQL[c]} AS {c}" for c in columns)
+
+
+def _chunks(items, size=500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _vocab_ids(conn, rows):
+    """
+    (단어, 읽기, 뜻, 발음) → vocab.id 를 돌려줍니다. 없는 조합은 새로 만들어요.
+    (같은 단어라도 뜻이나 발음이 다르면 다른 행이라, 저장한 글자가 그대로 남습니다)
+    """
+    keys = list(dict.fromkeys(tuple(row[f] for f in VOCAB_KEY) for row in rows))
+    conn.executemany(
+        "INSERT OR IGNORE INTO vocab (word, reading, meaning, pronunciation) VALUES (?, ?, ?, ?)", keys
+    )
+    wanted = set(keys)
+    ids = {}
+    for chunk in _chunks({key[0] for key in keys}):
+        placeholders = ", ".join("?" * len(chunk))
+        for vocab_id, *key in conn.execute(
+            f"SELECT id, word, reading, meaning, pronunciation FROM vocab WHERE word IN ({placeholders})", chunk
+        ):
+            if tuple(key) in wanted:
+                ids[tuple(key)] = vocab_id
+    return ids
+
+
+def _example_ids(conn, rows):
+    """(예문, 읽기, 발음, 뜻) → example.id 를 돌려줍니다. (빈 예문은 빼요) 없는 조합은 새로 만들어요."""
+    keys = list(dict.fromkeys(tuple(row[f] for f in EXAMPLE_KEY) for row in rows if row["example"]))
+    conn.executemany(
+        "INSERT OR IGNORE INTO example (text, reading, pronunciation, meaning) VALUES (?, ?, ?, ?)", keys
+    )
+    wanted = set(keys)
+    ids = {}
+    for chunk in _chunks({key[0] for key in keys}):
+        placeholders = ", ".join("?" * len(chunk))
+        for example_id, *key in conn.execute(
+            f"SELECT id, text, reading, pronunciation, meaning FROM example WHERE text IN ({placeholders})", chunk
+        ):
+            if tuple(key) in wanted:
+                ids[tuple(key)] = example_id
+    return ids
+
+
+@_traced
+def add_words(rows):
+    """
+    여러 단어를 한 트랜잭션으로 한꺼번에 저장합니다. (커밋/fsync 1번)
+
+    rows: [{"date": ..., "word": ..., "meaning": ..., ...}, ...]  (키는 WORD_FIELDS 참고)
+    반환값: rows와 같은 순서로 "inserted" 또는 "ignored"
+      - "ignored": 같은 날짜에 같은 단어가 이미 있어서 저장하지 않은 행
+        (한 번에 넘긴 rows 안에서 겹치는 경우도 첫 번째만 저장됩니다)
+
+    단어 글자(읽기/뜻/발음)는 vocab에, 예문은 example에 서로 다른 조합마다 한 번씩만 두고
+    study_event에는 (날짜, 단어, 노래, 예문) 번호만 저장해요.
+    "같은 날짜에 같은 단어"는 읽기/뜻이 달라도 같은 단어로 봅니다. (DB 트리거도 같은 규칙)
+    """
+    rows = [{field: (row.get(field) or "") for field in WORD_FIELDS} for row in rows]
+    if not rows:
+        return []
+
+    statuses = ["ignored"] * len(rows)
+    with transaction() as conn:
+        # 1) 이미 DB에 있는 (date, word)를 날짜별로 한 번에 확인합니다.
+        words_by_date = {}
+        for row in rows:
+            words_by_date.setdefault(row["date"], set()).add(row["word"])
+        existing = set()
+        for date, words in words_by_date.items():
+            for chunk in _chunks(words):
+                placeholders = ", ".join("?" * len(chunk))
+                for (word,) in conn.execute(
+                    f"""
+                    SELECT v.word
+                    FROM vocab AS v
+                    JOIN study_event AS e ON e.vocab_id = v.id AND e.date = ?
+                    WHERE v.word IN ({placeholders})
+                    """,
+                    (date, *chunk),
+                ):
+                    existing.add((date, word))
+
+        # 2) 새로 넣을 행만 고릅니다.
+        new_rows = []
+        for idx, row in enumerate(rows):
+            key = (row["date"], row["word"])
+            if key in existing:
+                continue
+            existing.add(key)
+            new_rows.append(row)
+            statuses[idx] = "inserted"
+        if not new_rows:
+            return statuses
 
-    # 4. 다꾸 "노트 텍스트" 저장용 테이블 (날짜별 1개)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS diary_text (
-            date TEXT PRIMARY KEY,
-            content TEXT NOT NULL
+        # 3) 단어/예문/노래 번호를 한 번씩만 찾거나 만들고, 저장 기록은 executemany로 한 번에 넣습니다.
+        vocab_ids = _vocab_ids(conn, new_rows)
+        example_ids = _example_ids(conn, new_rows)
+        song_ids = {}
+        values = []
+        for row in new_rows:
+            song_key = (row["song_title"].strip(), row["artist"].strip())
+            if song_key not in song_ids:
+                song_ids[song_key] = _get_song_id(conn, *song_key)
+            values.append((
+                row["date"],
+                vocab_ids[tuple(row[f] for f in VOCAB_KEY)],
+                song_ids[song_key],
+                example_ids.get(tuple(row[f] for f in EXAMPLE_KEY)),
+            ))
+        # 1)~2)에서 (날짜, 단어)가 겹치는 행은 이미 뺐으니 그냥 INSERT 합니다.
+        conn.executemany(
+            "INSERT INTO study_event (date, vocab_id, song_id, example_id) VALUES (?, ?, ?, ?)",
+            values,
         )
-    """)
+    return statuses
 
-    conn.commit()
-    conn.close()
 
+@_traced
 def add_word(
     date,
     word,
@@ -90,119 +697,169 @@ def add_word(
     - example_pronunciation: 예문 한국어 발음
     - example_meaning: 예문 한국어 뜻
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO study_log (
-              date, word, song_title, artist,
-              reading, meaning, example, pronunciation,
-              example_reading, example_pronunciation, example_meaning
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            date,
-            word,
-            (song_title or "").strip(),
-            (artist or "").strip(),
-            reading,
-            meaning,
-            example,
-            pronunciation,
-            example_reading,
-            example_pronunciation,
-            example_meaning,
-        ))
-        conn.commit()
+        add_words([{
+            "date": date,
+            "word": word,
+            "meaning": meaning,
+            "example": example,
+            "reading": reading,
+            "pronunciation": pronunciation,
+            "song_title": song_title,
+            "artist": artist,
+            "example_reading": example_reading,
+            "example_pronunciation": example_pronunciation,
+            "example_meaning": example_meaning,
+        }])
     except Exception as e:
         print(f"Error adding word: {e}")
-    finally:
-        conn.close()
 
+@_traced
+@_cached_read
 def get_words_by_date(date):
     """특정 날짜의 단어 목록을 가져옵니다."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM study_log WHERE date = ?", (date,))
-    rows = cursor.fetchall()
-    conn.close()
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT {_word_columns()} FROM {WORD_JOINS} WHERE e.date = ? ORDER BY e.id", (date,)
+        ).fetchall()
     return [dict(row) for row in rows]
 
-def get_recorded_dates():
-    """기록이 있는 모든 날짜를 가져옵니다."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT date FROM study_log")
-    rows = cursor.fetchall()
-    conn.close()
-    return [row[0] for row in rows]
+@_traced
+@_cached_read
+def get_recorded_dates(start_date=None, end_date=None):
+    """
+    기록이 있는 날짜를 가져옵니다.
+    start_date/end_date를 주면 그 기간(양 끝 포함)만 가져와요. (캘린더에 보이는 달만)
+    """
+    return [row["date"] for row in get_daily_summary(start_date, end_date)]
+
+
+@_traced
+@_cached_read
+def get_daily_summary(start_date=None, end_date=None):
+    """
+    날짜별 요약(daily_summary)을 기간(start_date~end_date) 안에서 날짜순으로 가져옵니다.
+
+    반환 예시:
+    [
+      {"date": "2025-12-19", "word_count": 5, "song_count": 2}
+    ]
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT date, word_count, song_count
+            FROM daily_summary
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+            """,
+            (start_date or "0000-00-00", end_date or "9999-99-99"),
+        ).fetchall()
+    return [dict(r) for r in rows]
 
 
+@_traced
 def delete_word(word_id: int) -> None:
     """id로 단어(행) 1개를 삭제합니다."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM study_log WHERE id = ?", (word_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # 마지막 저장 기록이 빠진 단어/예문은 트리거가 같이 지워요.
+        conn.execute("DELETE FROM study_event WHERE id = ?", (word_id,))
 
 
+@_traced
+def delete_words(word_ids) -> int:
+    """
+    id 여러 개를 한 트랜잭션으로 지웁니다. (스티커 여러 장을 골라 지울 때)
+    반환값: 지운 행 수
+    """
+    word_ids = [int(i) for i in word_ids]
+    if not word_ids:
+        return 0
+    removed = 0
+    with transaction() as conn:
+        for chunk in _chunks(word_ids):
+            marks = ",".join("?" * len(chunk))
+            removed += conn.execute(f"DELETE FROM study_event WHERE id IN ({marks})", chunk).rowcount
+    return removed
+
+
+@_traced
+@_cached_read
 def get_layout(date: str):
     """
     특정 날짜의 다꾸 레이아웃(JSON 문자열)을 가져옵니다.
-    없으면 None을 반환합니다.
+    없으면 None을 반환합니다. (스냅샷 + 변경분을 합친 현재 모습, layout_store 참고)
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT layout_json FROM diary_layout WHERE date = ?", (date,))
-    row = cursor.fetchone()
-    conn.close()
-    return row[0] if row else None
+    with connection() as conn:
+        return layout_store.load_json(conn, date)
 
 
-def save_layout(date: str, layout_json: str) -> None:
-    """특정 날짜의 다꾸 레이아웃(JSON 문자열)을 저장(업서트)합니다."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO diary_layout (date, layout_json)
-        VALUES (?, ?)
-        ON CONFLICT(date) DO UPDATE SET layout_json = excluded.layout_json
-        """,
-        (date, layout_json),
-    )
-    conn.commit()
-    conn.close()
+@_traced
+def save_layout(date: str, layout_json) -> int:
+    """
+    특정 날짜의 다꾸 레이아웃을 저장합니다. (JSON 문자열 또는 dict/list)
+
+    전체를 다시 쓰지 않고 지금 레이아웃과 달라진 부분만 변경분으로 쌓아요.
+    반환값: 저장 뒤 레이아웃 version
+    """
+    layout = json.loads(layout_json) if isinstance(layout_json, str) else layout_json
+    with transaction() as conn:
+        return layout_store.save(conn, date, layout)
 
 
+@_traced
+def compact_layouts() -> int:
+    """쌓인 레이아웃 변경분을 모두 스냅샷으로 합칩니다. 반환값: 합친 날짜 수"""
+    with transaction(invalidate=False) as conn:
+        return layout_store.compact_all(conn)
+
+
+@_traced
+@_cached_read
 def get_diary_text(date: str) -> str:
     """특정 날짜의 '노트 텍스트'를 가져옵니다. 없으면 빈 문자열을 반환합니다."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT content FROM diary_text WHERE date = ?", (date,))
-    row = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("SELECT content FROM diary_text WHERE date = ?", (date,)).fetchone()
     return row[0] if row and row[0] is not None else ""
 
 
-def save_diary_text(date: str, content: str) -> None:
-    """특정 날짜의 '노트 텍스트'를 저장(업서트)합니다."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO diary_text (date, content)
-        VALUES (?, ?)
-        ON CONFLICT(date) DO UPDATE SET content = excluded.content
-        """,
-        (date, content),
-    )
-    conn.commit()
-    conn.close()
+@_traced
+def save_diary_text(date: str, content: str) -> int:
+    """
+    특정 날짜의 '노트 텍스트'를 저장합니다. 반환값: 저장 뒤 버전 번호
+
+    바로 전 글은 버전 기록(diary_text_history)에 작은 diff로 남고,
+    1분 안에 이어서 고친 글은 같은 버전으로 묶여요. (note_store 참고)
+    """
+    with transaction() as conn:
+        return note_store.save(conn, date, content)
+
+
+@_traced
+@_cached_read
+def get_diary_text_versions(date: str):
+    """노트의 버전 목록(최신이 먼저)을 가져옵니다. [{"version", "saved_at", "chars", "preview", "current"}, ...]"""
+    with connection() as conn:
+        return note_store.list_versions(conn, date)
+
+
+@_traced
+@_cached_read
+def get_diary_text_version(date: str, version: int):
+    """노트의 특정 버전 글을 가져옵니다. 없으면 None"""
+    with connection() as conn:
+        return note_store.get_version(conn, date, version)
+
 
+@_traced
+def restore_diary_text(date: str, version: int):
+    """노트를 예전 버전의 글로 되돌립니다. (새 버전으로 저장) 반환값: 새 버전 번호 또는 None"""
+    with transaction() as conn:
+        return note_store.restore(conn, date, version)
 
+
+@_traced
+@_cached_read
 def get_songs_summary(start_date: str, end_date: str):
     """
     기간(start_date~end_date) 동안 저장한 단어들을 '노래(제목/가수)' 기준으로 요약해 반환합니다.
@@ -212,51 +869,521 @@ def get_songs_summary(start_date: str, end_date: str):
       {"song_title": "Lemon", "artist": "米津玄師", "word_count": 12, "study_days": 3, "last_saved_date": "2025-12-19"}
     ]
     """
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    # 저장 기록 원본 대신 노래별·날짜별 롤업(song_daily_rollup)을 기간만큼 더합니다.
+    # 행 수가 "저장한 단어 수"가 아니라 "노래 × 공부한 날" 수라서 훨씬 적어요.
+    with connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT
+              s.title AS song_title,
+              s.artist AS artist,
+              t.word_count,
+              t.study_days,
+              t.last_saved_date
+            FROM (
+              SELECT
+                song_id,
+                SUM(word_count) AS word_count,
+                COUNT(*) AS study_days,
+                MAX(date) AS last_saved_date
+              FROM song_daily_rollup
+              WHERE date BETWEEN ? AND ?
+              GROUP BY song_id
+            ) AS t
+            JOIN song AS s ON s.id = t.song_id
+            ORDER BY t.last_saved_date DESC, t.word_count DESC;
+            """,
+            (start_date, end_date),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@_traced
+@_cached_read
+def get_words_by_song(song_title: str, artist: str, start_date: str, end_date: str):
+    """
+    특정 노래(제목/가수)에서 저장한 단어를 기간(start_date~end_date) 내에서 가져옵니다.
+    """
+    # 제목/가수를 정규화 키로 바꿔 song을 찾고, (song_id, date) 인덱스로 기간만 읽습니다.
+    # 제목이 비어 있으면 "노래 없이 저장한 단어"(song_id IS NULL)를 돌려줍니다.
+    title_key = normalize_song_key(song_title)
+    artist_key = normalize_song_key(artist)
+    with connection() as conn:
+        if not title_key:
+            song_filter, params = "e.song_id IS NULL", ()
+        else:
+            row = conn.execute(
+                "SELECT id FROM song WHERE title_key = ? AND artist_key = ?",
+                (title_key, artist_key),
+            ).fetchone()
+            if not row:
+                return []
+            song_filter, params = "e.song_id = ?", (row[0],)
+        rows = conn.execute(
+            f"""
+            SELECT {_word_columns()}
+            FROM {WORD_JOINS}
+            WHERE {song_filter}
+              AND e.date BETWEEN ? AND ?
+            ORDER BY e.date DESC, e.id DESC;
+            """,
+            (*params, start_date, end_date),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+
+# --- 페이지 단위(keyset) 조회 ---
+# 카드 화면은 한 번에 한 페이지만 그리므로, 필요한 컬럼만 PAGE_SIZE개씩 가져옵니다.
+# OFFSET 대신 "마지막으로 본 행"(커서)부터 이어서 읽어서, 몇 번째 페이지든 비용이 같아요.
+
+PAGE_SIZE = 12
+
+# 날짜별 노트 카드에 쓰는 컬럼
+NOTE_CARD_COLUMNS = (
+    "id", "date", "word", "song_title", "artist", "reading", "pronunciation", "meaning",
+    "example", "example_reading", "example_pronunciation", "example_meaning",
+)
+
+# 노래별 카드에 쓰는 컬럼
+SONG_CARD_COLUMNS = ("id", "date", "word", "reading", "pronunciation", "meaning", "example")
+
+
+@_traced
+@_cached_read
+def get_words_by_date_page(date: str, limit: int = PAGE_SIZE, after_id=None):
+    """
+    특정 날짜의 단어를 id 오름차순으로 한 페이지만 가져옵니다.
+
+    after_id: 이전 페이지의 next_cursor (첫 페이지는 None)
+    반환값: (rows, next_cursor) — 다음 페이지가 없으면 next_cursor는 None
+    """
+    # 좁은 study_event에서 페이지에 들어갈 id만 먼저 고르고, 그 행들만 단어/예문/노래와 잇습니다.
+    with connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {_word_columns(NOTE_CARD_COLUMNS)}
+            FROM {WORD_JOINS}
+            WHERE e.id IN (
+              SELECT id FROM study_event
+              WHERE date = ? AND id > ?
+              ORDER BY id
+              LIMIT ?
+            )
+            ORDER BY e.id
+            """,
+            (date, after_id if after_id is not None else -1, limit + 1),
+        ).fetchall()
+    rows = [dict(r) for r in rows]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+@_traced
+@_cached_read
+def get_words_by_song_page(song_title: str, artist: str, start_date: str, end_date: str,
+                           limit: int = PAGE_SIZE, cursor=None):
+    """
+    특정 노래에서 저장한 단어를 최신순(date DESC, id DESC)으로 한 페이지만 가져옵니다.
+
+    cursor: 이전 페이지의 next_cursor ((date, id) 튜플, 첫 페이지는 None)
+    반환값: (rows, next_cursor) — 다음 페이지가 없으면 next_cursor는 None
+    """
+    title_key = normalize_song_key(song_title)
+    artist_key = normalize_song_key(artist)
+    cursor_date, cursor_id = cursor if cursor else ("9999-99-99", 2 ** 62)
+    # 커서 날짜를 범위 끝으로도 써서, 인덱스에서 이미 본 날짜들은 아예 건너뛰게 합니다.
+    upper_date = min(end_date, cursor_date)
 
-    cursor.execute(
+    with connection() as conn:
+        if not title_key:
+            song_filter = "e.song_id IS NULL"
+            params = ()
+        else:
+            row = conn.execute(
+                "SELECT id FROM song WHERE title_key = ? AND artist_key = ?",
+                (title_key, artist_key),
+            ).fetchone()
+            if not row:
+                return [], None
+            song_filter = "e.song_id = ?"
+            params = (row[0],)
+
+        rows = conn.execute(
+            f"""
+            SELECT {_word_columns(SONG_CARD_COLUMNS)}
+            FROM {WORD_JOINS}
+            WHERE {song_filter}
+              AND e.date BETWEEN ? AND ?
+              AND (e.date, e.id) < (?, ?)
+            ORDER BY e.date DESC, e.id DESC
+            LIMIT ?
+            """,
+            (*params, start_date, upper_date, cursor_date, cursor_id, limit + 1),
+        ).fetchall()
+    rows = [dict(r) for r in rows]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = (last["date"], last["id"])
+    return rows[:limit], next_cursor
+
+
+# --- 단어 검색 (FTS5 trigram) ---
+# vocab_fts(단어/읽기/발음/뜻)와 example_fts(예문/예문 뜻)는 글자 3개 단위(trigram)로 인덱스를 만들어서,
+# 3글자 이상인 검색어는 인덱스로 바로 찾습니다. 2글자 이하(예: "光", "苦い")는 trigram으로 찾을 수 없어서
+# LIKE로 찾아요. 어느 쪽이든 서로 다른 단어/예문만 뒤지고, 걸린 단어/예문을 쓴 저장 기록을 돌려줍니다.
+# 검색어를 띄어 쓰면 모든 검색어가 (단어나 예문 어딘가에) 들어간 기록만 찾습니다. (AND)
+
+SEARCH_COLUMNS = migrations.SEARCH_COLUMNS
+
+# bm25 컬럼 가중치 (SEARCH_COLUMNS 순서): 단어 자체에 걸린 결과가 예문에 걸린 결과보다 위로 오게 합니다.
+SEARCH_WEIGHTS = (10.0, 6.0, 4.0, 4.0, 1.0, 1.0)
+
+# SEARCH_COLUMNS 앞 4개는 vocab, 뒤 2개는 example 컬럼이에요.
+_SEARCH_TABLES = (
+    ("vocab", migrations.VOCAB_SEARCH_COLUMNS, "e.vocab_id", SEARCH_WEIGHTS[:4]),
+    ("example", migrations.EXAMPLE_SEARCH_COLUMNS, "e.example_id", SEARCH_WEIGHTS[4:]),
+)
+
+# 검색어에 걸린 단어/예문이 이보다 많으면(예: 모든 뜻에 들어 있는 흔한 말) bm25 점수를 전부 계산해
+# 정렬하는 데만 수백 ms가 걸려요. 이럴 때는 관련도 대신 최근 저장 순으로 보여 줍니다.
+SEARCH_RANK_LIMIT = 5000
+
+# 짧은 검색어(LIKE)만 있을 때는 먼저 최근 기록 이만큼에서만 찾아봅니다. 흔한 글자("の")는
+# 여기서 한 페이지가 바로 차고, 못 채우면 그때 단어/예문 전체를 LIKE로 훑어요.
+SEARCH_RECENT_WINDOW = 2000
+
+SEARCH_RESULT_COLUMNS = (
+    "id", "date", "word", "song_title", "artist", "reading", "pronunciation", "meaning",
+    "example", "example_meaning",
+)
+
+# 결과에서 검색어 부분을 감싸는 표시 문자입니다. (HTML로 바꾸는 건 화면 쪽에서: sticker_cards)
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+def _search_terms(query: str):
+    terms = []
+    for term in (query or "").split():
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _mark(text, pattern):
+    if not text:
+        return text
+    return pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", str(text))
+
+
+@_traced
+@_cached_read
+def search_words(query: str, limit: int = PAGE_SIZE, offset: int = 0):
+    """
+    저장한 단어를 단어/읽기/발음/뜻/예문/예문 뜻에서 찾습니다.
+
+    반환값: 관련도 순 [{...SEARCH_RESULT_COLUMNS, "highlight": {컬럼: 표시 문자가 들어간 글자}}, ...]
+    (3글자 이상 검색어가 없거나 걸린 단어/예문이 SEARCH_RANK_LIMIT보다 많으면 관련도 대신 최근 저장 순)
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+
+    # 검색어마다 "단어나 예문 중 한 곳에 들어 있는 기록" 조건을 만듭니다.
+    # (IN 안의 서브쿼리는 한 번만 돌아서, 서로 다른 단어/예문 수만큼만 뒤져요)
+    conditions, params, phrases = [], [], []
+    for term in terms:
+        if len(term) >= 3:
+            # 검색어는 따옴표로 감싼 구(phrase)로 넘깁니다. (AND/OR/* 같은 FTS 문법으로 해석되지 않게)
+            phrase = '"' + term.replace('"', '""') + '"'
+            phrases.append(phrase)
+            parts = [
+                f"{ref} IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)"
+                for table, _, ref, _ in _SEARCH_TABLES
+            ]
+            params += [phrase] * len(_SEARCH_TABLES)
+        else:
+            like = f"%{_like_escape(term)}%"
+            parts = []
+            for table, columns, ref, _ in _SEARCH_TABLES:
+                like_sql = " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns)
+                parts.append(f"{ref} IN (SELECT id FROM {table} WHERE {like_sql})")
+                params += [like] * len(columns)
+        conditions.append("(" + " OR ".join(parts) + ")")
+    where = " AND ".join(conditions)
+    columns = _word_columns(SEARCH_RESULT_COLUMNS)
+
+    rank = False
+    if phrases:
+        match_any = " OR ".join(phrases)
+        with connection() as conn:
+            matched = sum(
+                conn.execute(
+                    f"SELECT COUNT(*) FROM {table}_fts WHERE {table}_fts MATCH ?", (match_any,)
+                ).fetchone()[0]
+                for table, _, _, _ in _SEARCH_TABLES
+            )
+        rank = matched <= SEARCH_RANK_LIMIT
+
+    if rank:
+        # 걸린 단어/예문마다 bm25 점수를 한 번씩 계산해 두고, 기록의 점수는 둘을 더한 값입니다.
+        scores = ",\n".join(
+            f"""{table}_score AS MATERIALIZED (
+                SELECT rowid AS id, bm25({table}_fts, {", ".join(str(w) for w in weights)}) AS score
+                FROM {table}_fts WHERE {table}_fts MATCH ?
+            )"""
+            for table, _, _, weights in _SEARCH_TABLES
+        )
+        sql = f"""
+            WITH {scores}
+            SELECT {columns}
+            FROM {WORD_JOINS}
+            LEFT JOIN vocab_score AS vs ON vs.id = e.vocab_id
+            LEFT JOIN example_score AS xs ON xs.id = e.example_id
+            WHERE {where}
+            ORDER BY COALESCE(vs.score, 0) + COALESCE(xs.score, 0), e.id DESC
+            LIMIT ? OFFSET ?
         """
-        SELECT
-          COALESCE(song_title, '') AS song_title,
-          COALESCE(artist, '') AS artist,
-          COUNT(*) AS word_count,
-          COUNT(DISTINCT date) AS study_days,
-          MAX(date) AS last_saved_date
-        FROM study_log
-        WHERE date BETWEEN ? AND ?
-          AND song_title IS NOT NULL
-          AND TRIM(song_title) <> ''
-        GROUP BY song_title, artist
-        ORDER BY last_saved_date DESC, word_count DESC;
-        """,
-        (start_date, end_date),
+        params = [match_any] * len(_SEARCH_TABLES) + params
+    else:
+        sql = f"""
+            SELECT {columns}
+            FROM {WORD_JOINS}
+            WHERE {where}
+            ORDER BY e.id DESC
+            LIMIT ? OFFSET ?
+        """
+
+    with connection() as conn:
+        rows = None
+        if not phrases:
+            recent_where = " AND ".join(
+                "(" + " OR ".join(f"{WORD_COLUMN_SQL[c]} LIKE ? ESCAPE '\\'" for c in SEARCH_COLUMNS) + ")"
+                for _ in terms
+            )
+            recent = conn.execute(
+                f"""
+                SELECT {columns}
+                FROM {WORD_JOINS}
+                WHERE e.id > (SELECT COALESCE(MAX(id), 0) FROM study_event) - ?
+                  AND {recent_where}
+                ORDER BY e.id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (
+                    SEARCH_RECENT_WINDOW,
+                    *[f"%{_like_escape(t)}%" for t in terms for _ in SEARCH_COLUMNS],
+                    limit,
+                    offset,
+                ),
+            ).fetchall()
+            # 한 페이지가 다 찼으면 그게 답이에요. (창 밖의 기록은 모두 id가 더 작아서 뒤쪽 페이지)
+            if len(recent) >= limit:
+                rows = [dict(r) for r in recent]
+        if rows is None:
+            rows = [dict(r) for r in conn.execute(sql, (*params, limit, offset)).fetchall()]
+
+    # 긴 검색어부터 맞춰야 "かなしい"가 "かな"보다 먼저 감싸져요.
+    pattern = re.compile(
+        "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)),
+        re.IGNORECASE,
     )
-    rows = cursor.fetchall()
-    conn.close()
+    for row in rows:
+        row["highlight"] = {c: _mark(row.get(c), pattern) for c in SEARCH_COLUMNS}
+    return rows
+
+
+@_traced
+def rebuild_search_index() -> None:
+    """검색 인덱스(vocab_fts / example_fts)를 vocab / example에서 처음부터 다시 만듭니다."""
+    with transaction(invalidate=False) as conn:
+        for table, _, _, _ in _SEARCH_TABLES:
+            conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+# --- 복습(SRS) ---
+# review_state는 (due_at, log_id) 인덱스 순서대로 앞에서부터 읽기만 하고,
+# 답은 모아서 한 트랜잭션으로 씁니다. (계산은 srs.py)
+# 조회 시각(now)이 매번 달라서 읽기 캐시(_cached_read)는 쓰지 않아요.
+
+REVIEW_STATE_COLUMNS = (
+    "log_id", "ease", "interval_days", "reps", "lapses", "due_at", "last_reviewed_at",
+)
+
+REVIEW_CARD_COLUMNS = (
+    "date", "word", "song_title", "artist", "reading", "pronunciation", "meaning",
+    "example", "example_reading", "example_pronunciation", "example_meaning",
+)
+
+
+@_traced
+def get_due_reviews(now: float, limit: int = 20):
+    """
+    지금(now, epoch 초) 복습할 차례인 카드를 due_at이 이른 순서로 limit개 가져옵니다.
+
+    반환값: [{...REVIEW_STATE_COLUMNS, ...REVIEW_CARD_COLUMNS}, ...]
+    """
+    columns = ", ".join(f"r.{c}" for c in REVIEW_STATE_COLUMNS) + ", " + _word_columns(REVIEW_CARD_COLUMNS)
+    with connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {columns}
+            FROM review_state AS r
+            JOIN {WORD_JOINS}
+            WHERE e.id = r.log_id AND r.due_at <= ?
+            ORDER BY r.due_at, r.log_id
+            LIMIT ?
+            """,
+            (now, limit),
+        ).fetchall()
     return [dict(r) for r in rows]
 
 
-def get_words_by_song(song_title: str, artist: str, start_date: str, end_date: str):
+@_traced
+def count_due_reviews(now: float) -> int:
+    """지금 복습할 차례인 카드 수 (due_at 인덱스 범위만 셉니다)"""
+    with connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM review_state WHERE due_at <= ?", (now,)
+        ).fetchone()[0]
+
+
+@_traced
+def record_reviews(states) -> int:
     """
-    특정 노래(제목/가수)에서 저장한 단어를 기간(start_date~end_date) 내에서 가져옵니다.
+    복습 결과(srs.schedule이 돌려준 상태들)를 한 번에 저장합니다. (DB 커밋 1번)
+
+    반환값: 실제로 바뀐 카드 수 (그 사이 단어가 지워졌으면 그만큼 적어요)
     """
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    params = [
+        (s["ease"], s["interval_days"], s["reps"], s["lapses"], s["due_at"], s["last_reviewed_at"], s["log_id"])
+        for s in states
+    ]
+    if not params:
+        return 0
+    with transaction(invalidate=False) as conn:
+        before = conn.total_changes
+        conn.executemany(
+            """
+            UPDATE review_state
+            SET ease = ?, interval_days = ?, reps = ?, lapses = ?, due_at = ?, last_reviewed_at = ?
+            WHERE log_id = ?
+            """,
+            params,
+        )
+        return conn.total_changes - before
 
-    cursor.execute(
+
+# --- 롤업(요약 테이블) 검증/재계산 ---
+# daily_summary / song_daily_rollup은 트리거로 유지되지만, 예전 버전으로 DB를 직접 고쳤거나
+# 트리거 없이 데이터를 옮긴 경우 어긋날 수 있어요. 아래 함수(또는 CLI)로 확인/복구합니다.
+#   python db_manager.py verify
+#   python db_manager.py rebuild
+
+_ROLLUP_QUERIES = {
+    "daily_summary": (
+        "SELECT date, word_count, song_count FROM daily_summary",
         """
-        SELECT *
-        FROM study_log
-        WHERE date BETWEEN ? AND ?
-          AND TRIM(COALESCE(song_title, '')) = TRIM(?)
-          AND TRIM(COALESCE(artist, '')) = TRIM(?)
-        ORDER BY date DESC, id DESC;
+        SELECT date, COUNT(*), COUNT(DISTINCT song_id)
+        FROM study_event
+        GROUP BY date
         """,
-        (start_date, end_date, song_title or "", artist or ""),
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
\ No newline at end of file
+        ("date",),
+    ),
+    "song_daily_rollup": (
+        "SELECT date, song_id, word_count FROM song_daily_rollup",
+        """
+        SELECT date, song_id, COUNT(*)
+        FROM study_event
+        WHERE song_id IS NOT NULL
+        GROUP BY date, song_id
+        """,
+        ("date", "song_id"),
+    ),
+}
+
+
+@_traced
+def verify_rollups():
+    """
+    요약 테이블을 저장 기록(study_event) 원본으로 다시 계산한 값과 비교합니다.
+
+    반환값: {"daily_summary": [차이, ...], "song_daily_rollup": [차이, ...]}
+    차이 예시: {"key": ("2025-12-19",), "stored": (5, 2), "expected": (6, 2)}
+    (모든 리스트가 비어 있으면 정상)
+    """
+    report = {}
+    with connection() as conn:
+        for table, (stored_sql, expected_sql, key_cols) in _ROLLUP_QUERIES.items():
+            n = len(key_cols)
+            stored = {tuple(r[:n]): tuple(r[n:]) for r in conn.execute(stored_sql)}
+            expected = {tuple(r[:n]): tuple(r[n:]) for r in conn.execute(expected_sql)}
+            diffs = []
+            for key in sorted(stored.keys() | expected.keys(), key=repr):
+                if stored.get(key) != expected.get(key):
+                    diffs.append({"key": key, "stored": stored.get(key), "expected": expected.get(key)})
+            report[table] = diffs
+    return report
+
+
+@_traced
+def rebuild_rollups() -> None:
+    """요약 테이블을 저장 기록(study_event)에서 처음부터 다시 계산합니다. (한 트랜잭션)"""
+    with transaction() as conn:
+        for table, (_, expected_sql, _) in _ROLLUP_QUERIES.items():
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} {expected_sql}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="My Music Diary DB 도구")
+    parser.add_argument("--db", help=f"DB 파일 경로 (기본: {DB_NAME})")
+    parser.add_argument("--tenant-dir", help="사용자별 DB 폴더 (기본: VOCA_TENANT_DIR)")
+    parser.add_argument("--tenant", action="append", help="이 사용자의 DB에만 실행 (여러 번 줄 수 있음)")
+    parser.add_argument("--all-tenants", action="store_true", help="폴더의 모든 사용자 DB에 실행")
+    parser.add_argument("command", choices=["migrate", "verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    if args.db or args.tenant_dir:
+        configure(db_path=args.db, tenant_dir=args.tenant_dir)
+    tenants = list_tenants() if args.all_tenants else (args.tenant or [None])
+    status = 0
+    for tenant in tenants:
+        if tenant is not None:
+            print(f"[{tenant}]")
+        with use_tenant(tenant):
+            status = max(status, _run_command(args.command))
+    return status
+
+
+def _run_command(command):
+    for version, name in init_db():
+        print(f"migration applied: {version:03d}_{name}")
+
+    if command == "verify":
+        report = verify_rollups()
+        bad = 0
+        for table, diffs in report.items():
+            print(f"{table}: {'OK' if not diffs else f'{len(diffs)} mismatch(es)'}")
+            for diff in diffs[:20]:
+                print(f"  {diff['key']}: stored={diff['stored']} expected={diff['expected']}")
+            bad += len(diffs)
+        return 1 if bad else 0
+    if command == "rebuild":
+        rebuild_rollups()
+        rebuild_search_index()
+        compacted = compact_layouts()
+        print(f"rollups and search index rebuilt, {compacted} layout(s) compacted")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
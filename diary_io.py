@@ -0,0 +1,365 @@
+"""
+다꾸 기록 내보내기/가져오기 모듈입니다. (CSV / NDJSON / Anki TSV)
+
+내보내기는 DB에서 fetchmany로 BATCH_SIZE 행씩 읽어서 바로바로 글자로 바꿔 내보내는
+제너레이터라서, 기록이 아무리 많아도 메모리에 전부 올리지 않아요.
+(한 번의 내보내기는 연결 하나의 읽기 트랜잭션 안에서 끝나서, 도중에 누가 저장해도 같은 시점의 내용이 나옵니다.
+ NDJSON처럼 여러 표를 담을 때도 단어/노트/레이아웃이 서로 어긋나지 않아요)
+
+- csv: 표 하나(words / diary_text / diary_layout)씩. 엑셀에서 한글이 깨지지 않게 BOM을 붙여요.
+- ndjson: 한 줄에 JSON 하나. 세 표를 한 파일에 담을 수 있어서 기기 사이 옮기기/합치기용으로 좋아요.
+  {"type": "word", ...} / {"type": "diary_text", ...} / {"type": "diary_layout", ...}
+- anki: Anki "텍스트 파일 가져오기"용 TSV (앞면: 단어, 뒷면: 읽기/발음/뜻/예문, 태그: 노래). 내보내기만 돼요.
+
+가져오기는 행마다 검사한 뒤 BATCH_SIZE개씩 끊어서 트랜잭션 하나로 넣습니다.
+단어는 db_manager.add_words를 쓰므로 같은 날짜의 같은 단어는 건너뛰어요.
+
+CLI:
+    python diary_io.py export --format ndjson backup.ndjson
+    python diary_io.py export --format csv --table words words.csv
+    python diary_io.py import backup.ndjson
+"""
+import csv
+import html
+import io
+import json
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import db_manager
+import layout_store
+import note_store
+
+BATCH_SIZE = 1000
+
+FORMATS = ("csv", "ndjson", "anki")
+
+# 표 이름 → (DB 테이블 또는 뷰, 컬럼): SELECT로 바로 읽는 것들
+TABLES = {
+    # 단어는 vocab / example / study_event로 나뉘어 있어서, 예전 모양 그대로 돌려주는 study_log 뷰로 읽어요.
+    "words": ("study_log", db_manager.WORD_FIELDS),
+    "diary_text": ("diary_text", ("date", "content")),
+}
+# 표 이름 → (읽는 함수, 컬럼): 표 하나로 읽을 수 없어서 저장 모듈이 읽어 주는 것들
+STORES = {
+    # 레이아웃은 스냅샷 + 변경분으로 나뉘어 저장돼요.
+    "diary_layout": (layout_store.iter_layouts, ("date", "layout_json")),
+}
+# 내보내기/가져오기할 수 있는 표 이름 → 컬럼
+COLUMNS = {name: columns for name, (_, columns) in {**TABLES, **STORES}.items()}
+
+# NDJSON 한 줄의 "type" 값 ↔ 표 이름
+_NDJSON_TYPES = {"word": "words", "diary_text": "diary_text", "diary_layout": "diary_layout"}
+
+# 가져오기 결과에 남길 오류 줄 수 (나머지는 개수만 셉니다)
+MAX_ERRORS = 100
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+# --- 내보내기 ---
+
+@contextmanager
+def read_snapshot():
+    """연결 하나를 빌려 읽기 트랜잭션을 열어 둡니다. 그 안의 SELECT는 모두 같은 시점의 내용을 봐요."""
+    with db_manager.connection() as conn:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+
+def iter_rows(table: str, batch_size: int = BATCH_SIZE, conn=None):
+    """
+    표의 행을 dict로 하나씩 돌려주는 제너레이터입니다. (DB에서는 batch_size개씩 읽어요)
+    conn을 주면 그 연결(read_snapshot)에서 읽고, 없으면 이 표 하나만 스냅샷으로 읽습니다.
+    """
+    if conn is None:
+        with read_snapshot() as conn:
+            yield from iter_rows(table, batch_size, conn)
+        return
+    if table in STORES:
+        reader, _ = STORES[table]
+        yield from reader(conn)
+        return
+    db_table, columns = TABLES[table]
+    # 뷰에는 rowid가 없어서 단어는 id(저장 순서)로 정렬합니다.
+    order = "id" if table == "words" else "rowid"
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {db_table} ORDER BY {order}")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield {c: row[c] for c in columns}
+
+
+def export_csv(table: str = "words", batch_size: int = BATCH_SIZE):
+    """CSV 글자 덩어리를 차례로 돌려줍니다. (머리글 포함, 첫 덩어리에 BOM)"""
+    columns = COLUMNS[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for count, row in enumerate(iter_rows(table, batch_size), 1):
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(tables=tuple(COLUMNS), batch_size: int = BATCH_SIZE):
+    """NDJSON 줄을 차례로 돌려줍니다. (모든 표를 같은 읽기 트랜잭션에서 읽어요)"""
+    types = {table: kind for kind, table in _NDJSON_TYPES.items()}
+    with read_snapshot() as conn:
+        for table in tables:
+            for row in iter_rows(table, batch_size, conn):
+                yield json.dumps({"type": types[table], **row}, ensure_ascii=False) + "\n"
+
+
+def _anki_field(text) -> str:
+    # Anki는 html:true일 때 탭/줄바꿈을 필드 구분자로 읽으므로 <br>로 바꿉니다.
+    return html.escape(text or "").replace("\t", " ").replace("\r\n", "<br>").replace("\n", "<br>")
+
+
+def export_anki(batch_size: int = BATCH_SIZE):
+    """Anki에서 가져올 수 있는 TSV 줄을 차례로 돌려줍니다. (단어만)"""
+    yield "#separator:tab\n#html:true\n#tags column:3\n"
+    for row in iter_rows("words", batch_size):
+        front = _anki_field(row["word"])
+        back_lines = [
+            _anki_field(row["reading"]),
+            f"[{_anki_field(row['pronunciation'])}]" if row["pronunciation"] else "",
+            f"<b>{_anki_field(row['meaning'])}</b>",
+            _anki_field(row["example"]),
+            _anki_field(row["example_meaning"]),
+        ]
+        back = "<br>".join(line for line in back_lines if line)
+        # 태그에는 공백을 쓸 수 없어서 _로 바꿉니다.
+        tags = " ".join(
+            "_".join(t.split()) for t in ("voca_diary", row["song_title"] or "") if t.strip()
+        )
+        yield f"{front}\t{back}\t{tags}\n"
+
+
+def export_chunks(fmt: str, table: str = "words", batch_size: int = BATCH_SIZE):
+    """형식(fmt)에 맞는 내보내기 제너레이터를 돌려줍니다. (ndjson은 table 대신 세 표 전부)"""
+    if fmt == "csv":
+        return export_csv(table, batch_size)
+    if fmt == "ndjson":
+        return export_ndjson(batch_size=batch_size)
+    if fmt == "anki":
+        return export_anki(batch_size)
+    raise ValueError(f"지원하지 않는 형식이에요: {fmt}")
+
+
+def export_to_file(fmt: str, table: str = "words"):
+    """
+    내보내기 결과를 임시 파일(바이너리)에 써서, 처음으로 되감아 돌려줍니다.
+    (Streamlit download_button에 넘기는 용도. 작으면 메모리, 커지면 디스크에 써요)
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    for chunk in export_chunks(fmt, table):
+        out.write(chunk.encode("utf-8"))
+    out.seek(0)
+    return out
+
+
+# --- 가져오기 ---
+
+def iter_records(lines, fmt: str):
+    """
+    파일 줄(lines: 글자 줄 iterable)을 (줄 번호, 표 이름, dict)로 하나씩 돌려줍니다.
+    CSV는 머리글 컬럼으로 어느 표인지 알아냅니다.
+    """
+    if fmt == "ndjson":
+        for line_no, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, {"_error": f"JSON을 읽을 수 없어요 ({e})"}
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, {"_error": "JSON 객체가 아니에요"}
+                continue
+            yield line_no, _NDJSON_TYPES.get(record.pop("type", "word")), record
+        return
+
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        header = {(name or "").lstrip("\ufeff") for name in (reader.fieldnames or [])}
+        reader.fieldnames = [(name or "").lstrip("\ufeff") for name in (reader.fieldnames or [])]
+        table = next(
+            (name for name, columns in COLUMNS.items() if {"date", columns[1]} <= header),
+            None,
+        )
+        for record in reader:
+            yield reader.line_num, table, record
+        return
+
+    raise ValueError(f"가져오기를 지원하지 않는 형식이에요: {fmt}")
+
+
+def validate(table, record):
+    """문제가 있으면 이유(글자)를, 없으면 None을 돌려줍니다."""
+    if "_error" in record:
+        return record["_error"]
+    if table not in COLUMNS:
+        return "어느 표의 행인지 알 수 없어요"
+    for column in COLUMNS[table]:
+        if not isinstance(record.get(column) or "", str):
+            return f"{column} 값이 글자가 아니에요"
+    date = record.get("date") or ""
+    if not isinstance(date, str) or not _DATE_RE.match(date):
+        return f"날짜 형식이 YYYY-MM-DD가 아니에요: {date!r}"
+    if table == "words":
+        if not (record.get("word") or "").strip():
+            return "단어가 비어 있어요"
+        if not (record.get("meaning") or "").strip():
+            return "뜻이 비어 있어요"
+    elif table == "diary_layout":
+        try:
+            json.loads(record.get("layout_json") or "")
+        except ValueError:
+            return "layout_json이 JSON이 아니에요"
+    elif record.get("content") is None:
+        return "content가 없어요"
+    return None
+
+
+def _flush(table, rows, replace, stats, durable=False):
+    if not rows:
+        return
+    if table == "words":
+        with db_manager.transaction(durable=durable):
+            statuses = db_manager.add_words(rows)
+        stats["inserted"] += statuses.count("inserted")
+        stats["ignored"] += statuses.count("ignored")
+        return
+
+    # 노트/레이아웃은 버전 기록·변경분을 남기도록 각 저장 모듈을 거칩니다.
+    # (replace=False면 이미 있는 날짜는 건너뛰고, replace=True면 새 버전으로 저장해요)
+    store = layout_store if table == "diary_layout" else note_store
+    changed = 0
+    with db_manager.transaction(durable=durable) as conn:
+        for row in rows:
+            if not replace and store.exists(conn, row["date"]):
+                continue
+            if table == "diary_layout":
+                layout_store.save(conn, row["date"], json.loads(row["layout_json"]))
+            else:
+                note_store.save(conn, row["date"], row["content"], squash=False)
+            changed += 1
+    stats["inserted"] += changed
+    stats["ignored"] += len(rows) - changed
+
+
+def import_records(records, batch_size: int = BATCH_SIZE, replace: bool = False):
+    """
+    iter_records가 돌려준 행들을 검사해서 batch_size개씩 저장합니다.
+
+    replace: 같은 날짜의 노트/레이아웃이 이미 있으면 덮어쓸지 (기본은 기존 것을 그대로 둠)
+             단어는 항상 기존 것을 그대로 둡니다. 같은 날짜에 같은 단어가 있으면 읽기/뜻이 달라도
+             건너뛰어요. (db_manager.add_words와 study_event 트리거의 (날짜, 단어) 규칙)
+    반환값: {"inserted", "ignored", "invalid", "errors": [(줄 번호, 이유), ...]}
+    """
+    stats = {"inserted": 0, "ignored": 0, "invalid": 0, "errors": []}
+    pending = {table: [] for table in COLUMNS}
+    for line_no, table, record in records:
+        if isinstance(record.get("date"), str):
+            record["date"] = record["date"].strip()
+        reason = validate(table, record)
+        if reason:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_ERRORS:
+                stats["errors"].append((line_no, reason))
+            continue
+        pending[table].append(record)
+        if len(pending[table]) > batch_size:
+            # 마지막 행은 남겨 둬서, 끝에 하는 저장이 항상 있게 합니다. (아래 durable 참고)
+            _flush(table, pending[table][:-1], replace, stats)
+            pending[table] = pending[table][-1:]
+    # 마지막 저장만 synchronous=FULL로 커밋합니다. WAL을 디스크에 맞추면서 앞 묶음까지 같이 닿아요.
+    for table, rows in pending.items():
+        _flush(table, rows, replace, stats, durable=True)
+    return stats
+
+
+def import_file(fileobj, fmt: str, batch_size: int = BATCH_SIZE, replace: bool = False):
+    """
+    파일(텍스트 또는 바이너리)을 줄 단위로 읽어서 가져옵니다. (파일 전체를 메모리에 올리지 않아요)
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    return import_records(iter_records(fileobj, fmt), batch_size, replace)
+
+
+def guess_format(filename: str) -> str:
+    lower = (filename or "").lower()
+    if lower.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if lower.endswith((".tsv", ".txt")):
+        return "anki"
+    return "csv"
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="My Music Diary 내보내기/가져오기")
+    parser.add_argument("--db", help=f"DB 파일 경로 (기본: {db_manager.DB_NAME})")
+    parser.add_argument("--tenant-dir", help="사용자별 DB 폴더 (기본: VOCA_TENANT_DIR)")
+    parser.add_argument("--tenant", help="이 사용자의 DB를 내보내기/가져오기")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="내보내기")
+    p_export.add_argument("--format", choices=FORMATS, default="ndjson")
+    p_export.add_argument("--table", choices=tuple(COLUMNS), default="words", help="csv일 때 내보낼 표")
+    p_export.add_argument("output", help="저장할 파일 (-는 표준 출력)")
+
+    p_import = sub.add_parser("import", help="가져오기")
+    p_import.add_argument("--format", choices=("csv", "ndjson"), help="기본: 확장자로 판단")
+    p_import.add_argument("--replace", action="store_true", help="같은 날짜의 노트/레이아웃을 덮어쓰기")
+    p_import.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p_import.add_argument("input")
+    args = parser.parse_args(argv)
+
+    if args.db or args.tenant_dir:
+        db_manager.configure(db_path=args.db, tenant_dir=args.tenant_dir)
+    if args.tenant:
+        db_manager.set_tenant(args.tenant)
+    db_manager.init_db()
+
+    if args.command == "export":
+        # CSV는 엑셀용 BOM이 이미 글자에 들어 있어서 그냥 utf-8로 씁니다.
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+        try:
+            for chunk in export_chunks(args.format, args.table):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return 0
+
+    fmt = args.format or guess_format(args.input)
+    if fmt not in ("csv", "ndjson"):
+        print(f"가져오기는 csv/ndjson만 돼요: {args.input}")
+        return 2
+    with open(args.input, encoding="utf-8-sig", newline="") as f:
+        stats = import_file(f, fmt, args.batch_size, args.replace)
+    print(f"inserted={stats['inserted']} ignored={stats['ignored']} invalid={stats['invalid']}")
+    for line_no, reason in stats["errors"]:
+        print(f"  line {line_no}: {reason}")
+    return 1 if stats["invalid"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
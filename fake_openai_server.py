@@ -0,0 +1,172 @@
+"""
+로컬 테스트용 "가짜 OpenAI 호환 서버"입니다. (API Key/요금 없이 스트리밍 화면을 확인할 때)
+
+사용법:
+    python fake_openai_server.py --port 8765 --delay 0.03
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+
+- POST /v1/chat/completions 만 흉내 냅니다.
+- "stream": true면 SSE(data: {...}) 형식으로 응답을 몇 글자씩 잘라 보내고,
+  아니면 한 번에 보냅니다.
+- --response 파일을 주면 그 JSON 내용을 그대로 답으로 사용합니다.
+- --rate-limit-rate 0.3처럼 주면 그 비율만큼 429(Retry-After 포함)로 답해서 재시도 동작을 확인할 수 있어요.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RESPONSE = {
+    "translation": "네가 죽기보다 슬픈 일이 이 세상에 있을 줄은 몰랐어.",
+    "vocab": [
+        {
+            "word": "悲しい",
+            "reading": "かなしい",
+            "pronunciation": "카나시이",
+            "meaning": "슬프다",
+            "example": "あの日の悲しみさえ",
+            "example_reading": "あのひのかなしみさえ",
+            "example_pronunciation": "아노 히노 카나시미사에",
+            "example_meaning": "그날의 슬픔조차",
+        },
+        {
+            "word": "苦い",
+            "reading": "にがい",
+            "pronunciation": "니가이",
+            "meaning": "쓰다",
+            "example": "苦いレモンの匂い",
+            "example_reading": "にがいレモンのにおい",
+            "example_pronunciation": "니가이 레몬노 니오이",
+            "example_meaning": "쓴 레몬 향기",
+        },
+        {
+            "word": "忘れる",
+            "reading": "わすれる",
+            "pronunciation": "와스레루",
+            "meaning": "잊다",
+            "example": "今でもあなたはわたしの光",
+            "example_reading": "いまでもあなたはわたしのひかり",
+            "example_pronunciation": "이마데모 아나타와 와타시노 히카리",
+            "example_meaning": "지금도 당신은 나의 빛",
+        },
+    ],
+}
+
+
+def make_handler(content: str, chunk_size: int, delay: float, rate_limit_rate: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if rate_limit_rate and random.random() < rate_limit_rate:
+                payload = json.dumps({"error": {
+                    "message": "Rate limit reached (fake)",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }}).encode("utf-8")
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Retry-After", "0.2")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            if delay and not body.get("stream"):
+                time.sleep(delay * max(1, len(content) // max(1, chunk_size)))
+            model = body.get("model", "fake-model")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def send(delta, finish_reason=None):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send({"role": "assistant", "content": ""})
+            for i in range(0, len(content), chunk_size):
+                send({"content": content[i:i + chunk_size]})
+                if delay:
+                    time.sleep(delay)
+            send({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.03, help="조각 사이 대기 시간(초)")
+    parser.add_argument("--chunk-size", type=int, default=4, help="한 번에 보낼 글자 수")
+    parser.add_argument("--response", help="답으로 보낼 JSON 파일 (없으면 기본 예시)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429로 답할 비율(0~1)")
+    args = parser.parse_args(argv)
+
+    if args.response:
+        with open(args.response, encoding="utf-8") as f:
+            content = f.read()
+    else:
+        content = json.dumps(SAMPLE_RESPONSE, ensure_ascii=False, indent=2)
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(content, args.chunk_size, args.delay, args.rate_limit_rate),
+    )
+    print(f"fake OpenAI server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
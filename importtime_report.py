@@ -0,0 +1,192 @@
+"""
+앱 첫 화면(cold start)에 import가 얼마나 걸리는지 보여 주는 리포트입니다.
+
+`python -X importtime`을 새 프로세스로 돌려서 그 출력(모듈별 self/누적 μs)을 정리해요.
+
+- startup: app.py가 맨 위에서 import하는 모듈들 (컨테이너가 처음 뜰 때 매번 내는 비용)
+- lazy: 함수/페이지 안에서 처음 쓸 때 불러오는 모듈들 (openai, streamlit_calendar 등)
+  startup 모듈을 다 불러온 뒤에 "추가로" 드는 시간만 잽니다.
+
+두 목록은 소스 코드(ast)에서 직접 뽑으니까 import 위치를 옮겨도 이 파일은 고칠 필요가 없어요.
+lazy로 옮긴 모듈이 startup 나무에 다시 나타나면(누가 맨 위에서 import하면) 경고하고 실패로 끝납니다.
+
+사용법:
+    python importtime_report.py
+    python importtime_report.py --top 30 --repeat 3
+    python importtime_report.py --budget-ms 1500 --json importtime.json
+"""
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# import 위치를 살펴볼 파일들 (app.py가 startup에 부르는 우리 모듈)
+SOURCES = ("app.py", "lyrics_analyzer.py", "playlist_analyzer.py")
+
+
+def collect_imports(paths=SOURCES):
+    """
+    (app.py 맨 위 import 모듈 이름들, 함수 안에서 부르는 서드파티 모듈 이름들)을 뽑습니다.
+    이름은 최상위 패키지 기준이에요. (from streamlit_calendar import calendar → streamlit_calendar)
+    표준 라이브러리는 lazy 목록에서 뺍니다. (CLI main() 안의 argparse 같은 것)
+    """
+    startup, lazy = [], []
+    for path in paths:
+        with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        top_level = set(map(id, tree.body))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name.split(".")[0] for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module.split(".")[0]]
+            else:
+                continue
+            if id(node) in top_level:
+                if path != "app.py":
+                    continue
+                target = startup
+            else:
+                target = lazy
+            for name in names:
+                if name not in target:
+                    target.append(name)
+    lazy = [name for name in lazy if name not in startup and name not in sys.stdlib_module_names]
+    return startup, lazy
+
+
+def _parse_line(line):
+    """`-X importtime` 한 줄 → {"name", "self_us", "cumulative_us", "depth"} (머리글이면 None)"""
+    body = line[len("import time:"):]
+    self_us, cumulative_us, name = body.split("|", 2)
+    try:
+        self_us, cumulative_us = int(self_us), int(cumulative_us)
+    except ValueError:
+        # 맨 처음 줄(머리글: "self [us] | cumulative | imported package")
+        return None
+    depth = (len(name) - len(name.lstrip(" "))) // 2
+    return {"name": name.strip(), "self_us": self_us, "cumulative_us": cumulative_us, "depth": depth}
+
+
+def measure(statement, python=sys.executable):
+    """새 인터프리터에서 statement를 실행하며 import 시간을 잽니다."""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import 실패: {statement}\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:"):
+            entry = _parse_line(line)
+            if entry is not None:
+                entries.append(entry)
+    return entries
+
+
+def _best_of(statement, repeat):
+    """repeat번 재서 총합이 가장 작은 회차를 씁니다. (디스크 캐시/잡음 영향 줄이기)"""
+    runs = [measure(statement) for _ in range(max(1, repeat))]
+    return min(runs, key=lambda entries: sum(e["cumulative_us"] for e in entries if e["depth"] == 0))
+
+
+def summarize(entries, skip=frozenset()):
+    """
+    맨 위(depth 0) import별 누적 시간, 총합, 자기 시간이 긴 모듈을 정리합니다.
+
+    skip에 든 모듈(인터프리터가 켜질 때 이미 부르는 site/encodings 등)은 그 아래 나무째 뺍니다.
+    importtime은 자식을 부모보다 먼저 찍으니까, depth 0 줄이 나올 때까지 모은 줄이 그 나무예요.
+    """
+    kept, subtree = [], []
+    for entry in entries:
+        subtree.append(entry)
+        if entry["depth"] == 0:
+            if entry["name"] not in skip:
+                kept.extend(subtree)
+            subtree = []
+    roots = [e for e in kept if e["depth"] == 0]
+    return {
+        "total_ms": sum(e["cumulative_us"] for e in roots) / 1000,
+        "roots": sorted(
+            ({"name": e["name"], "ms": e["cumulative_us"] / 1000} for e in roots),
+            key=lambda r: r["ms"], reverse=True,
+        ),
+        "self": sorted(
+            ({"name": e["name"], "ms": e["self_us"] / 1000} for e in kept),
+            key=lambda r: r["ms"], reverse=True,
+        ),
+        "modules": {e["name"] for e in kept},
+    }
+
+
+def run_report(repeat=1):
+    startup, lazy = collect_imports()
+    # 아무것도 안 불러도 인터프리터가 켜지며 부르는 모듈들 (앱이 줄일 수 없는 부분)
+    baseline = {e["name"] for e in measure("pass")}
+    startup_stmt = "import " + ", ".join(startup)
+    startup_entries = _best_of(startup_stmt, repeat)
+    startup_summary = summarize(startup_entries, skip=baseline)
+    already = baseline | {e["name"] for e in startup_entries}
+
+    lazy_costs = []
+    for name in lazy:
+        # startup 모듈은 이미 불러온 상태에서 "추가로" 불리는 모듈의 자기 시간만 더합니다.
+        entries = _best_of(f"{startup_stmt}\nimport {name}", repeat)
+        extra = [e for e in entries if e["name"] not in already]
+        lazy_costs.append({"name": name, "ms": sum(e["self_us"] for e in extra) / 1000, "modules": len(extra)})
+
+    leaked = [name for name in lazy if name in startup_summary["modules"]]
+    return {
+        "python": sys.version.split()[0],
+        "startup_modules": startup,
+        "startup_ms": round(startup_summary["total_ms"], 1),
+        "startup_roots": startup_summary["roots"],
+        "startup_self": startup_summary["self"],
+        "lazy": sorted(lazy_costs, key=lambda r: r["ms"], reverse=True),
+        "leaked": leaked,
+    }
+
+
+def print_report(report, top=15):
+    print(f"Python {report['python']}")
+    print(f"\n[startup] app.py 맨 위 import: {report['startup_ms']:.1f} ms")
+    for row in report["startup_roots"][:top]:
+        print(f"  {row['ms']:9.1f} ms  {row['name']}")
+    print(f"\n[startup] 자기 시간(self)이 긴 모듈 top {top}")
+    for row in report["startup_self"][:top]:
+        print(f"  {row['ms']:9.1f} ms  {row['name']}")
+    print("\n[lazy] 처음 쓸 때 추가로 드는 시간")
+    for row in report["lazy"]:
+        print(f"  {row['ms']:9.1f} ms  {row['name']} (모듈 {row['modules']}개)")
+    for name in report["leaked"]:
+        print(f"⚠️ {name}: lazy로 불러오려던 모듈이 startup에서 이미 불리고 있어요")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="cold start import 시간 리포트")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=1, help="몇 번 재서 가장 빠른 회차를 쓸지")
+    parser.add_argument("--budget-ms", type=float, help="startup import 총합이 이보다 길면 실패(exit 1)")
+    parser.add_argument("--json", help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    report = run_report(repeat=args.repeat)
+    print_report(report, top=args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({**report, "startup_self": report["startup_self"][:args.top]}, f, ensure_ascii=False, indent=2)
+
+    failed = bool(report["leaked"])
+    if args.budget_ms is not None and report["startup_ms"] > args.budget_ms:
+        print(f"\n❌ startup import {report['startup_ms']:.1f} ms > 예산 {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
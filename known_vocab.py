@@ -0,0 +1,191 @@
+"""
+다이어리에 이미 붙인 단어(vocab)를 메모리에 들고 있는 "아는 단어" 색인입니다.
+
+LLM은 사용자가 뭘 알고 있는지 모르니까 이미 붙인 단어를 또 골라 오고,
+같은 날짜면 add_words의 INSERT OR IGNORE가 조용히 버립니다. (돈 내고 받은 스티커가 사라져요)
+그래서
+
+- 프롬프트: 가사에 나오는 아는 단어를 찾아서 "이 단어들은 빼 줘"라고 같이 보내고 (known_in)
+- 응답 뒤: 아는 단어를 걸러 내고(filter_vocab), 모자라면 그만큼 다시 요청합니다. (lyrics_analyzer)
+
+색인은 DB 파일(사용자)마다 하나씩 두고, 처음 한 번만 vocab 전체를 읽습니다. (저장 횟수가 아니라 서로 다른 단어 수만큼)
+그 뒤로는 쓰기가 있었을 때(query_cache 쓰기 세대가 바뀌었을 때)나 REFRESH_SECONDS가 지났을 때만
+id가 늘어난 행을 더 읽어요. 행 수가 안 맞으면(지운 단어가 있으면) 그때만 다시 다 읽습니다.
+
+가사에서 아는 단어를 찾을 때는 단어 목록을 돌지 않고, 가사의 부분 문자열(최대 MAX_WORD_CHARS 글자)을
+set에서 찾아요. 그래서 단어가 몇 만 개여도 가사 길이에만 비례합니다.
+"""
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import db_manager
+import query_cache
+
+# 쓰기가 없어도 이 시간(초)이 지나면 DB에서 새 행을 확인합니다. (다른 프로세스가 쓴 단어)
+REFRESH_SECONDS = 30.0
+# 가사에서 찾을 단어의 최대 글자 수 (이보다 긴 단어는 통째로 나올 때만 찾아요)
+MAX_WORD_CHARS = 12
+# 프롬프트에 넣을 "아는 단어"의 최대 개수 (입력 토큰이 너무 늘지 않게)
+MAX_EXCLUDE = 60
+# 메모리에 들고 있을 색인 수 (사용자별 DB가 많을 때 오래 안 쓴 것부터 버려요)
+MAX_INDEXES = 32
+
+
+def _is_hiragana(ch) -> bool:
+    return "ぁ" <= ch <= "ゟ"
+
+
+def normalize(text) -> str:
+    """비교용 키: NFKC + 공백 제거 + 가타카나 → 히라가나 (アイ와 あい를 같게 봐요)"""
+    text = "".join(unicodedata.normalize("NFKC", text or "").split())
+    return "".join(chr(ord(ch) - 0x60) if "ァ" <= ch <= "ヶ" else ch for ch in text)
+
+
+def _is_kana(key) -> bool:
+    return bool(key) and all(_is_hiragana(ch) or ch == "ー" for ch in key)
+
+
+def _stem(key):
+    """
+    한자 + 오쿠리가나 단어의 어간 (愛する → 愛, 悲しい → 悲) — 가사 속 활용형(愛してた)을 찾는 데 씁니다.
+    한자로 시작하지 않거나 오쿠리가나가 없으면 None
+    어간은 한 글자일 때가 많아서 known_in에서는 바로 뒤에 히라가나가 올 때만 맞은 걸로 봐요. (悲劇, 愛情은 아님)
+    """
+    stem = key.rstrip("".join(ch for ch in key if _is_hiragana(ch)))
+    if stem and stem != key and not _is_hiragana(stem[0]):
+        return stem
+    return None
+
+
+class KnownVocab:
+    """DB 파일 하나의 아는 단어 색인입니다. (스레드 안전)"""
+
+    def __init__(self):
+        self.generation = None
+        self.synced_at = 0.0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.words = {}      # 단어 키 → 원래 단어
+        self.readings = set()  # 가나로만 쓴 단어들의 읽기
+        self.stems = {}      # 어간 → 원래 단어
+        self.rows = 0
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self.words)
+
+    def _add(self, word, reading):
+        key = normalize(word)
+        if not key:
+            return
+        self.words.setdefault(key, word)
+        if _is_kana(key):
+            self.readings.add(key)
+            reading_key = normalize(reading)
+            if _is_kana(reading_key):
+                self.readings.add(reading_key)
+        stem = _stem(key)
+        if stem:
+            self.stems.setdefault(stem, word)
+
+    def _load(self, conn):
+        rows = conn.execute(
+            "SELECT id, word, reading FROM vocab WHERE id > ? ORDER BY id", (self.last_id,)
+        ).fetchall()
+        for row in rows:
+            self._add(row["word"], row["reading"])
+        self.rows += len(rows)
+        if rows:
+            self.last_id = rows[-1]["id"]
+        return len(rows)
+
+    def sync(self, conn, now=None):
+        """DB에서 새로 생긴 행을 읽어 옵니다. 반환값: 읽은 행 수"""
+        with self._lock:
+            self.generation = query_cache.generation(db_manager.current_db_path())
+            self.synced_at = time.monotonic() if now is None else now
+            total, max_id = conn.execute("SELECT COUNT(*), MAX(id) FROM vocab").fetchone()
+            if total == self.rows and (max_id or 0) == self.last_id:
+                return 0
+            added = self._load(conn)
+            if self.rows != total:
+                # 지운 행이 있으면 개수가 안 맞아요. 그때만 처음부터 다시 읽습니다.
+                self._reset()
+                added = self._load(conn)
+            return added
+
+    def is_known(self, word) -> bool:
+        """
+        이미 붙인 단어인지 봅니다.
+        표기가 같을 때만 아는 단어예요. 읽기는 두 단어가 모두 가나로만 쓰였을 때만 비교합니다.
+        (かみ를 안다고 紙/神/髪까지 버리면 멀쩡한 스티커를 버리고 돈 내고 다시 요청하게 돼요)
+        """
+        key = normalize(word)
+        if not key:
+            return False
+        if key in self.words:
+            return True
+        return _is_kana(key) and key in self.readings
+
+    def known_in(self, text, limit=MAX_EXCLUDE):
+        """가사(text)에 나오는 아는 단어들 (나온 순서, 최대 limit개)"""
+        text = normalize(text)
+        found = {}
+        n = len(text)
+        for start in range(n):
+            if _is_hiragana(text[start]) and start and _is_hiragana(text[start - 1]):
+                # 히라가나 한가운데서 시작하는 단어는 보통 조사/어미 조각이라 건너뜁니다.
+                continue
+            for end in range(min(n, start + MAX_WORD_CHARS), start, -1):
+                piece = text[start:end]
+                word = self.words.get(piece)
+                if word is None and end < n and _is_hiragana(text[end]):
+                    word = self.stems.get(piece)
+                if word is not None:
+                    found.setdefault(word, None)
+                    break
+            if len(found) >= limit:
+                break
+        return list(found)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(now=None) -> KnownVocab:
+    """지금 사용자 DB의 색인을 돌려줍니다. 쓰기가 있었거나 오래됐으면 새 행을 읽어 와요."""
+    key = db_manager.current_db_path()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = KnownVocab()
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+    now = time.monotonic() if now is None else now
+    if index.generation != query_cache.generation(key) or now - index.synced_at > REFRESH_SECONDS:
+        with db_manager.connection() as conn:
+            index.sync(conn, now)
+    return index
+
+
+def filter_vocab(vocab, index=None):
+    """(새 단어들, 걸러 낸 아는 단어들)로 나눕니다. 응답 안에서 겹치는 단어도 하나만 남겨요."""
+    index = get_index() if index is None else index
+    fresh, known, seen = [], [], set()
+    for item in vocab or []:
+        if not isinstance(item, dict):
+            continue
+        key = normalize(item.get("word"))
+        if index.is_known(item.get("word")) or key in seen:
+            known.append(item)
+        else:
+            seen.add(key)
+            fresh.append(item)
+    return fresh, known
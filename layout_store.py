@@ -0,0 +1,284 @@
+"""
+다꾸 레이아웃(JSON)을 "스냅샷 + 변경분(JSON Patch)"으로 저장하는 모듈입니다.
+
+예전에는 스티커 하나만 옮겨도 그날 레이아웃 JSON 전체를 다시 썼어요. (자동 저장이면 드래그마다!)
+이제는 저장할 때 지금 레이아웃과 비교해서 바뀐 부분만 RFC 6902 JSON Patch로 만들어
+layout_delta에 한 줄 쌓습니다. 보통 {"op": "replace", "path": "/stickers/3/x", "value": 120}
+정도라서 WAL에 쓰는 양이 레이아웃 크기와 상관없이 작아요.
+
+- 읽을 때: layout_snapshot의 스냅샷을 풀고, 그 뒤 변경분을 version 순서대로 적용합니다.
+- 압축(compaction): 변경분이 COMPACT_EVERY개를 넘거나, 변경분 바이트가 스냅샷에 비해 커지면
+  (COMPACT_RATIO, 최소 COMPACT_MIN_BYTES) 현재 레이아웃을 새 스냅샷으로 쓰고 변경분을 지웁니다.
+- 스냅샷이 COMPRESS_MIN_BYTES보다 크면 zlib으로 압축해서 저장합니다. (codec: "json" / "zlib")
+
+함수들은 모두 열린 연결(conn)을 받습니다. save/compact/delete는 쓰기 트랜잭션 안에서 불러 주세요.
+(db_manager.transaction()은 BEGIN IMMEDIATE라서 "읽고 → 비교하고 → 쓰기"가 다른 세션과 섞이지 않아요)
+"""
+import json
+import time
+import zlib
+
+# 변경분이 이만큼 쌓이면 스냅샷을 새로 만듭니다.
+COMPACT_EVERY = 50
+# 변경분 바이트 합이 스냅샷 크기 × 이 비율을 넘으면 스냅샷을 새로 만듭니다.
+COMPACT_RATIO = 0.5
+# 레이아웃이 아주 작을 때 매번 스냅샷을 새로 쓰지 않도록 하는 최소 기준(바이트)
+COMPACT_MIN_BYTES = 4096
+# 이보다 큰 스냅샷만 압축합니다. (작은 JSON은 압축해도 거의 안 줄어요)
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+
+
+# --- JSON Patch (RFC 6902의 add / remove / replace) ---
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old, new, path=""):
+    """
+    old → new로 바꾸는 JSON Patch 연산 목록을 만듭니다. (같으면 빈 리스트)
+
+    dict는 키별로, list는 앞뒤 공통 부분을 빼고 가운데만 비교해서
+    "스티커 하나의 좌표만 바뀜" 같은 흔한 변경이 연산 한두 개로 끝나게 합니다.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    if isinstance(old, dict):
+        ops = [{"op": "remove", "path": f"{path}/{_escape(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key in old:
+                ops.extend(make_patch(old[key], value, child))
+            else:
+                ops.append({"op": "add", "path": child, "value": value})
+        return ops
+    if isinstance(old, list):
+        return _list_patch(old, new, path)
+    return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+
+
+def _same(a, b) -> bool:
+    """JSON 값으로 같은지 봅니다. (파이썬에서는 1 == True라서 타입까지 비교해요)"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(_same, a, b))
+    return a == b
+
+
+def _list_patch(old, new, path):
+    start = 0
+    while start < len(old) and start < len(new) and _same(old[start], new[start]):
+        start += 1
+    end = 0
+    while end < len(old) - start and end < len(new) - start and _same(old[-1 - end], new[-1 - end]):
+        end += 1
+    old_mid = old[start:len(old) - end]
+    new_mid = new[start:len(new) - end]
+
+    ops = []
+    paired = min(len(old_mid), len(new_mid))
+    for i in range(paired):
+        ops.extend(make_patch(old_mid[i], new_mid[i], f"{path}/{start + i}"))
+    # 남는 옛 항목은 뒤에서부터 지워야 앞 번호가 밀리지 않아요.
+    for i in reversed(range(paired, len(old_mid))):
+        ops.append({"op": "remove", "path": f"{path}/{start + i}"})
+    for i in range(paired, len(new_mid)):
+        ops.append({"op": "add", "path": f"{path}/{start + i}", "value": new_mid[i]})
+    return ops
+
+
+def apply_patch(doc, ops):
+    """JSON Patch를 doc에 적용하고 결과를 돌려줍니다. (doc은 제자리에서 바뀝니다)"""
+    for op in ops:
+        kind, path = op["op"], op["path"]
+        if path == "":
+            if kind not in ("add", "replace"):
+                raise ValueError(f"문서 전체에는 {kind}를 할 수 없어요")
+            doc = op["value"]
+            continue
+        *parents, last = (_unescape(token) for token in path.split("/")[1:])
+        target = doc
+        try:
+            for token in parents:
+                target = target[int(token)] if isinstance(target, list) else target[token]
+            if isinstance(target, list):
+                index = len(target) if last == "-" else int(last)
+                if kind == "add":
+                    target.insert(index, op["value"])
+                elif kind == "remove":
+                    del target[index]
+                elif kind == "replace":
+                    target[index] = op["value"]
+                else:
+                    raise ValueError(f"지원하지 않는 연산이에요: {kind}")
+            elif kind in ("add", "replace"):
+                target[last] = op["value"]
+            elif kind == "remove":
+                del target[last]
+            else:
+                raise ValueError(f"지원하지 않는 연산이에요: {kind}")
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"패치를 적용할 수 없어요: {op['op']} {path} ({e!r})") from e
+    return doc
+
+
+# --- 저장 형식 ---
+
+def _dumps(doc) -> str:
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_snapshot(doc):
+    """레이아웃 → (codec, bytes). 크면 zlib으로 압축해요."""
+    raw = _dumps(doc).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            return "zlib", packed
+    return "json", raw
+
+
+def _snapshot_text(codec, data) -> str:
+    data = bytes(data)
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec != "json":
+        raise ValueError(f"알 수 없는 스냅샷 형식이에요: {codec}")
+    return data.decode("utf-8")
+
+
+def _read(conn, date):
+    """
+    (스냅샷 행, 변경분 행 목록)을 읽습니다. 스냅샷이 없으면 (None, [])
+    """
+    snapshot = conn.execute(
+        "SELECT version, codec, data FROM layout_snapshot WHERE date = ?", (date,)
+    ).fetchone()
+    if snapshot is None:
+        return None, []
+    deltas = conn.execute(
+        "SELECT version, patch FROM layout_delta WHERE date = ? AND version > ? ORDER BY version",
+        (date, snapshot["version"]),
+    ).fetchall()
+    return snapshot, deltas
+
+
+def _current(conn, date):
+    """(레이아웃, version, 스냅샷 바이트, 변경분 수, 변경분 바이트) — 없으면 None"""
+    snapshot, deltas = _read(conn, date)
+    if snapshot is None:
+        return None
+    doc = json.loads(_snapshot_text(snapshot["codec"], snapshot["data"]))
+    for delta in deltas:
+        doc = apply_patch(doc, json.loads(delta["patch"]))
+    version = deltas[-1]["version"] if deltas else snapshot["version"]
+    return doc, version, len(snapshot["data"]), len(deltas), sum(len(d["patch"]) for d in deltas)
+
+
+# --- 읽기 / 쓰기 ---
+
+def load(conn, date):
+    """날짜의 현재 레이아웃(dict/list)을 돌려줍니다. 없으면 None"""
+    state = _current(conn, date)
+    return state[0] if state else None
+
+
+def load_json(conn, date):
+    """
+    날짜의 현재 레이아웃을 JSON 문자열로 돌려줍니다. 없으면 None
+    (변경분이 없으면 스냅샷 글자를 파싱하지 않고 그대로 돌려줘요)
+    """
+    snapshot, deltas = _read(conn, date)
+    if snapshot is None:
+        return None
+    if not deltas:
+        return _snapshot_text(snapshot["codec"], snapshot["data"])
+    doc = json.loads(_snapshot_text(snapshot["codec"], snapshot["data"]))
+    for delta in deltas:
+        doc = apply_patch(doc, json.loads(delta["patch"]))
+    return _dumps(doc)
+
+
+def exists(conn, date) -> bool:
+    return conn.execute("SELECT 1 FROM layout_snapshot WHERE date = ?", (date,)).fetchone() is not None
+
+
+def _write_snapshot(conn, date, doc, version, now):
+    codec, data = encode_snapshot(doc)
+    conn.execute(
+        """
+        INSERT INTO layout_snapshot (date, version, codec, data, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET
+          version = excluded.version,
+          codec = excluded.codec,
+          data = excluded.data,
+          updated_at = excluded.updated_at
+        """,
+        (date, version, codec, data, now),
+    )
+    conn.execute("DELETE FROM layout_delta WHERE date = ? AND version <= ?", (date, version))
+
+
+def save(conn, date, doc, now=None):
+    """
+    레이아웃을 저장합니다. 지금 것과 다른 부분만 변경분으로 쌓고, 많이 쌓였으면 압축해요.
+
+    반환값: 저장 뒤 version (바뀐 게 없으면 지금 version 그대로)
+    """
+    now = time.time() if now is None else now
+    state = _current(conn, date)
+    if state is None:
+        _write_snapshot(conn, date, doc, 0, now)
+        return 0
+
+    old, version, snapshot_bytes, delta_count, delta_bytes = state
+    ops = make_patch(old, doc)
+    if not ops:
+        return version
+    patch = _dumps(ops)
+    version += 1
+    limit = max(COMPACT_MIN_BYTES, snapshot_bytes * COMPACT_RATIO)
+    if delta_count + 1 >= COMPACT_EVERY or delta_bytes + len(patch) > limit:
+        _write_snapshot(conn, date, doc, version, now)
+    else:
+        conn.execute(
+            "INSERT INTO layout_delta (date, version, patch, created_at) VALUES (?, ?, ?, ?)",
+            (date, version, patch, now),
+        )
+    return version
+
+
+def compact(conn, date, now=None) -> bool:
+    """날짜의 변경분을 스냅샷 하나로 합칩니다. 합칠 게 있었으면 True"""
+    state = _current(conn, date)
+    if state is None or not state[3]:
+        return False
+    _write_snapshot(conn, date, state[0], state[1], time.time() if now is None else now)
+    return True
+
+
+def compact_all(conn, now=None) -> int:
+    """변경분이 남은 모든 날짜를 압축합니다. 반환값: 압축한 날짜 수"""
+    dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM layout_delta")]
+    return sum(compact(conn, date, now) for date in dates)
+
+
+def delete(conn, date) -> None:
+    conn.execute("DELETE FROM layout_delta WHERE date = ?", (date,))
+    conn.execute("DELETE FROM layout_snapshot WHERE date = ?", (date,))
+
+
+def iter_layouts(conn):
+    """모든 날짜의 현재 레이아웃을 {"date", "layout_json"}으로 날짜순으로 돌려줍니다."""
+    dates = [row[0] for row in conn.execute("SELECT date FROM layout_snapshot ORDER BY date")]
+    for date in dates:
+        yield {"date": date, "layout_json": load_json(conn, date)}
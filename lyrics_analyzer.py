@@ -0,0 +1,429 @@
+"""
+가사 → 단어 스티커 분석(OpenAI 호출) 모듈입니다.
+
+app.py의 "✨ 스티커 만들기" 버튼에서 사용합니다.
+같은 가사는 analysis_cache에 저장된 결과를 재사용해서 다시 돈/시간을 쓰지 않아요.
+가사는 보내기 전에 lyrics_prep으로 반복 후렴/번역 블록을 빼서 입력 토큰을 줄입니다.
+"""
+import hashlib
+import json
+import os
+import time
+
+import analysis_cache
+import known_vocab
+import lyrics_prep
+import tracing
+
+MODEL = "gpt-4o"
+
+# OpenAI 호환 서버 주소 (비워 두면 공식 API). 로컬 테스트용 가짜 서버:
+#   python fake_openai_server.py --port 8765
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+
+# 프롬프트 내용을 바꾸면 이 값을 올려 주세요. (예전 캐시 결과와 섞이지 않게)
+# 2: 가사를 lyrics_prep으로 정리해서 보냄
+# 3: 이미 아는 단어(known_vocab)는 빼 달라고 같이 보냄
+PROMPT_VERSION = "3"
+
+# 곡 하나에서 뽑을 단어 수 (가사를 여러 조각으로 나눠 보내면 조각마다 나눠서 뽑아요)
+VOCAB_PER_SONG = 5
+
+
+def build_prompt(lyrics: str, count: int = VOCAB_PER_SONG, exclude=()) -> str:
+    # 프롬프트 수정: pronunciation 필드 추가 요청
+    # exclude: 사용자가 이미 다이어리에 붙인 단어 (가사에 나오는 것만, known_vocab.known_in)
+    skip = f"\n    이 단어들은 사용자가 이미 알아서 빼줘: {', '.join(exclude)}\n" if exclude else ""
+    return f"""
+    너는 친절한 일본어 튜터야. 사용자는 일본어를 전혀 읽지 못해.
+    가사: {lyrics}
+
+    JLPT N3~N1 수준의 단어 {count}개를 JSON으로 뽑아줘.{skip}
+    중요: 'pronunciation' 필드에 반드시 한국어 발음을 적어줘 (예: 아이시테루).
+    그리고 각 단어마다, 위 가사에서 그 단어가 실제로 등장하는 '예문(가사 한 줄/한 문장)'을 1개 골라서
+    예문도 함께 JSON에 넣어줘.
+    예문은 아래 4가지를 모두 포함해야 해:
+    - example: 일본어 예문(가사 원문 그대로)
+    - example_reading: 예문 후리가나(요미가나)
+    - example_pronunciation: 예문 한국어 발음
+    - example_meaning: 예문 한국어 뜻
+
+    형식:
+    {{
+        "translation": "전체 한국어 번역",
+        "vocab": [
+            {{
+                "word": "단어(한자)",
+                "reading": "요미가나",
+                "pronunciation": "한국어 발음",
+                "meaning": "뜻",
+                "example": "예문(가사에서 발췌)",
+                "example_reading": "예문 후리가나",
+                "example_pronunciation": "예문 한국어 발음",
+                "example_meaning": "예문 한국어 뜻"
+            }}
+        ]
+    }}
+    """
+
+
+# JSON 파싱
+def parse_json_garbage(text):
+    try:
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0]
+        elif "```" in text:
+            text = text.split("```")[1]
+        return json.loads(text.strip())
+    except Exception as e:
+        return None
+
+
+class StreamingAnalysisParser:
+    """
+    스트리밍으로 조금씩 도착하는 JSON 텍스트에서, 완성된 부분을 바로바로 꺼내는 파서입니다.
+
+    feed(조각)을 부를 때마다 새로 생긴 이벤트 목록을 돌려줍니다.
+    - ("translation", 지금까지 도착한 번역 문자열)  → 번역이 늘어날 때마다
+    - ("vocab", 단어 dict)                         → vocab 배열의 객체 {...} 하나가 닫힐 때마다
+
+    전체 텍스트를 처음부터 다시 파싱하지 않고, 이미 읽은 위치부터 이어서 훑습니다.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.translation = ""
+        self.vocab = []
+        self._translation_start = None   # 번역 문자열 값이 시작하는 위치("..."의 첫 글자)
+        self._translation_pos = None
+        self._translation_escape = False
+        self._translation_done = False
+        self._vocab_pos = None           # vocab 배열 안에서 다음에 읽을 위치
+        self._obj_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._vocab_done = False
+
+    def _find_value_start(self, key, opener):
+        """'"key" : <opener>'를 찾아서 opener 다음 위치를 돌려줍니다. 아직 없으면 None."""
+        key_pos = self.text.find(f'"{key}"')
+        if key_pos < 0:
+            return None
+        i = key_pos + len(key) + 2
+        n = len(self.text)
+        while i < n and self.text[i] in " \t\r\n:":
+            i += 1
+        if i >= n or self.text[i] != opener:
+            return None
+        return i + 1
+
+    def _feed_translation(self, events):
+        if self._translation_done:
+            return
+        if self._translation_start is None:
+            self._translation_start = self._find_value_start("translation", '"')
+            if self._translation_start is None:
+                return
+
+        text = self.text
+        i = self._translation_pos or self._translation_start
+        while i < len(text):
+            ch = text[i]
+            if self._translation_escape:
+                self._translation_escape = False
+            elif ch == "\\":
+                self._translation_escape = True
+            elif ch == '"':
+                self._translation_done = True
+                break
+            i += 1
+        self._translation_pos = i
+
+        # 끝이 이스케이프 중간(\ 나 \u12 등)에서 잘렸으면, 완성될 때까지 그 몇 글자는 보류합니다.
+        raw = text[self._translation_start:i]
+        for cut in range(6):
+            try:
+                value = json.loads(f'"{raw[:len(raw) - cut]}"')
+                break
+            except ValueError:
+                continue
+        else:
+            return
+        if value != self.translation:
+            self.translation = value
+            events.append(("translation", value))
+
+    def _feed_vocab(self, events):
+        if self._vocab_done:
+            return
+        if self._vocab_pos is None:
+            self._vocab_pos = self._find_value_start("vocab", "[")
+            if self._vocab_pos is None:
+                return
+
+        text = self.text
+        i = self._vocab_pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        item = json.loads(text[self._obj_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        self.vocab.append(item)
+                        events.append(("vocab", item))
+                    self._obj_start = None
+            elif ch == "]" and self._depth == 0:
+                self._vocab_done = True
+                i += 1
+                break
+            i += 1
+        self._vocab_pos = i
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return []
+        self.text += chunk
+        events = []
+        self._feed_translation(events)
+        self._feed_vocab(events)
+        return events
+
+    def result(self):
+        """
+        스트림이 끝난 뒤 최종 결과입니다.
+        전체 텍스트가 올바른 JSON이면 그걸 쓰고, 아니면 지금까지 꺼낸 조각으로 만들어 줍니다.
+        """
+        parsed = parse_json_garbage(self.text)
+        if isinstance(parsed, dict):
+            return parsed
+        if not self.vocab and not self.translation:
+            return None
+        return {"translation": self.translation, "vocab": list(self.vocab)}
+
+
+def make_client(api_key: str):
+    # openai 패키지는 불러오는 데만 0.5초 넘게 걸려서, 실제로 요청할 때 처음 불러옵니다.
+    # (앱 첫 화면이 뜰 때는 필요 없어요)
+    import openai
+
+    return openai.OpenAI(api_key=api_key, base_url=BASE_URL)
+
+
+def request_analysis(client, lyrics: str, model: str = MODEL, count: int = VOCAB_PER_SONG, exclude=()):
+    """OpenAI에 실제로 요청하고, 파싱한 dict를 돌려줍니다. (실패하면 None)"""
+    with tracing.span("llm.chat", model=model, stream=False) as node:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": build_prompt(lyrics, count, exclude)}]
+        )
+        _record_usage(node, getattr(response, "usage", None))
+    with tracing.span("llm.parse_json"):
+        return parse_json_garbage(response.choices[0].message.content)
+
+
+def request_analysis_stream(client, lyrics: str, model: str = MODEL, on_event=None,
+                            count: int = VOCAB_PER_SONG, exclude=()):
+    """
+    스트리밍 모드로 요청합니다. 토큰이 도착하는 대로 파싱해서 on_event(kind, value)를 부르고,
+    마지막에 최종 결과 dict를 돌려줍니다. (이벤트 종류는 StreamingAnalysisParser 참고)
+    """
+    with tracing.span("llm.chat", model=model, stream=True) as node:
+        started = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": build_prompt(lyrics, count, exclude)}],
+            stream=True,
+            # 마지막 조각에 토큰 사용량(usage)을 같이 보내 달라고 합니다. (추적용)
+            stream_options={"include_usage": True},
+        )
+        parser = StreamingAnalysisParser()
+        parse_seconds = 0.0
+        chunks = 0
+        got_first_token = False
+        for chunk in stream:
+            _record_usage(node, getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if delta and not got_first_token:
+                got_first_token = True
+                node.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+            chunks += 1
+            parse_started = time.perf_counter()
+            events = parser.feed(delta)
+            parse_seconds += time.perf_counter() - parse_started
+            for kind, value in events:
+                if on_event is not None:
+                    on_event(kind, value)
+        node.set(chunks=chunks, parse_ms=round(parse_seconds * 1000, 2))
+    with tracing.span("llm.parse_json"):
+        return parser.result()
+
+
+def _record_usage(node, usage):
+    if usage is not None:
+        node.set(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+
+def chunk_counts(chunks: int, total: int = VOCAB_PER_SONG):
+    """단어 total개를 조각 수만큼 나눕니다. (앞 조각부터 하나씩 더, 조각마다 최소 1개)"""
+    return [max(1, total // chunks + (1 if i < total % chunks else 0)) for i in range(chunks)]
+
+
+def merge_results(results, prepared=None, limit: int = VOCAB_PER_SONG):
+    """
+    조각별 결과를 하나로 합칩니다. (번역은 이어 붙이고, 단어는 겹치지 않게 limit개까지)
+    prepared를 주면 단어마다 예문이 원래 가사의 몇 번째 줄인지 "example_lines"로 붙여요.
+    """
+    results = [r for r in results if isinstance(r, dict)]
+    if not results:
+        return None
+    translation = "\n".join(r.get("translation") or "" for r in results if r.get("translation"))
+    vocab, seen = [], set()
+    for result in results:
+        for item in result.get("vocab") or []:
+            if not isinstance(item, dict) or item.get("word") in seen or len(vocab) >= limit:
+                continue
+            seen.add(item.get("word"))
+            vocab.append(item)
+    if prepared is not None:
+        for item in vocab:
+            lines = prepared.find_lines(item.get("example"))
+            if lines:
+                item["example_lines"] = lines
+    return {**results[0], "translation": translation, "vocab": vocab}
+
+
+def drop_known(result, index, limit: int = VOCAB_PER_SONG):
+    """
+    결과에서 이미 아는 단어를 뺍니다. 반환값: (새 결과, 뺀 단어 수, 더 필요한 단어 수)
+    더 필요한 수는 아는 단어를 뺀 만큼만 셉니다. (LLM이 처음부터 적게 준 건 다시 요청하지 않아요)
+    """
+    if not isinstance(result, dict):
+        return result, 0, 0
+    fresh, known = known_vocab.filter_vocab(result.get("vocab"), index)
+    missing = min(len(known), max(0, limit - len(fresh)))
+    return {**result, "vocab": fresh}, len(known), missing
+
+
+def refill_exclude(exclude, result):
+    """다시 요청할 때 뺄 단어: 아는 단어 + 이번 결과에 이미 있는 단어"""
+    words = [item.get("word") for item in (result or {}).get("vocab") or [] if item.get("word")]
+    return list(dict.fromkeys([*exclude, *words]))
+
+
+def cache_version(exclude=(), count=0) -> str:
+    """
+    캐시 키에 넣을 프롬프트 버전입니다.
+
+    뺄 단어(exclude)를 프롬프트에 넣었으면 결과가 그 사용자 것이라, 목록을 키에 같이 넣어서
+    다른 사용자와 섞이지 않게 합니다. 뺄 단어가 없으면 모두가 같이 쓰는 키(PROMPT_VERSION)예요.
+    count는 채워 넣기(refill) 요청의 단어 수입니다.
+    """
+    if not exclude and not count:
+        return PROMPT_VERSION
+    digest = hashlib.sha256("\x1f".join(sorted(exclude)).encode("utf-8")).hexdigest()[:16]
+    return f"{PROMPT_VERSION}/{count}/{digest}"
+
+
+def analyze_lyrics(api_key: str, lyrics: str, model: str = MODEL, on_event=None, prepared=None):
+    """
+    가사를 분석합니다. 캐시에 있으면 OpenAI를 부르지 않아요.
+
+    on_event를 주면 스트리밍 모드로 요청해서, 번역/단어가 도착하는 대로 on_event(kind, value)를 부릅니다.
+    (캐시에서 꺼냈거나 다른 세션의 결과를 받은 경우엔 on_event 없이 바로 결과만 돌려줘요.)
+
+    prepared: lyrics_prep.prepare(lyrics)의 결과 (미리 만들어서 줄인 토큰 수를 보여 줄 때). 없으면 여기서 만들어요.
+    가사가 길어서 여러 조각이면 조각마다 차례로 요청하고 결과를 합칩니다.
+
+    다이어리에 이미 붙인 단어는 프롬프트에서 빼 달라고 하고, 그래도 온 단어는 걸러 냅니다.
+    걸러서 모자라면 모자란 만큼 한 번 더 요청해서 채워요.
+    (예전에 분석한 노래를 다시 넣어도 이미 붙인 단어 대신 새 단어가 나와요)
+    캐시에는 거르기 전의 LLM 응답만 저장합니다. 뺄 단어를 보낸 요청은 그 목록까지 키에 넣고(cache_version),
+    누구나 쓰는 결과(뺄 단어 없이 분석한 것)가 이미 있으면 그걸 먼저 꺼내 걸러 씁니다.
+
+    반환값: (result, source) — source는 "cache" / "shared" / "fresh" (analysis_cache.get_or_compute 참고)
+    """
+    if prepared is None:
+        prepared = lyrics_prep.prepare(lyrics)
+    chunks = prepared.chunks or [lyrics]
+    with tracing.span("known_vocab.lookup") as node:
+        index = known_vocab.get_index()
+        exclude = index.known_in(prepared.text or lyrics)
+        node.set(known=len(index), excluded=len(exclude))
+
+    def _compute():
+        lyrics_prep.record(prepared)
+        client = make_client(api_key)
+        results, done = [], {"translation": "", "words": set()}
+        for chunk, count in zip(chunks, chunk_counts(len(chunks))):
+            with tracing.span("llm.chunk", index=len(results), tokens=lyrics_prep.estimate_tokens(chunk)):
+                if on_event is None:
+                    results.append(request_analysis(client, chunk, model, count, exclude))
+                    continue
+
+                def _forward(kind, value):
+                    # 앞 조각의 번역은 앞에 붙이고, 이미 나온 단어나 아는 단어는 보내지 않습니다.
+                    if kind == "translation":
+                        on_event(kind, "\n".join(t for t in (done["translation"], value) if t))
+                    elif kind == "vocab" and value.get("word") not in done["words"]:
+                        if len(done["words"]) >= VOCAB_PER_SONG:
+                            return
+                        if not index.is_known(value.get("word")):
+                            done["words"].add(value.get("word"))
+                            on_event(kind, value)
+
+                result = request_analysis_stream(client, chunk, model, _forward, count, exclude)
+                results.append(result)
+                if isinstance(result, dict) and result.get("translation"):
+                    done["translation"] = "\n".join(t for t in (done["translation"], result["translation"]) if t)
+        return merge_results(results, prepared)
+
+    with tracing.span("analyze_lyrics", model=model) as node:
+        node.set(**{f"prep_{k}": v for k, v in prepared.metrics().items()})
+        # 캐시 키도 정리한 가사로 만듭니다. (후렴 반복/공백만 다른 붙여넣기는 같은 결과를 써요)
+        cache_text = prepared.text or lyrics
+        result, source = None, "cache"
+        if exclude:
+            result = analysis_cache.get(analysis_cache.make_key(cache_text, model, PROMPT_VERSION))
+        if result is None:
+            result, source = analysis_cache.get_or_compute(cache_text, model, cache_version(exclude), _compute)
+        result, dropped, missing = drop_known(result, index)
+        node.set(source=source, known_dropped=dropped)
+        if missing:
+            before = len(result["vocab"])
+            refill = refill_exclude(exclude, result)
+            with tracing.span("llm.refill", missing=missing) as refill_node:
+                extra, refill_source = analysis_cache.get_or_compute(
+                    cache_text, model, cache_version(refill, missing),
+                    lambda: request_analysis(make_client(api_key), max(chunks, key=len), model, missing, refill),
+                )
+                refill_node.set(source=refill_source)
+            extra, _, _ = drop_known(extra, index, missing)
+            if isinstance(extra, dict):
+                # 번역은 처음 결과 것을 그대로 두고 단어만 채웁니다.
+                result = merge_results([result, {"vocab": extra.get("vocab")}], prepared)
+            node.set(refilled=len(result["vocab"]) - before)
+    return result, source
@@ -0,0 +1,268 @@
+"""
+LLM에 보내기 전에 가사를 줄이는 전처리 모듈입니다. (입력 토큰 = 시간 + 돈)
+
+붙여 넣은 가사는 후렴이 몇 번씩 반복되고, 로마자 발음/번역 블록까지 같이 들어오는 경우가 많아요.
+prepare()는
+
+1. 줄마다 공백을 정리하고(NFKC, 연속 공백 → 한 칸),
+2. 일본어가 있는 곡에서 일본어가 한 글자도 없는 연(빈 줄로 나뉜 덩어리)을 뺍니다.
+   (로마자 발음/한국어 번역 블록 — 단어와 예문은 어차피 일본어 줄에서만 뽑아요)
+3. 똑같은 연은 한 번만, 이미 나온 줄은 다시 넣지 않습니다.
+   남긴 줄마다 "원래 가사의 몇 번째 줄(들)이었는지"를 기억해서, 응답의 예문을 원래 줄에 다시 이어 줄 수 있어요.
+4. 토큰 수를 어림해서, CHUNK_TOKENS를 넘으면 연 경계에서 여러 조각으로 나눕니다.
+
+토큰 수는 tiktoken이 설치돼 있으면 그걸로 세고, 없으면 글자 종류로 어림합니다.
+(일본어/한글 한 글자 ≈ 1토큰, 그 밖의 글자 4개 ≈ 1토큰)
+실제로 LLM에 보낸 요청만 record()로 stats()에 쌓고, 추적(tracing)이 켜져 있으면 span에도 붙어요.
+"""
+import functools
+import os
+import re
+import threading
+import unicodedata
+
+# 가사 한 조각(요청 하나)에 넣을 최대 토큰 수. 넘으면 연 경계에서 나눠서 따로 요청합니다.
+CHUNK_TOKENS = int(os.environ.get("VOCA_LYRICS_CHUNK_TOKENS", "1500"))
+# 토큰 수를 셀 때 쓸 tiktoken 인코딩 (gpt-4o 계열)
+TIKTOKEN_ENCODING = "o200k_base"
+
+# 히라가나/가타카나, 한자
+_JAPANESE = r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]"
+# 토큰 어림셈에서 "한 글자 ≈ 1토큰"으로 치는 글자 (위 + 한글, 전각 기호)
+_WIDE = r"[\u1100-\u11ff\u3000-\u30ff\u3130-\u318f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]"
+
+
+@functools.cache
+def _pattern(source):
+    # 넓은 유니코드 범위 정규식은 컴파일에만 몇 ms가 걸려서, 앱 시작 때가 아니라 처음 쓸 때 만듭니다.
+    return re.compile(source)
+
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "raw_tokens": 0, "sent_tokens": 0, "chunks": 0}
+
+
+# --- 토큰 어림 ---
+
+@functools.cache
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+    except Exception:
+        # 인코딩 파일을 못 받는 환경(오프라인 등)이면 어림셈으로 갑니다.
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    wide = len(_pattern(_WIDE).findall(text))
+    return wide + -(-(len(text) - wide) // 4)
+
+
+# --- 정리 ---
+
+def normalize_line(line: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", line).split())
+
+
+class PreparedLyrics:
+    """
+    prepare()의 결과입니다.
+
+    - lines: 남긴 줄들 [(글자, [원래 줄 번호(1부터), ...]), ...] — 빈 글자는 연 구분
+    - chunks: 요청마다 보낼 가사 글자 목록 (보통 1개)
+    - text: 조각을 모두 이은 글자 (캐시 키용)
+    """
+
+    def __init__(self, lines, chunks, raw_tokens, dropped_lines):
+        self.lines = lines
+        self.chunks = chunks
+        self.text = "\n\n".join(chunks)
+        self.raw_tokens = raw_tokens
+        self.sent_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+        self.dropped_lines = dropped_lines
+        self._refs = {}
+        for text, refs in lines:
+            if text:
+                self._refs.setdefault(text, refs)
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.raw_tokens - self.sent_tokens)
+
+    def metrics(self):
+        return {
+            "raw_tokens": self.raw_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.saved_tokens,
+            "saved_ratio": round(self.saved_tokens / self.raw_tokens, 3) if self.raw_tokens else 0.0,
+            "dropped_lines": self.dropped_lines,
+            "chunks": len(self.chunks),
+        }
+
+    def find_lines(self, example: str):
+        """
+        예문이 원래 가사의 몇 번째 줄(들)에 있었는지 돌려줍니다. 못 찾으면 빈 리스트
+
+        예문이 줄 전체가 아니라 줄의 일부이거나, 두 줄에 걸쳐 있어도 찾아요.
+        """
+        needle = normalize_line(example or "")
+        if not needle:
+            return []
+        if needle in self._refs:
+            return list(self._refs[needle])
+        found = []
+        for text, refs in self._refs.items():
+            if needle in text or (len(text) >= 4 and text in needle):
+                found.extend(refs)
+        return sorted(found)
+
+
+def _stanzas(raw: str):
+    """가사 → 연 목록 [[(글자, 줄 번호), ...], ...] (빈 줄은 연 구분으로만 씁니다)"""
+    stanzas, current = [], []
+    for number, line in enumerate(raw.splitlines(), 1):
+        text = normalize_line(line)
+        if text:
+            current.append((text, number))
+        elif current:
+            stanzas.append(current)
+            current = []
+    if current:
+        stanzas.append(current)
+    return stanzas
+
+
+def _split_lines(block, budget):
+    """연 하나가 예산보다 크면 줄 단위로 나눠서 예산 안의 덩어리들로 만듭니다."""
+    parts, current, used = [], [], 0
+    for line in block.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if current and used + cost > budget:
+            parts.append("\n".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        parts.append("\n".join(current))
+    return parts
+
+
+def _chunk(blocks, budget):
+    """연(글자 덩어리)들을 순서대로 budget 토큰 안에서 이어 붙입니다."""
+    units = []
+    for block in blocks:
+        units.extend([block] if estimate_tokens(block) <= budget else _split_lines(block, budget))
+    chunks, current, used = [], [], 0
+    for unit in units:
+        cost = estimate_tokens(unit) + 2
+        if current and used + cost > budget:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(unit)
+        used += cost
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def prepare(raw: str, budget=None, drop_foreign=True) -> PreparedLyrics:
+    """가사를 정리하고 토큰 예산에 맞게 나눕니다."""
+    budget = CHUNK_TOKENS if budget is None else budget
+    raw = raw or ""
+    stanzas = _stanzas(raw)
+    total_lines = sum(len(stanza) for stanza in stanzas)
+    if drop_foreign and any(_pattern(_JAPANESE).search(text) for stanza in stanzas for text, _ in stanza):
+        stanzas = [stanza for stanza in stanzas if any(_pattern(_JAPANESE).search(text) for text, _ in stanza)]
+
+    lines, blocks = [], []
+    where = {}          # 줄 글자 → 그 줄이 나온 원래 줄 번호들 (처음 남긴 줄에 모아요)
+    seen_stanzas = set()
+    for stanza in stanzas:
+        kept = []
+        for text, number in stanza:
+            if text in where:
+                where[text].append(number)
+            else:
+                where[text] = [number]
+                kept.append(text)
+        key = "\n".join(text for text, _ in stanza)
+        if key in seen_stanzas or not kept:
+            # 똑같은 연(후렴 반복)이거나 모두 앞에서 나온 줄이면 통째로 건너뜁니다.
+            continue
+        seen_stanzas.add(key)
+        if lines:
+            lines.append(("", []))
+        lines.extend((text, where[text]) for text in kept)
+        blocks.append("\n".join(kept))
+
+    kept_lines = sum(1 for text, _ in lines if text)
+    prepared = PreparedLyrics(
+        lines,
+        _chunk(blocks, budget) if blocks else [],
+        estimate_tokens(raw),
+        total_lines - kept_lines,
+    )
+    return prepared
+
+
+def record(prepared: PreparedLyrics) -> None:
+    """
+    정리한 가사를 실제로 LLM에 보냈을 때 부릅니다. (stats()에 쌓여요)
+    prepare()는 캐시 키를 만들 때도 부르니까, 거기서 세면 캐시 적중/중복 곡까지 세게 돼요.
+    """
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["raw_tokens"] += prepared.raw_tokens
+        _stats["sent_tokens"] += prepared.sent_tokens
+        _stats["chunks"] += len(prepared.chunks)
+
+
+def stats():
+    """프로세스가 뜬 뒤로 쌓인 전처리 통계 (요청 수, 원래/보낸 토큰, 조각 수, 절약 비율)"""
+    with _stats_lock:
+        result = dict(_stats)
+    saved = max(0, result["raw_tokens"] - result["sent_tokens"])
+    result["saved_tokens"] = saved
+    result["saved_ratio"] = saved / result["raw_tokens"] if result["raw_tokens"] else 0.0
+    return result
+
+
+def main(argv=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="가사 전처리 결과와 줄인 토큰 수를 보여 줍니다")
+    parser.add_argument("input", nargs="?", help="가사 파일 (없으면 표준 입력)")
+    parser.add_argument("--budget", type=int, default=CHUNK_TOKENS, help="조각 하나의 최대 토큰 수")
+    parser.add_argument("--keep-foreign", action="store_true", help="일본어가 없는 연도 남기기")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            raw = f.read()
+    else:
+        raw = sys.stdin.read()
+    prepared = prepare(raw, budget=args.budget, drop_foreign=not args.keep_foreign)
+    for index, chunk in enumerate(prepared.chunks, 1):
+        print(f"--- 조각 {index} ({estimate_tokens(chunk)} 토큰) ---")
+        print(chunk)
+    m = prepared.metrics()
+    print(
+        f"\n토큰 {m['raw_tokens']} → {m['sent_tokens']} ({m['saved_ratio']:.0%} 절약), "
+        f"뺀 줄 {m['dropped_lines']}개, 조각 {m['chunks']}개"
+        + ("" if _encoder() else " (어림셈)")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,910 @@
+"""
+DB 스키마 마이그레이션(버전 관리) 모듈입니다.
+
+SQLite 파일 헤더에는 정수 하나를 저장할 수 있는 `PRAGMA user_version` 칸이 있어요.
+이 값을 "지금 DB가 몇 번 마이그레이션까지 적용됐는지"로 사용합니다.
+
+- MIGRATIONS에 (번호, 이름, 함수)를 순서대로 추가만 하면 됩니다. (이미 있는 항목은 고치지 않기!)
+- migrate()는 user_version을 한 번 읽어서 최신이면 바로 끝나고,
+  아니면 남은 마이그레이션을 "하나의 트랜잭션"으로 적용한 뒤 적용한 목록을 돌려줍니다.
+- 사용자별 DB(tenant 파일)와 모두가 같이 쓰는 DB는 번호를 같이 쓰지만, SHARED_ONLY에 있는
+  번호는 같이 쓰는 DB에서만 실제로 실행하고 사용자별 DB에서는 번호만 올려요.
+"""
+import sqlite3
+import unicodedata
+
+
+def normalize_song_key(text) -> str:
+    """
+    노래 제목/가수 이름을 "같은 노래인지" 비교하기 위한 키로 바꿉니다.
+
+    전각/반각(NFKC), 앞뒤·중복 공백, 대소문자 차이를 없애서
+    "Lemon", " lemon ", "Ｌｅｍｏｎ"이 모두 같은 노래로 묶이게 합니다.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).casefold()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _m001_base_schema(conn):
+    """
+    기본 테이블(study_log / diary_layout / diary_text)을 만듭니다.
+
+    예전 버전 앱은 실행할 때마다 CREATE TABLE + ALTER TABLE(실패하면 무시)를 했기 때문에,
+    user_version이 0인 기존 DB에는 컬럼이 빠져 있을 수 있어요. 없는 컬럼만 골라서 추가합니다.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS study_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            word TEXT NOT NULL,
+            song_title TEXT,
+            artist TEXT,
+            reading TEXT,
+            meaning TEXT NOT NULL,
+            example TEXT,
+            example_reading TEXT,
+            example_pronunciation TEXT,
+            example_meaning TEXT,
+            pronunciation TEXT,
+            UNIQUE(date, word)
+        )
+    """)
+
+    existing = _columns(conn, "study_log")
+    for col_name, col_type in (
+        ("pronunciation", "TEXT"),
+        ("reading", "TEXT"),
+        ("song_title", "TEXT"),
+        ("artist", "TEXT"),
+        ("example_reading", "TEXT"),
+        ("example_pronunciation", "TEXT"),
+        ("example_meaning", "TEXT"),
+    ):
+        if col_name not in existing:
+            conn.execute(f"ALTER TABLE study_log ADD COLUMN {col_name} {col_type}")
+
+    # 다꾸(레이아웃/메모) 저장용 테이블
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS diary_layout (
+            date TEXT PRIMARY KEY,
+            layout_json TEXT NOT NULL
+        )
+    """)
+
+    # 다꾸 "노트 텍스트" 저장용 테이블 (날짜별 1개)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS diary_text (
+            date TEXT PRIMARY KEY,
+            content TEXT NOT NULL
+        )
+    """)
+
+
+def _m002_song_table(conn):
+    """
+    노래를 별도 테이블(song)로 빼고, study_log에는 song_id만 연결합니다.
+
+    예전에는 TRIM(song_title) 같은 "식"으로 비교해서 인덱스를 못 탔어요.
+    정규화된 키(title_key/artist_key)로 노래를 찾고, (song_id, date)/(date, song_id)
+    인덱스로 범위 검색을 하도록 바꿉니다. 기존 행은 여기서 song_id를 채워 넣어요.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS song (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL DEFAULT '',
+            title_key TEXT NOT NULL,
+            artist_key TEXT NOT NULL,
+            UNIQUE(title_key, artist_key)
+        )
+    """)
+    if "song_id" not in _columns(conn, "study_log"):
+        conn.execute("ALTER TABLE study_log ADD COLUMN song_id INTEGER REFERENCES song(id)")
+
+    # 기존 행 채우기: (제목, 가수) 원문 조합마다 song 행을 한 번씩만 찾거나 만듭니다.
+    song_ids = {}
+    updates = []
+    rows = conn.execute("""
+        SELECT id, song_title, artist
+        FROM study_log
+        WHERE song_title IS NOT NULL AND TRIM(song_title) <> ''
+    """).fetchall()
+    for row_id, raw_title, raw_artist in rows:
+        pair = (raw_title, raw_artist)
+        if pair not in song_ids:
+            title = (raw_title or "").strip()
+            artist = (raw_artist or "").strip()
+            title_key, artist_key = normalize_song_key(title), normalize_song_key(artist)
+            conn.execute(
+                "INSERT OR IGNORE INTO song (title, artist, title_key, artist_key) VALUES (?, ?, ?, ?)",
+                (title, artist, title_key, artist_key),
+            )
+            song_ids[pair] = conn.execute(
+                "SELECT id FROM song WHERE title_key = ? AND artist_key = ?",
+                (title_key, artist_key),
+            ).fetchone()[0]
+        updates.append((song_ids[pair], row_id))
+    conn.executemany("UPDATE study_log SET song_id = ? WHERE id = ?", updates)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_study_log_song_date ON study_log(song_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_study_log_date_song ON study_log(date, song_id)")
+
+
+def _m003_analysis_cache(conn):
+    """
+    가사 분석(LLM) 결과 캐시 테이블입니다. (analysis_cache.py에서 사용)
+
+    cache_key = sha256(정규화된 가사 + 프롬프트 버전 + 모델)이라서,
+    같은 노래를 다른 사용자가 분석해도 같은 행을 재사용합니다.
+    last_used_at 인덱스는 오래 안 쓴 항목부터 지우는(LRU) 정리에 씁니다.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            result_json TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hit_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache(last_used_at)"
+    )
+
+
+def _m004_daily_summary(conn):
+    """
+    날짜별 요약 테이블(daily_summary: 단어 수/노래 수)을 만들고, 트리거로 항상 최신으로 유지합니다.
+
+    캘린더는 "기록이 있는 날짜"만 필요해서, study_log 전체에 SELECT DISTINCT date를 하는 대신
+    이 작은 표에서 보이는 달만 읽습니다. 노래 수는 그 날짜에 같은 노래가 처음 들어오거나
+    마지막으로 빠질 때만 바뀌고, 이 확인은 (date, song_id) 인덱스로 바로 끝나요.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            date TEXT PRIMARY KEY,
+            word_count INTEGER NOT NULL DEFAULT 0,
+            song_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_daily_insert
+        AFTER INSERT ON study_log
+        BEGIN
+            INSERT OR IGNORE INTO daily_summary (date, word_count, song_count)
+            VALUES (NEW.date, 0, 0);
+            UPDATE daily_summary
+            SET word_count = word_count + 1,
+                song_count = song_count + (
+                    NEW.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_log
+                        WHERE date = NEW.date AND song_id = NEW.song_id AND id <> NEW.id
+                    )
+                )
+            WHERE date = NEW.date;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_daily_delete
+        AFTER DELETE ON study_log
+        BEGIN
+            UPDATE daily_summary
+            SET word_count = word_count - 1,
+                song_count = song_count - (
+                    OLD.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_log
+                        WHERE date = OLD.date AND song_id = OLD.song_id
+                    )
+                )
+            WHERE date = OLD.date;
+            DELETE FROM daily_summary WHERE date = OLD.date AND word_count <= 0;
+        END
+    """)
+    # 날짜나 노래를 고치는 경우(예: 데이터 정리)는 "옛 값 삭제 + 새 값 추가"로 처리합니다.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_daily_update
+        AFTER UPDATE OF date, song_id ON study_log
+        WHEN OLD.date IS NOT NEW.date OR OLD.song_id IS NOT NEW.song_id
+        BEGIN
+            UPDATE daily_summary
+            SET word_count = word_count - 1,
+                song_count = song_count - (
+                    OLD.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_log
+                        WHERE date = OLD.date AND song_id = OLD.song_id
+                    )
+                )
+            WHERE date = OLD.date;
+            DELETE FROM daily_summary WHERE date = OLD.date AND word_count <= 0;
+
+            INSERT OR IGNORE INTO daily_summary (date, word_count, song_count)
+            VALUES (NEW.date, 0, 0);
+            UPDATE daily_summary
+            SET word_count = word_count + 1,
+                song_count = song_count + (
+                    NEW.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_log
+                        WHERE date = NEW.date AND song_id = NEW.song_id AND id <> NEW.id
+                    )
+                )
+            WHERE date = NEW.date;
+        END
+    """)
+
+    # 기존 기록 채우기
+    conn.execute("DELETE FROM daily_summary")
+    conn.execute("""
+        INSERT INTO daily_summary (date, word_count, song_count)
+        SELECT date, COUNT(*), COUNT(DISTINCT song_id)
+        FROM study_log
+        GROUP BY date
+    """)
+
+
+def _m005_song_daily_rollup(conn):
+    """
+    노래별·날짜별 단어 수 롤업(song_daily_rollup)을 만들고, 트리거로 항상 최신으로 유지합니다.
+
+    "이번주/이번달/이번연도" 요약은 study_log 원본 행을 세는 대신
+    (노래 수 × 날짜 수)만큼의 작은 행을 더하기만 하면 됩니다.
+    검증/재계산은 db_manager.verify_rollups() / rebuild_rollups()를 쓰세요.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS song_daily_rollup (
+            date TEXT NOT NULL,
+            song_id INTEGER NOT NULL REFERENCES song(id),
+            word_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, song_id)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_rollup_insert
+        AFTER INSERT ON study_log
+        WHEN NEW.song_id IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO song_daily_rollup (date, song_id, word_count)
+            VALUES (NEW.date, NEW.song_id, 0);
+            UPDATE song_daily_rollup SET word_count = word_count + 1
+            WHERE date = NEW.date AND song_id = NEW.song_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_rollup_delete
+        AFTER DELETE ON study_log
+        WHEN OLD.song_id IS NOT NULL
+        BEGIN
+            UPDATE song_daily_rollup SET word_count = word_count - 1
+            WHERE date = OLD.date AND song_id = OLD.song_id;
+            DELETE FROM song_daily_rollup
+            WHERE date = OLD.date AND song_id = OLD.song_id AND word_count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_rollup_update
+        AFTER UPDATE OF date, song_id ON study_log
+        WHEN OLD.date IS NOT NEW.date OR OLD.song_id IS NOT NEW.song_id
+        BEGIN
+            UPDATE song_daily_rollup SET word_count = word_count - 1
+            WHERE date = OLD.date AND song_id = OLD.song_id;
+            DELETE FROM song_daily_rollup
+            WHERE date = OLD.date AND song_id = OLD.song_id AND word_count <= 0;
+
+            INSERT OR IGNORE INTO song_daily_rollup (date, song_id, word_count)
+            SELECT NEW.date, NEW.song_id, 0 WHERE NEW.song_id IS NOT NULL;
+            UPDATE song_daily_rollup SET word_count = word_count + 1
+            WHERE date = NEW.date AND song_id = NEW.song_id;
+        END
+    """)
+
+    # 기존 기록 채우기
+    conn.execute("DELETE FROM song_daily_rollup")
+    conn.execute("""
+        INSERT INTO song_daily_rollup (date, song_id, word_count)
+        SELECT date, song_id, COUNT(*)
+        FROM study_log
+        WHERE song_id IS NOT NULL
+        GROUP BY date, song_id
+    """)
+
+
+# 검색 대상 컬럼 (study_log_fts의 컬럼 순서와 같아야 합니다)
+SEARCH_COLUMNS = ("word", "reading", "pronunciation", "meaning", "example", "example_meaning")
+
+
+def _m006_word_search(conn):
+    """
+    단어 검색용 FTS5 인덱스(study_log_fts)를 만들고, 트리거로 study_log와 맞춰 둡니다.
+
+    - tokenize='trigram': 일본어는 띄어쓰기가 없어서 단어 단위로 자르면 검색이 안 돼요.
+      글자 3개씩 잘라 두면 가나/한자/한국어 어디든 "부분 문자열"로 찾을 수 있습니다.
+    - content='study_log': 본문은 study_log에만 두고, FTS 쪽에는 인덱스만 저장합니다. (DB 크기 절약)
+      그래서 study_log가 바뀌면 트리거로 FTS에 "옛 값 삭제('delete') + 새 값 추가"를 직접 알려 줘야 해요.
+    """
+    columns = ", ".join(SEARCH_COLUMNS)
+    old_values = ", ".join(f"OLD.{c}" for c in SEARCH_COLUMNS)
+    new_values = ", ".join(f"NEW.{c}" for c in SEARCH_COLUMNS)
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS study_log_fts USING fts5(
+            {columns},
+            content='study_log',
+            content_rowid='id',
+            tokenize='trigram'
+        )
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_fts_insert
+        AFTER INSERT ON study_log
+        BEGIN
+            INSERT INTO study_log_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_fts_delete
+        AFTER DELETE ON study_log
+        BEGIN
+            INSERT INTO study_log_fts (study_log_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_fts_update
+        AFTER UPDATE OF {columns} ON study_log
+        BEGIN
+            INSERT INTO study_log_fts (study_log_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO study_log_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    """)
+
+    # 기존 기록 채우기 (content 테이블에서 인덱스를 다시 만듭니다)
+    conn.execute("INSERT INTO study_log_fts (study_log_fts) VALUES ('rebuild')")
+
+
+def _m007_review_state(conn):
+    """
+    복습(SRS) 상태 테이블(review_state)을 만듭니다. study_log 한 행 = 복습 카드 한 장.
+
+    "지금 복습할 카드"는 due_at 인덱스에서 앞부분만 읽으면 되므로, 단어가 몇만 개로 늘어나도
+    전체를 훑거나 정렬하지 않아요. 새로 저장한 단어는 트리거로 바로 카드가 생기고(즉시 복습 대상),
+    단어를 지우면 카드도 같이 지워집니다. 시간은 analysis_cache처럼 epoch 초(REAL)로 저장해요.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_state (
+            log_id INTEGER PRIMARY KEY REFERENCES study_log(id),
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval_days REAL NOT NULL DEFAULT 0,
+            reps INTEGER NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            due_at REAL NOT NULL,
+            last_reviewed_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state(due_at, log_id)")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_review_insert
+        AFTER INSERT ON study_log
+        BEGIN
+            INSERT OR IGNORE INTO review_state (log_id, due_at)
+            VALUES (NEW.id, CAST(strftime('%s', 'now') AS REAL));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_review_delete
+        AFTER DELETE ON study_log
+        BEGIN
+            DELETE FROM review_state WHERE log_id = OLD.id;
+        END
+    """)
+
+    # 기존 기록 채우기 (예전에 저장한 단어는 모두 지금부터 복습 대상)
+    conn.execute("""
+        INSERT OR IGNORE INTO review_state (log_id, due_at)
+        SELECT id, CAST(strftime('%s', 'now') AS REAL) FROM study_log
+    """)
+
+
+def _m008_layout_deltas(conn):
+    """
+    다꾸 레이아웃을 "스냅샷 + 변경분(JSON Patch)"으로 나눠 저장하는 테이블로 옮깁니다.
+
+    diary_layout은 스티커 하나만 옮겨도 날짜의 JSON 전체를 다시 썼어요. 이제는
+    layout_delta에 바뀐 부분만 한 줄씩 쌓고, 쌓인 게 많아지면 layout_store가 스냅샷을
+    새로 만들면서(필요하면 zlib 압축) 지난 변경분을 지웁니다. (자세한 건 layout_store.py)
+
+    기존 레이아웃은 압축하지 않은 스냅샷(version 0)으로 옮기고 diary_layout은 지웁니다.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS layout_snapshot (
+            date TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS layout_delta (
+            date TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            patch TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (date, version)
+        ) WITHOUT ROWID
+    """)
+
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'diary_layout'"
+    ).fetchone():
+        conn.execute("""
+            INSERT OR IGNORE INTO layout_snapshot (date, version, codec, data, updated_at)
+            SELECT date, 0, 'json', CAST(layout_json AS BLOB), CAST(strftime('%s', 'now') AS REAL)
+            FROM diary_layout
+        """)
+        conn.execute("DROP TABLE diary_layout")
+
+
+def _m009_diary_text_history(conn):
+    """
+    노트(diary_text)에 버전 번호를 달고, 예전 버전을 diary_text_history에 "역방향 diff"로 남깁니다.
+
+    diary_text에는 언제나 최신 글만 통째로 있고(읽기는 예전과 똑같이 한 행),
+    history의 (date, version) 행은 "version+1 내용에서 version 내용을 되살리는 작은 diff"예요.
+    (자세한 건 note_store.py)
+    """
+    existing = _columns(conn, "diary_text")
+    for col_name, col_def in (
+        ("version", "INTEGER NOT NULL DEFAULT 1"),
+        ("started_at", "REAL"),
+        ("updated_at", "REAL"),
+    ):
+        if col_name not in existing:
+            conn.execute(f"ALTER TABLE diary_text ADD COLUMN {col_name} {col_def}")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS diary_text_history (
+            date TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            diff TEXT NOT NULL,
+            saved_at REAL,
+            PRIMARY KEY (date, version)
+        ) WITHOUT ROWID
+    """)
+
+
+# 단어 검색 대상 컬럼 (010부터: vocab_fts / example_fts의 컬럼 순서와 같아야 합니다)
+VOCAB_SEARCH_COLUMNS = ("word", "reading", "pronunciation", "meaning")
+EXAMPLE_SEARCH_COLUMNS = ("text", "meaning")
+
+def _fts_sync_triggers(conn, table, fts_table, columns):
+    """content 테이블(table)이 바뀔 때 FTS 인덱스(fts_table)를 맞춰 주는 트리거 (006과 같은 방식)"""
+    names = ", ".join(columns)
+    old_values = ", ".join(f"OLD.{c}" for c in columns)
+    new_values = ", ".join(f"NEW.{c}" for c in columns)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {names}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update
+        AFTER UPDATE OF {names} ON {table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {names}) VALUES (NEW.id, {new_values});
+        END
+    """)
+
+
+def _m010_vocab_tables(conn):
+    """
+    study_log를 단어(vocab) / 예문(example) / 저장 기록(study_event)으로 나눕니다.
+
+    예전에는 같은 단어를 여러 날, 여러 노래에서 저장하면 읽기/뜻/발음/예문 글자가 행마다 통째로
+    반복됐어요. 이제 글자는 (단어, 읽기)마다 vocab 한 행, 예문 글자마다 example 한 행에만 두고,
+    study_event는 (날짜, vocab_id, song_id, example_id)만 들고 있습니다.
+    그래서 DB 크기/페이지 캐시/검색 인덱스는 "저장한 횟수"가 아니라 "서로 다른 단어 수"만큼 커져요.
+
+    - study_event.id는 study_log.id를 그대로 씁니다. (review_state, 페이지 커서가 그대로 맞아요)
+    - vocab은 (단어, 읽기, 뜻, 발음)마다, example은 (예문, 읽기, 발음, 뜻)마다 한 행이에요.
+      같은 단어를 뜻을 다르게 저장했어도 행마다 저장한 글자가 그대로 남습니다.
+      옮긴 행 수가 study_log와 다르면 아무것도 지우지 않고 마이그레이션을 실패시켜요.
+    - "같은 날짜에 같은 단어는 한 번만"(예전 UNIQUE(date, word))은 트리거로 지킵니다.
+      (단어 글자는 vocab에 있어서 study_event에 UNIQUE로 걸 수 없어요)
+    - 요약(daily_summary / song_daily_rollup)과 복습 카드 트리거는 study_event로 옮깁니다.
+    - 검색 인덱스도 vocab_fts / example_fts로 나눠서 서로 다른 글자만 인덱스에 넣습니다.
+    - 마지막 저장 기록이 지워진 단어/예문은 트리거로 같이 지워요.
+    - study_log는 같은 컬럼을 돌려주는 읽기용 뷰로 남깁니다. (DELETE만 study_event로 넘겨 줘요)
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS vocab (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word TEXT NOT NULL,
+            reading TEXT NOT NULL DEFAULT '',
+            meaning TEXT NOT NULL DEFAULT '',
+            pronunciation TEXT NOT NULL DEFAULT '',
+            UNIQUE(word, reading, meaning, pronunciation)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS example (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            reading TEXT NOT NULL DEFAULT '',
+            pronunciation TEXT NOT NULL DEFAULT '',
+            meaning TEXT NOT NULL DEFAULT '',
+            UNIQUE(text, reading, pronunciation, meaning)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS study_event (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            vocab_id INTEGER NOT NULL REFERENCES vocab(id),
+            song_id INTEGER REFERENCES song(id),
+            example_id INTEGER REFERENCES example(id),
+            UNIQUE(date, vocab_id)
+        )
+    """)
+
+    # 기존 기록 옮기기 (id 순서대로 넣어서 vocab/example 번호도 처음 나온 순서를 따라가요)
+    # 글자 조합이 하나라도 다르면 다른 행이라, 서로 다른 행은 모두 그대로 옮겨집니다.
+    conn.execute("""
+        INSERT OR IGNORE INTO vocab (word, reading, meaning, pronunciation)
+        SELECT word, COALESCE(reading, ''), COALESCE(meaning, ''), COALESCE(pronunciation, '')
+        FROM study_log
+        ORDER BY id
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO example (text, reading, pronunciation, meaning)
+        SELECT example, COALESCE(example_reading, ''), COALESCE(example_pronunciation, ''),
+               COALESCE(example_meaning, '')
+        FROM study_log
+        WHERE COALESCE(example, '') <> ''
+        ORDER BY id
+    """)
+    conn.execute("""
+        INSERT INTO study_event (id, date, vocab_id, song_id, example_id)
+        SELECT l.id, l.date, v.id, l.song_id, x.id
+        FROM study_log AS l
+        JOIN vocab AS v
+          ON v.word = l.word
+         AND v.reading = COALESCE(l.reading, '')
+         AND v.meaning = COALESCE(l.meaning, '')
+         AND v.pronunciation = COALESCE(l.pronunciation, '')
+        LEFT JOIN example AS x
+          ON x.text = l.example
+         AND x.reading = COALESCE(l.example_reading, '')
+         AND x.pronunciation = COALESCE(l.example_pronunciation, '')
+         AND x.meaning = COALESCE(l.example_meaning, '')
+        ORDER BY l.id
+    """)
+    # 지우기 전에 다 옮겼는지 확인합니다. (예문이 있는 행은 예문까지 이어졌는지도 봐요)
+    expected = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(COALESCE(example, '') <> ''), 0) FROM study_log
+    """).fetchone()
+    copied = conn.execute("SELECT COUNT(*), COUNT(example_id) FROM study_event").fetchone()
+    if tuple(copied) != tuple(expected):
+        raise sqlite3.IntegrityError(
+            f"study_log → study_event 옮기기가 맞지 않아요: 행 {copied[0]}/{expected[0]}, 예문 {copied[1]}/{expected[1]}"
+        )
+    # 지운 단어의 id를 다시 쓰지 않도록 AUTOINCREMENT 번호도 이어 갑니다.
+    old_seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'study_log'").fetchone()
+    if old_seq and not conn.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'study_event'", (old_seq[0],)
+    ).rowcount:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('study_event', ?)", (old_seq[0],))
+
+    # study_log에 걸린 트리거/인덱스는 테이블과 같이 지워집니다.
+    conn.execute("DROP TABLE IF EXISTS study_log_fts")
+    conn.execute("DROP TABLE study_log")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_study_event_song_date ON study_event(song_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_study_event_date_song ON study_event(date, song_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_study_event_vocab ON study_event(vocab_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_study_event_example ON study_event(example_id)"
+        " WHERE example_id IS NOT NULL"
+    )
+
+    # 같은 날짜에 같은 단어(뜻/읽기가 달라도)는 한 번만 — 예전 study_log의 UNIQUE(date, word)와 같은 규칙
+    # (그날 저장한 기록만 date 인덱스로 훑으니까 저장할 때 드는 비용은 작아요)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_unique_word_insert
+        BEFORE INSERT ON study_event
+        WHEN EXISTS (
+            SELECT 1 FROM study_event AS e JOIN vocab AS v ON v.id = e.vocab_id
+            WHERE e.date = NEW.date AND v.word = (SELECT word FROM vocab WHERE id = NEW.vocab_id)
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: study_event.date, vocab.word');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_unique_word_update
+        BEFORE UPDATE OF date, vocab_id ON study_event
+        WHEN EXISTS (
+            SELECT 1 FROM study_event AS e JOIN vocab AS v ON v.id = e.vocab_id
+            WHERE e.date = NEW.date AND e.id <> OLD.id
+              AND v.word = (SELECT word FROM vocab WHERE id = NEW.vocab_id)
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: study_event.date, vocab.word');
+        END
+    """)
+
+    # 복습 카드는 그대로 저장 기록 한 행 = 한 장이에요. (참조만 study_event로 바꿉니다)
+    conn.execute("""
+        CREATE TABLE review_state_new (
+            log_id INTEGER PRIMARY KEY REFERENCES study_event(id),
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval_days REAL NOT NULL DEFAULT 0,
+            reps INTEGER NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            due_at REAL NOT NULL,
+            last_reviewed_at REAL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO review_state_new
+        SELECT log_id, ease, interval_days, reps, lapses, due_at, last_reviewed_at FROM review_state
+    """)
+    conn.execute("DROP TABLE review_state")
+    conn.execute("ALTER TABLE review_state_new RENAME TO review_state")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state(due_at, log_id)")
+
+    # --- study_event 트리거 (004 / 005 / 007과 같은 내용, 테이블만 바뀜) ---
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_daily_insert
+        AFTER INSERT ON study_event
+        BEGIN
+            INSERT OR IGNORE INTO daily_summary (date, word_count, song_count)
+            VALUES (NEW.date, 0, 0);
+            UPDATE daily_summary
+            SET word_count = word_count + 1,
+                song_count = song_count + (
+                    NEW.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_event
+                        WHERE date = NEW.date AND song_id = NEW.song_id AND id <> NEW.id
+                    )
+                )
+            WHERE date = NEW.date;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_daily_delete
+        AFTER DELETE ON study_event
+        BEGIN
+            UPDATE daily_summary
+            SET word_count = word_count - 1,
+                song_count = song_count - (
+                    OLD.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_event
+                        WHERE date = OLD.date AND song_id = OLD.song_id
+                    )
+                )
+            WHERE date = OLD.date;
+            DELETE FROM daily_summary WHERE date = OLD.date AND word_count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_daily_update
+        AFTER UPDATE OF date, song_id ON study_event
+        WHEN OLD.date IS NOT NEW.date OR OLD.song_id IS NOT NEW.song_id
+        BEGIN
+            UPDATE daily_summary
+            SET word_count = word_count - 1,
+                song_count = song_count - (
+                    OLD.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_event
+                        WHERE date = OLD.date AND song_id = OLD.song_id
+                    )
+                )
+            WHERE date = OLD.date;
+            DELETE FROM daily_summary WHERE date = OLD.date AND word_count <= 0;
+
+            INSERT OR IGNORE INTO daily_summary (date, word_count, song_count)
+            VALUES (NEW.date, 0, 0);
+            UPDATE daily_summary
+            SET word_count = word_count + 1,
+                song_count = song_count + (
+                    NEW.song_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM study_event
+                        WHERE date = NEW.date AND song_id = NEW.song_id AND id <> NEW.id
+                    )
+                )
+            WHERE date = NEW.date;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_rollup_insert
+        AFTER INSERT ON study_event
+        WHEN NEW.song_id IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO song_daily_rollup (date, song_id, word_count)
+            VALUES (NEW.date, NEW.song_id, 0);
+            UPDATE song_daily_rollup SET word_count = word_count + 1
+            WHERE date = NEW.date AND song_id = NEW.song_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_rollup_delete
+        AFTER DELETE ON study_event
+        WHEN OLD.song_id IS NOT NULL
+        BEGIN
+            UPDATE song_daily_rollup SET word_count = word_count - 1
+            WHERE date = OLD.date AND song_id = OLD.song_id;
+            DELETE FROM song_daily_rollup
+            WHERE date = OLD.date AND song_id = OLD.song_id AND word_count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_rollup_update
+        AFTER UPDATE OF date, song_id ON study_event
+        WHEN OLD.date IS NOT NEW.date OR OLD.song_id IS NOT NEW.song_id
+        BEGIN
+            UPDATE song_daily_rollup SET word_count = word_count - 1
+            WHERE date = OLD.date AND song_id = OLD.song_id;
+            DELETE FROM song_daily_rollup
+            WHERE date = OLD.date AND song_id = OLD.song_id AND word_count <= 0;
+
+            INSERT OR IGNORE INTO song_daily_rollup (date, song_id, word_count)
+            SELECT NEW.date, NEW.song_id, 0 WHERE NEW.song_id IS NOT NULL;
+            UPDATE song_daily_rollup SET word_count = word_count + 1
+            WHERE date = NEW.date AND song_id = NEW.song_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_review_insert
+        AFTER INSERT ON study_event
+        BEGIN
+            INSERT OR IGNORE INTO review_state (log_id, due_at)
+            VALUES (NEW.id, CAST(strftime('%s', 'now') AS REAL));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_review_delete
+        AFTER DELETE ON study_event
+        BEGIN
+            DELETE FROM review_state WHERE log_id = OLD.id;
+        END
+    """)
+    # 마지막 저장 기록이 빠진 단어/예문은 남겨 둘 이유가 없어요. (vocab_id / example_id 인덱스로 바로 확인)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_prune_delete
+        AFTER DELETE ON study_event
+        BEGIN
+            DELETE FROM vocab WHERE id = OLD.vocab_id
+              AND NOT EXISTS (SELECT 1 FROM study_event WHERE vocab_id = OLD.vocab_id);
+            DELETE FROM example WHERE id = OLD.example_id
+              AND NOT EXISTS (SELECT 1 FROM study_event WHERE example_id = OLD.example_id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_event_prune_update
+        AFTER UPDATE OF vocab_id, example_id ON study_event
+        BEGIN
+            DELETE FROM vocab WHERE id = OLD.vocab_id AND OLD.vocab_id IS NOT NEW.vocab_id
+              AND NOT EXISTS (SELECT 1 FROM study_event WHERE vocab_id = OLD.vocab_id);
+            DELETE FROM example WHERE id = OLD.example_id AND OLD.example_id IS NOT NEW.example_id
+              AND NOT EXISTS (SELECT 1 FROM study_event WHERE example_id = OLD.example_id);
+        END
+    """)
+
+    # --- 검색 인덱스 (trigram, content 테이블은 vocab / example) ---
+    for table, columns in (("vocab", VOCAB_SEARCH_COLUMNS), ("example", EXAMPLE_SEARCH_COLUMNS)):
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                {", ".join(columns)},
+                content='{table}',
+                content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+        _fts_sync_triggers(conn, table, f"{table}_fts", columns)
+        conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+    # --- 예전 이름으로 읽는 코드/도구를 위한 호환 뷰 ---
+    # (마이그레이션은 한 번 적용되면 바뀌면 안 되니까, db_manager의 조인 상수를 쓰지 않고 그대로 적어 둡니다)
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS study_log AS
+        SELECT e.id AS id,
+               e.date AS date,
+               v.word AS word,
+               COALESCE(s.title, '') AS song_title,
+               COALESCE(s.artist, '') AS artist,
+               v.reading AS reading,
+               v.meaning AS meaning,
+               COALESCE(x.text, '') AS example,
+               COALESCE(x.reading, '') AS example_reading,
+               COALESCE(x.pronunciation, '') AS example_pronunciation,
+               COALESCE(x.meaning, '') AS example_meaning,
+               v.pronunciation AS pronunciation,
+               e.song_id AS song_id
+        FROM study_event AS e
+        JOIN vocab AS v ON v.id = e.vocab_id
+        LEFT JOIN example AS x ON x.id = e.example_id
+        LEFT JOIN song AS s ON s.id = e.song_id
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_study_log_view_delete
+        INSTEAD OF DELETE ON study_log
+        BEGIN
+            DELETE FROM study_event WHERE id = OLD.id;
+        END
+    """)
+
+
+# (번호, 이름, 함수) — 번호는 1부터 빈칸 없이 증가해야 합니다.
+MIGRATIONS = [
+    (1, "base_schema", _m001_base_schema),
+    (2, "song_table", _m002_song_table),
+    (3, "analysis_cache", _m003_analysis_cache),
+    (4, "daily_summary", _m004_daily_summary),
+    (5, "song_daily_rollup", _m005_song_daily_rollup),
+    (6, "word_search", _m006_word_search),
+    (7, "review_state", _m007_review_state),
+    (8, "layout_deltas", _m008_layout_deltas),
+    (9, "diary_text_history", _m009_diary_text_history),
+    (10, "vocab_tables", _m010_vocab_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# 모두가 같이 쓰는 DB에서만 실행하는 번호 (가사 분석 캐시 표)
+SHARED_ONLY = {3}
+
+
+def get_version(conn) -> int:
+    """DB에 기록된 마이그레이션 버전(PRAGMA user_version)을 읽습니다."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, shared=True):
+    """
+    아직 적용되지 않은 마이그레이션을 한 트랜잭션으로 적용합니다.
+
+    shared: 모두가 같이 쓰는 DB면 True, 사용자별 DB면 False (SHARED_ONLY 참고)
+    반환값: 이번에 적용한 마이그레이션 목록 [(번호, 이름), ...] (이미 최신이면 빈 리스트)
+    중간에 하나라도 실패하면 전부 롤백되고 user_version도 그대로 남습니다.
+    """
+    if get_version(conn) >= LATEST_VERSION:
+        return []
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 쓰기 잠금을 잡은 뒤 다시 확인합니다. (다른 프로세스가 먼저 올렸을 수 있어요)
+        current = get_version(conn)
+        applied = []
+        for version, name, func in MIGRATIONS:
+            if version <= current:
+                continue
+            if shared or version not in SHARED_ONLY:
+                func(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            applied.append((version, name))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return applied
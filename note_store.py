@@ -0,0 +1,259 @@
+"""
+다꾸 노트(diary_text) 저장 모듈입니다. (디바운스 자동 저장 + 버전 기록)
+
+- 최신 글은 예전처럼 diary_text에 통째로 둡니다. (읽기는 한 행)
+- 예전 버전은 diary_text_history에 "역방향 diff"로 남겨요:
+  [앞 공통 글자 수, 뒤 공통 글자 수, 그 사이의 옛 글자] → 한 군데만 고쳤으면 고친 만큼만 커집니다.
+  (date, version) 행은 version+1의 글에서 version의 글을 되살리는 diff예요.
+- 지금 버전이 시작된 지 SQUASH_SECONDS가 안 지났으면 새 버전을 만들지 않고 지금 버전을 고쳐 씁니다.
+  (자동 저장이 몇 초마다 와도 기록은 1분에 하나 정도만 쌓여요)
+- 날짜마다 예전 버전은 MAX_VERSIONS개까지만 남기고 가장 오래된 것부터 지웁니다.
+
+저장 함수들은 열린 연결(conn)을 받습니다. save/restore는 쓰기 트랜잭션 안에서 불러 주세요.
+
+Autosaver는 "글자를 칠 때마다 저장"을 모아 주는 디바운서입니다. submit()만 부르면
+입력이 DEBOUNCE_SECONDS 동안 멈췄을 때(계속 입력 중이어도 MAX_DELAY_SECONDS마다)
+마지막 글 하나만 저장해요. 프로세스가 끝날 때 남은 글도 저장합니다.
+저장이 실패하면 글을 다시 대기열에 넣고, 실패할수록 길게(최대 RETRY_MAX_SECONDS) 기다렸다가 다시 시도해요.
+"""
+import atexit
+import json
+import threading
+import time
+
+import tracing
+
+SQUASH_SECONDS = 60
+MAX_VERSIONS = 50
+DEBOUNCE_SECONDS = 2.0
+MAX_DELAY_SECONDS = 10.0
+# 저장이 실패했을 때 다시 시도하기까지 기다리는 최대 시간 (DEBOUNCE_SECONDS부터 두 배씩 늘어요)
+RETRY_MAX_SECONDS = 60.0
+# 버전 목록에 보여 줄 앞부분 글자 수
+PREVIEW_CHARS = 30
+
+
+# --- diff ---
+
+def make_diff(new: str, old: str) -> str:
+    """new에서 old를 되살리는 diff(JSON 글자)를 만듭니다."""
+    limit = min(len(new), len(old))
+    prefix = 0
+    while prefix < limit and new[prefix] == old[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and new[-1 - suffix] == old[-1 - suffix]:
+        suffix += 1
+    return json.dumps([prefix, suffix, old[prefix:len(old) - suffix]], ensure_ascii=False)
+
+
+def apply_diff(new: str, diff: str) -> str:
+    prefix, suffix, middle = json.loads(diff)
+    return new[:prefix] + middle + new[len(new) - suffix:]
+
+
+# --- 읽기 / 쓰기 ---
+
+def _row(conn, date):
+    return conn.execute(
+        "SELECT content, version, started_at, updated_at FROM diary_text WHERE date = ?", (date,)
+    ).fetchone()
+
+
+def exists(conn, date) -> bool:
+    return conn.execute("SELECT 1 FROM diary_text WHERE date = ?", (date,)).fetchone() is not None
+
+
+def save(conn, date, content: str, now=None, squash=True) -> int:
+    """
+    노트를 저장합니다. 반환값: 저장 뒤 version
+
+    squash=False면 시간과 상관없이 항상 새 버전을 만듭니다. (되돌리기 등)
+    """
+    now = time.time() if now is None else now
+    row = _row(conn, date)
+    if row is None:
+        conn.execute(
+            "INSERT INTO diary_text (date, content, version, started_at, updated_at) VALUES (?, ?, 1, ?, ?)",
+            (date, content, now, now),
+        )
+        return 1
+    if row["content"] == content:
+        return row["version"]
+
+    version = row["version"]
+    started = row["started_at"]
+    if squash and started is not None and now - started < SQUASH_SECONDS:
+        # 지금 버전을 고쳐 씁니다. 바로 전 버전의 diff는 새 글 기준으로 다시 만들어요.
+        previous = conn.execute(
+            "SELECT diff FROM diary_text_history WHERE date = ? AND version = ?", (date, version - 1)
+        ).fetchone()
+        if previous is not None:
+            older = apply_diff(row["content"], previous["diff"])
+            conn.execute(
+                "UPDATE diary_text_history SET diff = ? WHERE date = ? AND version = ?",
+                (make_diff(content, older), date, version - 1),
+            )
+        conn.execute("UPDATE diary_text SET content = ?, updated_at = ? WHERE date = ?", (content, now, date))
+        return version
+
+    conn.execute(
+        "INSERT INTO diary_text_history (date, version, diff, saved_at) VALUES (?, ?, ?, ?)",
+        (date, version, make_diff(content, row["content"]), row["updated_at"]),
+    )
+    conn.execute(
+        "UPDATE diary_text SET content = ?, version = ?, started_at = ?, updated_at = ? WHERE date = ?",
+        (content, version + 1, now, now, date),
+    )
+    conn.execute(
+        "DELETE FROM diary_text_history WHERE date = ? AND version <= ?", (date, version - MAX_VERSIONS)
+    )
+    return version + 1
+
+
+def _walk_back(conn, date):
+    """최신 → 오래된 순서로 (version, saved_at, 글)을 돌려줍니다."""
+    row = _row(conn, date)
+    if row is None:
+        return
+    content = row["content"]
+    yield row["version"], row["updated_at"], content
+    history = conn.execute(
+        "SELECT version, diff, saved_at FROM diary_text_history WHERE date = ? ORDER BY version DESC",
+        (date,),
+    ).fetchall()
+    expected = row["version"] - 1
+    for entry in history:
+        if entry["version"] != expected:
+            # 중간이 빠졌으면 그 뒤로는 되살릴 수 없어요. (정리된 오래된 버전)
+            break
+        content = apply_diff(content, entry["diff"])
+        yield entry["version"], entry["saved_at"], content
+        expected -= 1
+
+
+def list_versions(conn, date):
+    """
+    날짜의 버전 목록(최신이 먼저)을 돌려줍니다.
+    [{"version", "saved_at", "chars", "preview", "current"}, ...] — saved_at은 epoch 초(모르면 None)
+    """
+    versions = []
+    for version, saved_at, content in _walk_back(conn, date):
+        preview = " ".join(content.split())
+        versions.append({
+            "version": version,
+            "saved_at": saved_at,
+            "chars": len(content),
+            "preview": preview[:PREVIEW_CHARS] + ("…" if len(preview) > PREVIEW_CHARS else ""),
+            "current": not versions,
+        })
+    return versions
+
+
+def get_version(conn, date, version: int):
+    """특정 버전의 글을 돌려줍니다. 없으면 None"""
+    for v, _, content in _walk_back(conn, date):
+        if v == version:
+            return content
+        if v < version:
+            break
+    return None
+
+
+def restore(conn, date, version: int, now=None):
+    """예전 버전의 글을 새 버전으로 저장합니다. (지금 글도 기록에 남아요) 반환값: 새 version 또는 None"""
+    content = get_version(conn, date, version)
+    if content is None:
+        return None
+    return save(conn, date, content, now=now, squash=False)
+
+
+# --- 디바운스 자동 저장 ---
+
+class Autosaver:
+    """
+    날짜별로 마지막 글만 들고 있다가 입력이 잠잠해지면 save(date, content)로 저장합니다.
+
+    - get(date): 아직 저장 안 된 글이 있으면 그 글 (같은 프로세스 안에서 "방금 쓴 글"을 다시 읽을 때)
+    - flush(date=None): 기다리지 않고 바로 저장 (되돌리기 전, 페이지를 떠나기 전 등)
+    - error(date): 마지막 저장이 실패했으면 그 에러 메시지 (다시 시도 중), 아니면 None
+    """
+
+    def __init__(self, save, delay=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self._save = save
+        self.delay = delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        # 저장 순서를 지키려고, 꺼내기 + 저장하기를 한 번에 한 스레드만 합니다.
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._timers = {}
+        # {날짜: (연속 실패 횟수, 에러 메시지)} — 저장에 성공하면 지워요.
+        self._failures = {}
+        self.stats = {"submitted": 0, "written": 0, "errors": 0, "retries": 0}
+        atexit.register(self.flush)
+
+    def submit(self, date, content, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.stats["submitted"] += 1
+            first = self._pending[date][1] if date in self._pending else now
+            self._pending[date] = (content, first)
+            timer = self._timers.pop(date, None)
+            if timer is not None:
+                timer.cancel()
+            self._schedule(date, max(0.0, min(self.delay, first + self.max_delay - now)))
+
+    def _schedule(self, date, wait):
+        # self._lock을 잡은 채로 부릅니다.
+        timer = threading.Timer(wait, self.flush, args=(date,))
+        timer.daemon = True
+        self._timers[date] = timer
+        timer.start()
+
+    def get(self, date):
+        with self._lock:
+            entry = self._pending.get(date)
+        return entry[0] if entry else None
+
+    def error(self, date):
+        with self._lock:
+            failure = self._failures.get(date)
+        return failure[1] if failure else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, date=None) -> int:
+        """기다리는 글을 저장합니다. 반환값: 저장한 날짜 수"""
+        with self._write_lock:
+            with self._lock:
+                dates = list(self._pending) if date is None else [date] if date in self._pending else []
+                items = [(d, self._pending.pop(d)[0]) for d in dates]
+                for d in dates:
+                    timer = self._timers.pop(d, None)
+                    if timer is not None:
+                        timer.cancel()
+            written = 0
+            for d, content in items:
+                try:
+                    with tracing.span("note.autosave", date=d):
+                        self._save(d, content)
+                except Exception as e:
+                    with self._lock:
+                        self.stats["errors"] += 1
+                        failures = self._failures.get(d, (0, None))[0] + 1
+                        self._failures[d] = (failures, f"{type(e).__name__}: {e}")
+                        # 그 사이 새 글이 안 들어왔으면 돌려놓고, 타이머가 없으면 점점 길게 기다렸다가 다시 시도합니다.
+                        self._pending.setdefault(d, (content, time.monotonic()))
+                        if d not in self._timers:
+                            self.stats["retries"] += 1
+                            self._schedule(d, min(RETRY_MAX_SECONDS, self.delay * 2 ** failures))
+                else:
+                    written += 1
+                    with self._lock:
+                        self._failures.pop(d, None)
+            with self._lock:
+                self.stats["written"] += written
+            return written
@@ -0,0 +1,228 @@
+"""
+플레이리스트(여러 곡) 가사를 한꺼번에 분석하는 모듈입니다.
+
+곡마다 순서대로 OpenAI를 부르면 "곡 수 × 응답 시간"만큼 기다려야 해서,
+asyncio 클라이언트로 여러 곡을 동시에 요청합니다.
+
+- 동시에 보내는 요청 수는 concurrency로 제한합니다. (요금제 rate limit 보호)
+- 429(rate limit)/타임아웃/연결 오류/5xx는 잠깐 기다렸다가 다시 시도합니다.
+  서버가 Retry-After를 알려 주면 그 시간만큼, 아니면 지수적으로 늘려 가며 기다려요.
+- 이미 분석한 가사는 analysis_cache에서 바로 꺼내고, 새로 분석한 결과도 캐시에 저장합니다.
+  다른 세션(한 곡 분석 포함)이 같은 가사를 요청하는 중이면 기다렸다가 그 결과를 같이 받아요. (single-flight)
+- 가사는 lyrics_prep으로 정리해서 보냅니다. (길면 조각마다 요청하고 결과를 합쳐요)
+- 다이어리에 이미 붙인 단어는 빼 달라고 하고, 그래도 오면 걸러서 모자란 만큼 한 번 더 요청합니다.
+  (캐시에는 거르기 전의 응답만 저장해요. lyrics_analyzer.analyze_lyrics와 같은 방식)
+"""
+import asyncio
+import functools
+import random
+
+import analysis_cache
+import known_vocab
+import lyrics_analyzer
+import lyrics_prep
+import tracing
+
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 4
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+
+@functools.cache
+def _retryable_errors():
+    # openai는 무거워서 모듈을 불러올 때가 아니라 처음 쓸 때 불러옵니다. (lyrics_analyzer.make_client 참고)
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+def parse_playlist_text(text: str):
+    """
+    플레이리스트 입력 텍스트를 곡 목록으로 나눕니다.
+
+    형식: '#'으로 시작하는 줄이 곡 머리글(제목 / 가수)이고, 그 아래 줄들이 가사입니다.
+
+        # Lemon / 米津玄師
+        夢ならばどれほどよかったでしょう
+        ...
+        # 打上花火 / DAOKO
+        ...
+
+    반환값: [{"title": ..., "artist": ..., "lyrics": ...}, ...] (가사가 빈 곡은 뺍니다)
+    """
+    entries = []
+    current = None
+    for line in (text or "").splitlines():
+        if line.lstrip().startswith("#"):
+            header = line.lstrip()[1:].strip()
+            title, _, artist = header.partition("/")
+            current = {"title": title.strip(), "artist": artist.strip(), "lines": []}
+            entries.append(current)
+        else:
+            if current is None:
+                current = {"title": "", "artist": "", "lines": []}
+                entries.append(current)
+            current["lines"].append(line)
+
+    songs = []
+    for entry in entries:
+        lyrics = "\n".join(entry["lines"]).strip()
+        if lyrics:
+            songs.append({"title": entry["title"], "artist": entry["artist"], "lyrics": lyrics})
+    return songs
+
+
+def _retry_delay(error, attempt: int) -> float:
+    """Retry-After 헤더가 있으면 그 값을, 없으면 지수 백오프 + 약간의 랜덤(jitter)을 씁니다."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+async def _request_with_retry(client, lyrics, model, on_retry, count=lyrics_analyzer.VOCAB_PER_SONG, exclude=()):
+    attempt = 0
+    while True:
+        try:
+            with tracing.span("llm.chat", model=model, stream=False, attempt=attempt) as node:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": lyrics_analyzer.build_prompt(lyrics, count, exclude)}],
+                )
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    node.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            with tracing.span("llm.parse_json"):
+                return lyrics_analyzer.parse_json_garbage(response.choices[0].message.content)
+        except _retryable_errors() as e:
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            on_retry(attempt, delay, e)
+            await asyncio.sleep(delay)
+
+
+async def analyze_playlist_async(api_key, songs, model=lyrics_analyzer.MODEL,
+                                 concurrency=MAX_CONCURRENCY, on_progress=None):
+    """
+    곡 목록을 동시에 분석합니다.
+
+    on_progress(index, status, info)를 곡 상태가 바뀔 때마다 부릅니다.
+    status: "queued" / "running" / "retry" / "done" / "error"
+    (info는 상태별 부가 정보: retry면 {"attempt", "delay", "error"}, done이면 {"source"}, error면 {"error"})
+
+    반환값: 곡 순서대로 [{"title", "artist", "status", "source", "result", "error"}, ...]
+    """
+    def _notify(index, status, info=None):
+        if on_progress is not None:
+            on_progress(index, status, info or {})
+
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    # 같은 가사가 두 번 들어오면 요청은 한 번만 보냅니다.
+    shared = {}
+    known = await asyncio.to_thread(known_vocab.get_index)
+    import openai
+
+    client = openai.AsyncOpenAI(api_key=api_key, base_url=lyrics_analyzer.BASE_URL, max_retries=0)
+
+    async def _fetch(cache_key, prepared, index):
+        chunks = prepared.chunks
+        exclude = known.known_in(prepared.text)
+
+        def on_retry(attempt, delay, e):
+            _notify(index, "retry", {"attempt": attempt, "delay": delay, "error": e})
+
+        def _cached(version, compute):
+            # 캐시에는 거르기 전의 응답만 넣습니다. (version에 뺄 단어 목록이 들어가 있어요)
+            # 다른 세션이 같은 요청을 하는 중이면 기다렸다가 그 결과를 같이 받아요. (single-flight)
+            return analysis_cache.get_or_compute_async(prepared.text, model, version, compute)
+
+        async def _analyze():
+            lyrics_prep.record(prepared)
+            async with semaphore:
+                _notify(index, "running")
+                results = []
+                for chunk, count in zip(chunks, lyrics_analyzer.chunk_counts(len(chunks))):
+                    results.append(await _request_with_retry(client, chunk, model, on_retry, count, exclude))
+            return lyrics_analyzer.merge_results(results, prepared)
+
+        result, source = None, "cache"
+        if exclude:
+            # 뺄 단어 없이 분석한 (누구나 쓰는) 결과가 있으면 그걸 걸러서 씁니다.
+            result = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if result is None:
+            result, source = await _cached(lyrics_analyzer.cache_version(exclude), _analyze)
+
+        # 이미 붙인 단어를 빼고, 빠진 만큼 한 번 더 요청해서 채웁니다.
+        result, _, missing = lyrics_analyzer.drop_known(result, known)
+        if missing:
+            refill = lyrics_analyzer.refill_exclude(exclude, result)
+
+            async def _refill():
+                async with semaphore:
+                    return await _request_with_retry(
+                        client, max(chunks, key=len), model, on_retry, missing, refill
+                    )
+
+            extra, _ = await _cached(lyrics_analyzer.cache_version(refill, missing), _refill)
+            extra, _, _ = lyrics_analyzer.drop_known(extra, known, missing)
+            if isinstance(extra, dict):
+                result = lyrics_analyzer.merge_results([result, {"vocab": extra.get("vocab")}], prepared)
+        return result, source
+
+    async def _traced_fetch(cache_key, prepared, index):
+        with tracing.span("playlist.song", index=index, **{f"prep_{k}": v for k, v in prepared.metrics().items()}) as node:
+            result, source = await _fetch(cache_key, prepared, index)
+            node.set(source=source)
+            return result, source
+
+    async def _one(index, song):
+        prepared = lyrics_prep.prepare(song["lyrics"])
+        cache_key = analysis_cache.make_key(prepared.text, model, lyrics_analyzer.PROMPT_VERSION)
+        task = shared.get(cache_key)
+        if task is None:
+            task = shared[cache_key] = asyncio.ensure_future(_traced_fetch(cache_key, prepared, index))
+        entry = {"title": song["title"], "artist": song["artist"], "status": "error",
+                 "source": None, "result": None, "error": None}
+        try:
+            result, source = await asyncio.shield(task)
+        except Exception as e:
+            entry["error"] = str(e)
+            _notify(index, "error", {"error": e})
+            return entry
+        if result is None:
+            entry["error"] = "응답을 JSON으로 읽지 못했어요."
+            _notify(index, "error", {"error": entry["error"]})
+            return entry
+        entry.update(status="done", source=source, result=result)
+        _notify(index, "done", {"source": source})
+        return entry
+
+    for index in range(len(songs)):
+        _notify(index, "queued")
+    try:
+        return await asyncio.gather(*(_one(i, song) for i, song in enumerate(songs)))
+    finally:
+        await client.close()
+
+
+def analyze_playlist(api_key, songs, model=lyrics_analyzer.MODEL,
+                     concurrency=MAX_CONCURRENCY, on_progress=None):
+    """analyze_playlist_async를 동기 코드(Streamlit 스크립트)에서 부르기 위한 함수입니다."""
+    with tracing.span("analyze_playlist", songs=len(songs), concurrency=concurrency):
+        return asyncio.run(
+            analyze_playlist_async(api_key, songs, model, concurrency, on_progress)
+        )
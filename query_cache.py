@@ -0,0 +1,166 @@
+"""
+db_manager 읽기 함수 결과를 메모리에 잠깐 들고 있는 캐시입니다. (read-through)
+
+Streamlit은 위젯을 건드릴 때마다 스크립트 전체를 다시 실행해서, DB가 그대로여도
+같은 조회를 매번 다시 합니다. 그래서 "쓰기 세대(write generation)" 번호를 두고,
+
+- 쓰기(커밋)가 일어날 때마다 세대 번호를 1 올리고 (bump)
+- 읽기 결과는 (함수, 인자, 세대 번호)를 키로 저장합니다.
+
+세대 번호가 바뀌면 예전 키는 다시는 맞지 않으므로, 쓰기 직전에 시작한 조회가 늦게
+끝나서 저장하더라도 오래된 결과가 보일 일이 없어요.
+개수(MAX_ENTRIES)와 결과 행 수 합계(MAX_ROWS)를 넘으면 가장 오래 안 쓴 것부터 지웁니다.
+
+- 세대 번호는 key_prefix(=DB 파일 경로)마다 따로 둡니다. 한 사용자가 쓴다고 다른 사용자 캐시까지
+  비우지 않아요.
+- 같은 DB 파일을 다른 프로세스(CLI 가져오기 등)가 고치면 이 프로세스의 bump()는 불리지 않습니다.
+  그래서 cached(version=...)로 "파일이 바뀌었는지" 알려 주는 값(예: PRAGMA data_version)을
+  키에 같이 넣어서, 바뀌었으면 예전 결과가 맞지 않게 합니다.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("VOCA_QUERY_CACHE_MAX_ENTRIES", "256"))
+MAX_ROWS = int(os.environ.get("VOCA_QUERY_CACHE_MAX_ROWS", "20000"))
+
+
+def _row_count(value) -> int:
+    if isinstance(value, list):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_row_count(v) for v in value if isinstance(v, list)) or 1
+    return 1
+
+
+def _copy(value):
+    # 호출한 쪽에서 결과(list/dict)를 고쳐도 캐시 안의 값은 그대로 남도록 복사해서 돌려줍니다.
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        # {key_prefix: 세대 번호} — key는 항상 (key_prefix, ...) 모양이에요.
+        self._generations = {}
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, prefix=None) -> int:
+        return self._generations.get(prefix, 0)
+
+    def bump(self, prefix=None) -> None:
+        """prefix(DB 파일)에 쓰기가 일어났다고 알립니다. 그 파일의 세대 번호를 올리고 결과를 버려요."""
+        with self._lock:
+            self._generations[prefix] = self._generations.get(prefix, 0) + 1
+            self.invalidations += 1
+            for full_key in [k for k in self._entries if k[1][0] == prefix]:
+                self._rows -= _row_count(self._entries.pop(full_key))
+
+    def get(self, key):
+        """(찾았는지, 값)을 돌려줍니다."""
+        with self._lock:
+            full_key = (self.generation(key[0]), key)
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return True, _copy(self._entries[full_key])
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, generation) -> None:
+        with self._lock:
+            if generation != self.generation(key[0]):
+                return
+            full_key = (generation, key)
+            if full_key in self._entries:
+                self._rows -= _row_count(self._entries.pop(full_key))
+            self._entries[full_key] = _copy(value)
+            self._rows += _row_count(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                _, old = self._entries.popitem(last=False)
+                self._rows -= _row_count(old)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "generation": sum(self._generations.values()),
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+
+_cache = QueryCache()
+
+
+def cached(key_prefix=None, version=None):
+    """
+    읽기 함수에 붙이는 데코레이터입니다.
+
+    key_prefix: 키 앞에 붙일 값을 돌려주는 함수 (예: 지금 DB 파일 경로). 세대 번호도 이 값마다 따로예요.
+    version: key_prefix 값을 받아 "밖에서 바뀌었는지" 알려 주는 값을 돌려주는 함수 (예: PRAGMA data_version)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            prefix = key_prefix() if key_prefix else None
+            key = (
+                prefix,
+                version(prefix) if version else None,
+                func.__name__,
+                args,
+                tuple(sorted(kwargs.items())),
+            )
+            generation = _cache.generation(prefix)
+            found, value = _cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            _cache.put(key, value, generation)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def bump(prefix=None) -> None:
+    _cache.bump(prefix)
+
+
+def generation(prefix=None) -> int:
+    """prefix(DB 파일)의 지금 쓰기 세대 번호 (쓰기가 있었는지 확인할 때)"""
+    return _cache.generation(prefix)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear() -> None:
+    _cache.clear()
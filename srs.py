@@ -0,0 +1,88 @@
+"""
+저장한 단어 스티커를 복습하는 간격 반복(SRS) 스케줄러입니다. (SM-2 방식)
+
+카드마다 ease(쉬움 정도), interval_days(다음 복습까지 간격), reps(연속 정답 수),
+lapses(틀린 횟수), due_at(다음 복습 시각, epoch 초)를 review_state 테이블에 둡니다.
+
+- 맞히면 간격이 1일 → 6일 → (이전 간격 × ease)로 늘어나고,
+- 틀리면 연속 정답이 0으로 돌아가고 RELEARN_MINUTES 뒤에 다시 나옵니다.
+- ease는 답할 때마다 SM-2 공식으로 조금씩 바뀌고, MIN_EASE 아래로는 내려가지 않아요.
+
+이 모듈은 계산만 합니다. (DB 읽기/쓰기는 db_manager.get_due_reviews / record_reviews)
+새 카드의 처음 상태는 단어를 저장할 때 트리거가 review_state에 기본값으로 만들어요. (migrations.py)
+"""
+import time
+
+# 버튼 → SM-2 점수(quality, 0~5)
+GRADES = {
+    "again": 1,
+    "hard": 3,
+    "good": 4,
+    "easy": 5,
+}
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+RELEARN_MINUTES = 10
+# "어려웠어요"는 정답이지만 간격을 조금만 늘립니다.
+HARD_INTERVAL_FACTOR = 1.2
+# "쉬웠어요"는 간격을 한 번 더 늘려 줍니다.
+EASY_BONUS = 1.3
+MAX_INTERVAL_DAYS = 3650
+
+
+def schedule(state, grade: str, now=None):
+    """
+    카드 상태와 답(grade: GRADES의 키)을 받아 다음 상태를 돌려줍니다. (state는 고치지 않아요)
+    """
+    now = time.time() if now is None else now
+    quality = GRADES[grade]
+    ease = float(state.get("ease") or DEFAULT_EASE)
+    interval = float(state.get("interval_days") or 0.0)
+    reps = int(state.get("reps") or 0)
+    lapses = int(state.get("lapses") or 0)
+
+    # SM-2: EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    ease = max(MIN_EASE, ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+
+    if quality < 3:
+        reps = 0
+        lapses += 1
+        interval = 0.0
+        due_at = now + RELEARN_MINUTES * 60
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1.0
+        elif reps == 2:
+            interval = 6.0
+        elif grade == "hard":
+            interval = interval * HARD_INTERVAL_FACTOR
+        else:
+            interval = interval * ease
+        if grade == "easy":
+            interval *= EASY_BONUS
+        interval = min(MAX_INTERVAL_DAYS, round(interval, 2))
+        due_at = now + interval * 86400
+
+    return {
+        **state,
+        "ease": round(ease, 3),
+        "interval_days": interval,
+        "reps": reps,
+        "lapses": lapses,
+        "due_at": due_at,
+        "last_reviewed_at": now,
+    }
+
+
+def describe_interval(state) -> str:
+    """다음 복습까지 남은 간격을 짧은 글로 (예: "10분 뒤", "6일 뒤")"""
+    days = float(state.get("interval_days") or 0.0)
+    if days <= 0:
+        return f"{RELEARN_MINUTES}분 뒤"
+    if days < 30:
+        return f"{days:g}일 뒤"
+    if days < 365:
+        return f"{days / 30:.1f}달 뒤"
+    return f"{days / 365:.1f}년 뒤"
@@ -0,0 +1,140 @@
+"""
+단어 스티커 카드 HTML을 만드는 모듈입니다.
+
+예전에는 화면마다(공부/다꾸 노트/노래별 정리) f-string으로 카드를 하나씩 만들어
+카드마다 st.markdown을 따로 불렀어요. 카드가 많은 날에는 그 호출 수만큼 화면 갱신이 생겨 느려서,
+
+- 카드 모양(템플릿)은 여기 한 곳에서, 모듈을 읽을 때 한 번만 준비해 두고
+- DB/LLM에서 온 글자는 모두 HTML 이스케이프한 뒤 끼워 넣고
+- 한 페이지의 카드를 "한 덩어리 HTML"로 만들어 st.markdown 한 번으로 그립니다.
+"""
+import html
+from string import Template
+
+import db_manager
+
+# 카드 모양별 템플릿. 줄바꿈/들여쓰기는 준비할 때 없애서 한 줄짜리 HTML로 만듭니다.
+# (마크다운에서 빈 줄이나 4칸 들여쓰기가 있으면 HTML 블록이 끊기거나 코드 블록이 돼요)
+_TEMPLATE_SOURCES = {
+    # 🎵 공부 화면(분석 결과)
+    "study": """
+        <div class="sticker-card">
+          <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>$word</b></div>
+          <div style="color: #555; font-size: 0.9em;">$reading</div>
+          <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[$pronunciation]</div>
+          <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>$meaning</b></div>
+          <div style="font-size: 0.85em; color: #888;">"$example"</div>
+        </div>
+    """,
+    # 📅 다꾸 노트(날짜별)
+    "note": """
+        <div class="sticker-card">
+          <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">$song_line</div>
+          <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>$word</b></div>
+          <div style="color: #555; font-size: 0.9em;">$reading</div>
+          <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[$pronunciation]</div>
+          <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>$meaning</b></div>
+          <div style="margin-top:10px; font-size: 0.95em; color: #444;"><b>예문</b>: $example</div>
+          <div style="font-size: 0.9em; color: #555;">$example_reading</div>
+          <div style="font-size: 0.95em; color: #3f51b5; font-weight:bold;">[$example_pronunciation]</div>
+          <div style="font-size: 0.95em; color: #666;">뜻: $example_meaning</div>
+        </div>
+    """,
+    # 🎧 노래별 정리
+    "song": """
+        <div class="sticker-card">
+          <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">📅 $date</div>
+          <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>$word</b></div>
+          <div style="color: #555; font-size: 0.9em;">$reading</div>
+          <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[$pronunciation]</div>
+          <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>$meaning</b></div>
+          <div style="font-size: 0.85em; color: #888;">"$example"</div>
+        </div>
+    """,
+    # 🔁 복습 카드 앞면 (정답 보기 전)
+    "review": """
+        <div class="sticker-card">
+          <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">$song_line</div>
+          <div style="font-size: 2.4em; color: #d81b60; margin: 20px 0;"><b>$word</b></div>
+        </div>
+    """,
+    # 🔍 검색 결과
+    "search": """
+        <div class="sticker-card">
+          <div style="font-size: 0.85em; color: #666; margin-bottom: 6px;">📅 $date&nbsp;&nbsp;$song_line</div>
+          <div style="font-size: 1.5em; color: #d81b60; margin-bottom:5px;"><b>$word</b></div>
+          <div style="color: #555; font-size: 0.9em;">$reading</div>
+          <div style="color: #3f51b5; font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">[$pronunciation]</div>
+          <div style="margin:5px 0; border-top:1px dashed #eee; padding-top:5px;"><b>$meaning</b></div>
+          <div style="font-size: 0.85em; color: #888;">"$example"</div>
+          <div style="font-size: 0.85em; color: #666;">뜻: $example_meaning</div>
+        </div>
+    """,
+}
+
+_TEMPLATES = {
+    name: Template("".join(line.strip() for line in source.strip().splitlines()))
+    for name, source in _TEMPLATE_SOURCES.items()
+}
+
+_FIELDS = (
+    "id", "date", "word", "reading", "pronunciation", "meaning", "example",
+    "example_reading", "example_pronunciation", "example_meaning", "song_line",
+)
+
+
+def escape(value) -> str:
+    """None은 빈 칸으로, 나머지는 HTML 이스케이프합니다. ($는 Streamlit 수식 표기라서 같이 바꿔요)"""
+    if value is None:
+        return ""
+    return html.escape(str(value), quote=True).replace("$", "&#36;")
+
+
+def highlight(value) -> str:
+    """
+    db_manager.search_words가 검색어 앞뒤에 넣은 표시 문자를 <mark>로 바꿉니다.
+    (글자는 먼저 이스케이프하고, 표시 문자만 태그로 바꿔요)
+    """
+    return (
+        escape(value)
+        .replace(db_manager.HIGHLIGHT_START, '<mark class="search-hit">')
+        .replace(db_manager.HIGHLIGHT_END, "</mark>")
+    )
+
+
+def song_line(item) -> str:
+    title = (item.get("song_title") or "").strip()
+    artist = (item.get("artist") or "").strip()
+    return f"🎵 {title}{(' - ' + artist) if artist else ''}"
+
+
+def render_card(item, variant: str = "study") -> str:
+    """카드 1장의 HTML을 만듭니다."""
+    values = {field: escape(item.get(field)) for field in _FIELDS}
+    if variant == "note":
+        values["song_line"] = escape(song_line(item))
+    elif variant in ("search", "review") and (item.get("song_title") or "").strip():
+        values["song_line"] = escape(song_line(item))
+    for field, marked in (item.get("highlight") or {}).items():
+        values[field] = highlight(marked)
+    return _TEMPLATES[variant].substitute(values)
+
+
+def render_cards(items, variant: str = "study", columns: int = 3) -> str:
+    """
+    여러 장의 카드를 한 덩어리 HTML로 만듭니다. (st.markdown 한 번으로 그리기)
+
+    columns: 한 줄에 놓을 카드 수 (CSS grid)
+    """
+    cards = "".join(render_card(item, variant) for item in items)
+    return (
+        f'<div class="sticker-grid" style="grid-template-columns: repeat({int(columns)}, minmax(0, 1fr));">'
+        f"{cards}</div>"
+    )
+
+
+def card_label(item) -> str:
+    """삭제/저장 선택 목록에 보여 줄 짧은 이름 (예: "悲しい (かなしい)")"""
+    word = (item.get("word") or "").strip()
+    reading = (item.get("reading") or "").strip()
+    return f"{word} ({reading})" if reading and reading != word else word
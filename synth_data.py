@@ -0,0 +1,196 @@
+"""
+벤치마크/부하 확인용 가짜 다꾸 데이터를 만드는 모듈입니다.
+
+진짜 사용 패턴과 비슷하게 만들려고
+- 단어는 한자 복합어/가나 단어 + 읽기(히라가나) + 한국어 발음/뜻 + 예문을 조합해서 만들고,
+- 노래와 단어는 지프(Zipf) 분포로 골라서 "자주 듣는 노래/자주 나오는 단어"가 생기게 하고,
+- 날짜마다 저장하는 단어 수를 다르게 해서 기록이 몰린 날과 빈 날이 섞이게 합니다.
+- 사용자(--users)마다 DB 파일을 따로 만듭니다. (사용자마다 단어 수/노래 취향이 조금씩 달라요)
+
+저장은 db_manager.add_words를 그대로 써서 트리거/요약 표/검색 인덱스까지 실제와 똑같이 채워요.
+같은 seed면 항상 같은 데이터가 나옵니다.
+
+사용법:
+    python synth_data.py --rows 100000 --db /tmp/synth.db
+    python synth_data.py --rows 1000000 --users 3 --out-dir /tmp/synth
+"""
+import bisect
+import itertools
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import db_manager
+
+_KANJI = "愛夢光花火空雨雪風星月夜朝心声涙恋歌海道街色影時君僕手目胸名春夏秋冬青赤白黒"
+_KANJI_READINGS = {
+    "愛": "あい", "夢": "ゆめ", "光": "ひかり", "花": "はな", "火": "ひ", "空": "そら", "雨": "あめ",
+    "雪": "ゆき", "風": "かぜ", "星": "ほし", "月": "つき", "夜": "よる", "朝": "あさ", "心": "こころ",
+    "声": "こえ", "涙": "なみだ", "恋": "こい", "歌": "うた", "海": "うみ", "道": "みち", "街": "まち",
+    "色": "いろ", "影": "かげ", "時": "とき", "君": "きみ", "僕": "ぼく", "手": "て", "目": "め",
+    "胸": "むね", "名": "な", "春": "はる", "夏": "なつ", "秋": "あき", "冬": "ふゆ", "青": "あお",
+    "赤": "あか", "白": "しろ", "黒": "くろ",
+}
+_OKURIGANA = ("", "", "い", "しい", "る", "める", "く", "さ")
+_KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+_HANGUL_SYLLABLES = "가나다라마바사아자차카타파하고노도로모보소오조코토포호구누두루무부수우주쿠투푸후"
+_MEANING_WORDS = (
+    "사랑", "꿈", "빛", "꽃", "불꽃", "하늘", "비", "눈", "바람", "별", "달", "밤", "아침", "마음",
+    "목소리", "눈물", "노래", "바다", "길", "거리", "색", "그림자", "시간", "너", "나", "손", "봄",
+    "여름", "가을", "겨울", "슬프다", "기쁘다", "잊다", "만나다", "걷다", "빛나다", "흔들리다",
+)
+_SONG_WORDS = ("Lemon", "打上花火", "夜に駆ける", "アイドル", "Pretender", "白日", "群青", "怪獣の花唄",
+               "マリーゴールド", "ドライフラワー", "残響散歌", "ミックスナッツ", "水平線", "点描の唄")
+_ARTISTS = ("米津玄師", "DAOKO", "YOASOBI", "Official髭男dism", "King Gnu", "Vaundy", "あいみょん",
+            "優里", "Aimer", "back number", "Mrs. GREEN APPLE", "")
+
+
+class _Zipf:
+    """0..n-1 중에서 앞쪽 번호가 더 자주 나오게(지프 분포) 고릅니다."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        weights = [1.0 / (k ** s) for k in range(1, n + 1)]
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def pick(self):
+        x = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, x)
+
+
+def _pronounce(reading, rng):
+    # 진짜 발음 변환 대신 글자 수에 맞춰 한글 음절을 붙입니다. (길이만 비슷하면 충분해요)
+    return "".join(rng.choice(_HANGUL_SYLLABLES) for _ in range(len(reading)))
+
+
+def make_vocab(n, rng):
+    """서로 다른 단어 n개를 만듭니다. [{"word", "reading", "pronunciation", "meaning", ...}, ...]"""
+    vocab = []
+    seen = set()
+    misses = 0
+    while len(vocab) < n:
+        if rng.random() < 0.7:
+            kanji = "".join(rng.choice(_KANJI) for _ in range(rng.choice((1, 2, 2, 3))))
+            tail = rng.choice(_OKURIGANA)
+            word = kanji + tail
+            reading = "".join(_KANJI_READINGS[k] for k in kanji) + tail
+        else:
+            word = reading = "".join(rng.choice(_KANA) for _ in range(rng.randint(2, 5)))
+        if word in seen:
+            misses += 1
+            if misses < 100:
+                continue
+            # 조합이 거의 다 떨어졌으면 번호를 붙여서라도 다르게 만듭니다. (큰 규모용)
+            word = f"{word}{len(vocab)}"
+            if word in seen:
+                continue
+        misses = 0
+        seen.add(word)
+        meaning = " ".join(rng.sample(_MEANING_WORDS, rng.choice((1, 1, 2))))
+        example = word + "".join(rng.choice(_KANA) for _ in range(rng.randint(6, 14)))
+        vocab.append({
+            "word": word,
+            "reading": reading,
+            "pronunciation": _pronounce(reading, rng),
+            "meaning": meaning,
+            "example": example,
+            "example_reading": reading + example[len(word):],
+            "example_pronunciation": _pronounce(example, rng),
+            "example_meaning": meaning + "의 예문",
+        })
+    return vocab
+
+
+def make_songs(n, rng):
+    songs = []
+    for i in range(n):
+        title = rng.choice(_SONG_WORDS) if i < len(_SONG_WORDS) else f"{rng.choice(_SONG_WORDS)} {i}"
+        songs.append((title, rng.choice(_ARTISTS)))
+    return songs
+
+
+def generate_rows(rows, days=730, songs=200, vocab_size=None, seed=0, end_date=None):
+    """
+    study_log에 넣을 행을 하나씩 돌려주는 제너레이터입니다. (메모리에 전부 올리지 않아요)
+
+    rows: 만들 행 수 (같은 날 같은 단어는 건너뛰므로 실제 저장 수는 조금 적을 수 있어요)
+    days: 기록을 흩뿌릴 기간(일), end_date(기본 오늘)까지
+    """
+    rng = random.Random(seed)
+    vocab_size = vocab_size or max(50, min(rows // 3, 200_000))
+    vocab = make_vocab(vocab_size, rng)
+    song_list = make_songs(songs, rng)
+    pick_word = _Zipf(len(vocab), 0.9, rng)
+    pick_song = _Zipf(len(song_list), 1.1, rng)
+    end_date = end_date or date.today()
+
+    # 날짜별 저장량: 하루 평균 rows/days개, 날마다 0.2~3배로 들쭉날쭉하게
+    weights = [rng.choice((0.2, 0.5, 1, 1, 1.5, 3)) for _ in range(days)]
+    total = sum(weights)
+    produced = 0
+    for offset, weight in enumerate(weights):
+        day = (end_date - timedelta(days=days - 1 - offset)).isoformat()
+        count = round(rows * weight / total) if offset < days - 1 else rows - produced
+        song = song_list[pick_song.pick()]
+        for i in range(max(0, count)):
+            # 하루에 보통 노래 1~3곡을 들으니까 가끔만 노래를 바꿉니다.
+            if i and rng.random() < 0.08:
+                song = song_list[pick_song.pick()]
+            yield {**vocab[pick_word.pick()], "date": day, "song_title": song[0], "artist": song[1]}
+        produced += max(0, count)
+        if produced >= rows:
+            break
+
+
+def populate(db_path, rows, days=730, songs=200, seed=0, batch_size=20_000, progress=None):
+    """db_path에 가짜 데이터를 채웁니다. 반환값: 실제로 저장된 행 수"""
+    db_manager.configure(db_path=db_path)
+    db_manager.init_db()
+    inserted = 0
+    batch = []
+    for row in generate_rows(rows, days=days, songs=songs, seed=seed):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            inserted += db_manager.add_words(batch).count("inserted")
+            batch = []
+            if progress:
+                progress(inserted)
+    if batch:
+        inserted += db_manager.add_words(batch).count("inserted")
+    return inserted
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="가짜 다꾸 데이터 만들기")
+    parser.add_argument("--rows", type=int, default=100_000, help="사용자 한 명당 단어 행 수")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--songs", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="DB 파일 (--users 1일 때)")
+    parser.add_argument("--out-dir", default=".", help="--users가 2 이상일 때 user_N.db를 만들 폴더")
+    args = parser.parse_args(argv)
+
+    for user in range(args.users):
+        if args.users == 1 and args.db:
+            path = args.db
+        else:
+            os.makedirs(args.out_dir, exist_ok=True)
+            path = os.path.join(args.out_dir, f"user_{user}.db")
+        # 사용자마다 규모와 취향을 조금씩 다르게 합니다.
+        rng = random.Random(args.seed + user)
+        rows = args.rows if user == 0 else int(args.rows * rng.uniform(0.3, 1.5))
+        started = time.perf_counter()
+        count = populate(
+            path, rows, days=args.days, songs=args.songs, seed=args.seed + user,
+            progress=lambda n: print(f"  {path}: {n:,} rows", flush=True),
+        )
+        print(f"{path}: {count:,} rows in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 모듈들이 저장소 맨 위에 그대로 있어서(패키지가 아니라서) 경로를 직접 넣어 줍니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_manager  # noqa: E402
+import query_cache  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """테스트마다 새 DB 파일을 씁니다. 반환값: DB 파일 경로"""
+    path = str(tmp_path / "diary.db")
+    db_manager.configure(db_path=path, tenant_dir="")
+    query_cache.clear()
+    yield path
+    db_manager.configure()
@@ -0,0 +1,19 @@
+import bench_db
+import db_manager
+import synth_data
+
+
+def test_hot_queries_do_not_full_scan(db):
+    synth_data.populate(db, 2_000, days=90, songs=20)
+
+    report = bench_db.check_plans()
+
+    assert set(report) == set(bench_db.PLAN_CHECKED)
+    assert report == {name: [] for name in bench_db.PLAN_CHECKED}
+
+
+def test_full_scans_flags_unindexed_lookup(db):
+    db_manager.init_db()
+    with db_manager.connection() as conn:
+        assert bench_db.full_scans(conn, "SELECT id FROM vocab WHERE meaning = 'x'") == ["SCAN vocab"]
+        assert bench_db.full_scans(conn, "SELECT id FROM study_event WHERE vocab_id = 1") == []
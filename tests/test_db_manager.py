@@ -0,0 +1,54 @@
+import db_manager
+import query_cache
+
+
+def _word(date, word, **extra):
+    return {"date": date, "word": word, "meaning": "뜻", **extra}
+
+
+def test_add_words_dedupes_on_date_and_word(db):
+    db_manager.init_db()
+
+    first = db_manager.add_words([
+        _word("2026-01-01", "空", reading="そら"),
+        _word("2026-01-01", "空", reading="から", meaning="빈"),   # 같은 묶음 안에서 겹침
+        _word("2026-01-02", "空", reading="そら"),
+    ])
+    again = db_manager.add_words([
+        _word("2026-01-01", "空", reading="くう", meaning="공"),   # 이미 DB에 있음 (읽기/뜻이 달라도)
+        _word("2026-01-01", "海"),
+    ])
+
+    assert first == ["inserted", "ignored", "inserted"]
+    assert again == ["ignored", "inserted"]
+    day = db_manager.get_words_by_date("2026-01-01")
+    assert [(w["word"], w["reading"]) for w in day] == [("空", "そら"), ("海", "")]
+
+
+def test_delete_words_removes_only_given_ids(db):
+    db_manager.init_db()
+    db_manager.add_words([_word("2026-01-01", w) for w in ("あ", "い", "う")])
+    ids = [w["id"] for w in db_manager.get_words_by_date("2026-01-01")]
+
+    assert db_manager.delete_words([ids[0], ids[2], 999]) == 2
+    assert db_manager.delete_words([]) == 0
+    assert [w["word"] for w in db_manager.get_words_by_date("2026-01-01")] == ["い"]
+    assert db_manager.get_daily_summary()[0]["word_count"] == 1
+
+
+def test_query_cache_generation_is_per_tenant(db, tmp_path):
+    db_manager.configure(tenant_dir=str(tmp_path / "tenants"))
+    with db_manager.use_tenant("a"):
+        db_manager.save_diary_text("2026-01-01", "a")
+        path_a = db_manager.current_db_path()
+        db_manager.get_diary_text("2026-01-01")
+    before = query_cache.generation(path_a)
+
+    with db_manager.use_tenant("b"):
+        db_manager.save_diary_text("2026-01-01", "b")
+    hits = query_cache.stats()["hits"]
+    with db_manager.use_tenant("a"):
+        assert db_manager.get_diary_text("2026-01-01") == "a"
+
+    assert query_cache.generation(path_a) == before
+    assert query_cache.stats()["hits"] == hits + 1
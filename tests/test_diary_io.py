@@ -0,0 +1,42 @@
+import json
+
+import db_manager
+import diary_io
+
+
+def _fill():
+    db_manager.init_db()
+    db_manager.add_words([
+        {"date": "2026-01-01", "word": "空", "reading": "そら", "meaning": "하늘", "song_title": "Sky", "artist": "A"},
+        {"date": "2026-01-02", "word": "海", "reading": "うみ", "meaning": "바다"},
+    ])
+    db_manager.save_diary_text("2026-01-01", "맑음")
+    db_manager.save_layout("2026-01-01", json.dumps({"stickers": [{"id": 1, "x": 3}]}))
+
+
+def test_ndjson_export_reads_one_snapshot(db):
+    _fill()
+    chunks = diary_io.export_ndjson()
+    first = next(chunks)
+
+    # 내보내는 도중의 저장은 이번 내보내기에 섞이지 않아요.
+    db_manager.add_words([{"date": "2026-01-03", "word": "雨", "meaning": "비"}])
+    db_manager.save_diary_text("2026-01-03", "비")
+    db_manager.save_layout("2026-01-03", json.dumps({"stickers": []}))
+
+    records = [json.loads(line) for line in [first, *chunks]]
+    assert [(r["type"], r["date"]) for r in records] == [
+        ("word", "2026-01-01"), ("word", "2026-01-02"), ("diary_text", "2026-01-01"), ("diary_layout", "2026-01-01"),
+    ]
+
+
+def test_ndjson_round_trip(db, tmp_path):
+    _fill()
+    backup = "".join(diary_io.export_ndjson())
+
+    db_manager.configure(db_path=str(tmp_path / "restored.db"))
+    db_manager.init_db()
+    stats = diary_io.import_records(diary_io.iter_records(backup.splitlines(), "ndjson"))
+
+    assert stats == {"inserted": 4, "ignored": 0, "invalid": 0, "errors": []}
+    assert "".join(diary_io.export_ndjson()) == backup
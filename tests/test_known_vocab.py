@@ -0,0 +1,35 @@
+import db_manager
+import known_vocab
+
+
+def _index(words):
+    db_manager.init_db()
+    db_manager.add_words([
+        {"date": "2026-01-01", "word": word, "reading": reading, "meaning": "뜻"} for word, reading in words
+    ])
+    return known_vocab.get_index()
+
+
+def test_homophones_are_not_known(db):
+    index = _index([("かみ", "かみ"), ("紙", "かみ")])
+
+    assert index.is_known("紙")
+    assert index.is_known("カミ")          # 가나끼리는 읽기로 비교
+    assert not index.is_known("神")
+    assert not index.is_known("髪")
+    fresh, known = known_vocab.filter_vocab(
+        [{"word": "神", "reading": "かみ"}, {"word": "髪", "reading": "かみ"}, {"word": "紙", "reading": "かみ"}], index
+    )
+    assert [v["word"] for v in fresh] == ["神", "髪"]
+    assert [v["word"] for v in known] == ["紙"]
+
+    only_kanji = _index([("空", "そら")])
+    assert not only_kanji.is_known("そら")  # 아는 한자 단어의 읽기만 같은 가나 단어
+    assert only_kanji.is_known("空")
+
+
+def test_single_kanji_stem_needs_okurigana(db):
+    index = _index([("悲しい", "かなしい"), ("愛する", "あいする")])
+
+    assert index.known_in("悲しみの中で愛してた") == ["悲しい", "愛する"]
+    assert index.known_in("悲劇と愛情") == []
@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+import db_manager
+import migrations
+
+STUDY_LOG_COLUMNS = (
+    "id", "date", "word", "song_title", "artist", "reading", "meaning", "example",
+    "example_reading", "example_pronunciation", "example_meaning", "pronunciation",
+)
+
+# 같은 단어(空/そら)를 날짜마다 뜻/발음/예문 뜻을 다르게 저장한 예전 기록
+BASELINE_ROWS = [
+    (1, "2026-01-01", "空", "Sky", "A", "そら", "하늘", "空を見る", "そらをみる", "소라오 미루", "하늘을 보다", "소라"),
+    (2, "2026-01-02", "空", "Sky", "A", "そら", "허공", "空を見る", "そらをみる", "소라오 미루", "허공을 보다", "소라"),
+    (3, "2026-01-03", "空", "", "", "そら", "하늘", None, None, None, None, "쏘라"),
+    (4, "2026-01-03", "海", "Sea", "B", "うみ", "바다", "海へ行こう", "", "", "바다에 가자", "우미"),
+]
+
+
+def _baseline_db(path):
+    """
+    010 바로 전(user_version 9) DB를 만듭니다.
+    예전 앱처럼 study_log(001)에 행을 먼저 넣고, 나머지 002~009를 그 위에 적용해요.
+    """
+    conn = sqlite3.connect(path)
+    steps = [func for version, _, func in migrations.MIGRATIONS if version < 10]
+    steps[0](conn)
+    conn.executemany(
+        f"INSERT INTO study_log ({', '.join(STUDY_LOG_COLUMNS)}) VALUES ({', '.join('?' * len(STUDY_LOG_COLUMNS))})",
+        BASELINE_ROWS,
+    )
+    for func in steps[1:]:
+        func(conn)
+    conn.execute("PRAGMA user_version = 9")
+    conn.commit()
+    conn.close()
+
+
+def _study_log(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(f"SELECT {', '.join(STUDY_LOG_COLUMNS)} FROM study_log ORDER BY id").fetchall()
+    conn.close()
+    return [tuple("" if v is None else v for v in row) for row in rows]
+
+
+def test_m010_upgrades_baseline_and_keeps_every_gloss(db):
+    _baseline_db(db)
+    before = _study_log(db)
+
+    applied = db_manager.init_db()
+
+    assert [version for version, _ in applied] == list(range(10, migrations.LATEST_VERSION + 1))
+    assert _study_log(db) == before
+    with db_manager.connection() as conn:
+        assert migrations.get_version(conn) == migrations.LATEST_VERSION
+        meanings = conn.execute("SELECT meaning FROM vocab WHERE word = '空' ORDER BY id").fetchall()
+        assert [m[0] for m in meanings] == ["하늘", "허공", "하늘"]
+        assert conn.execute("SELECT COUNT(*) FROM example").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM review_state").fetchone()[0] == len(BASELINE_ROWS)
+    assert db_manager.verify_rollups() == {"daily_summary": [], "song_daily_rollup": []}
+    assert [w["meaning"] for w in db_manager.get_words_by_date("2026-01-02")] == ["허공"]
+
+
+def test_m010_keeps_autoincrement_position(db):
+    _baseline_db(db)
+    conn = sqlite3.connect(db)
+    conn.execute("DELETE FROM study_log WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+    db_manager.init_db()
+    db_manager.add_word("2026-02-01", "雨", "비", "")
+
+    assert [w["id"] for w in db_manager.get_words_by_date("2026-02-01")] == [5]
+
+
+def test_two_glosses_survive_on_new_schema(db):
+    db_manager.init_db()
+    db_manager.add_words([
+        {"date": "2026-01-01", "word": "空", "reading": "そら", "meaning": "하늘", "example": "空を見る",
+         "example_meaning": "하늘을 보다"},
+        {"date": "2026-01-02", "word": "空", "reading": "そら", "meaning": "허공", "example": "空を見る",
+         "example_meaning": "허공을 보다"},
+    ])
+
+    first = db_manager.get_words_by_date("2026-01-01")[0]
+    second = db_manager.get_words_by_date("2026-01-02")[0]
+    assert (first["meaning"], first["example_meaning"]) == ("하늘", "하늘을 보다")
+    assert (second["meaning"], second["example_meaning"]) == ("허공", "허공을 보다")
+
+
+def test_same_word_on_same_date_is_rejected_by_the_db(db):
+    db_manager.init_db()
+    db_manager.add_words([{"date": "2026-01-01", "word": "空", "reading": "そら", "meaning": "하늘"}])
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with db_manager.transaction() as conn:
+            conn.execute("INSERT INTO vocab (word, reading, meaning) VALUES ('空', 'から', '빈')")
+            vocab_id = conn.execute("SELECT id FROM vocab WHERE reading = 'から'").fetchone()[0]
+            conn.execute("INSERT INTO study_event (date, vocab_id) VALUES ('2026-01-01', ?)", (vocab_id,))
+
+
+def _tables(path):
+    conn = sqlite3.connect(path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    return names
+
+
+def test_analysis_cache_lives_only_in_shared_db(db, tmp_path):
+    tenant_dir = tmp_path / "tenants"
+    db_manager.configure(tenant_dir=str(tenant_dir))
+
+    db_manager.init_db()
+    with db_manager.use_tenant("new"):
+        applied = db_manager.init_db()
+
+    assert "analysis_cache" in _tables(db)
+    assert "analysis_cache" not in _tables(str(tenant_dir / "new.db"))
+    # 번호는 건너뛰지 않고 똑같이 올라가요.
+    assert [version for version, _ in applied][:4] == [1, 2, 3, 4]
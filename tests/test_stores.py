@@ -0,0 +1,78 @@
+import copy
+import json
+
+import pytest
+
+import db_manager
+import layout_store
+import note_store
+
+LAYOUTS = [
+    {"stickers": [{"id": 1, "x": 10, "y": 20}, {"id": 2, "x": 30, "y": 40}], "bg": "paper"},
+    {"stickers": [{"id": 1, "x": 15, "y": 20}, {"id": 2, "x": 30, "y": 40}], "bg": "paper"},
+    {"stickers": [{"id": 3, "x": 0, "y": 0}, {"id": 1, "x": 15, "y": 20}, {"id": 2, "x": 30, "y": 40}]},
+    {"stickers": [{"id": 1, "x": 15, "y": 20}], "a/b": {"~c": [1, True, None]}},
+    {"stickers": [], "a/b": {"~c": [1, 1, None]}, "bg": "dots"},
+    [1, 2, 3],
+]
+
+
+@pytest.mark.parametrize("old, new", list(zip(LAYOUTS, LAYOUTS[1:])))
+def test_layout_patch_round_trip(old, new):
+    ops = layout_store.make_patch(old, new)
+
+    assert layout_store.apply_patch(copy.deepcopy(old), ops) == new
+    assert layout_store.make_patch(new, new) == []
+
+
+def test_layout_save_load_round_trip_with_compaction(db, monkeypatch):
+    monkeypatch.setattr(layout_store, "COMPACT_EVERY", 3)
+    db_manager.init_db()
+
+    for layout in LAYOUTS[:-1]:
+        db_manager.save_layout("2026-01-01", layout)
+        assert json.loads(db_manager.get_layout("2026-01-01")) == layout
+
+    with db_manager.transaction() as conn:
+        assert layout_store.compact(conn, "2026-01-01") in (True, False)
+    assert json.loads(db_manager.get_layout("2026-01-01")) == LAYOUTS[-2]
+
+
+@pytest.mark.parametrize("new, old", [
+    ("오늘은 비", "오늘은 맑음"),
+    ("", "전부 지움"),
+    ("처음 쓴 글", ""),
+    ("앞에 추가 + 가운데", "가운데"),
+    ("same", "same"),
+])
+def test_note_diff_round_trip(new, old):
+    assert note_store.apply_diff(new, note_store.make_diff(new, old)) == old
+
+
+def test_note_versions_round_trip_and_restore(db):
+    db_manager.init_db()
+    texts = ["첫 글", "첫 글 고침", "완전히 다른 글", ""]
+    with db_manager.transaction() as conn:
+        for i, text in enumerate(texts):
+            # SQUASH_SECONDS보다 멀리 떨어뜨려서 저장할 때마다 새 버전이 생기게 합니다.
+            note_store.save(conn, "2026-01-01", text, now=1000.0 + i * (note_store.SQUASH_SECONDS + 1))
+
+    versions = db_manager.get_diary_text_versions("2026-01-01")
+    assert [v["version"] for v in versions] == [4, 3, 2, 1]
+    for version, text in zip((1, 2, 3, 4), texts):
+        assert db_manager.get_diary_text_version("2026-01-01", version) == text
+
+    assert db_manager.restore_diary_text("2026-01-01", 2) == 5
+    assert db_manager.get_diary_text("2026-01-01") == "첫 글 고침"
+    assert db_manager.get_diary_text_version("2026-01-01", 4) == ""
+
+
+def test_note_squash_keeps_one_version_per_window(db):
+    db_manager.init_db()
+    with db_manager.transaction() as conn:
+        note_store.save(conn, "2026-01-01", "a", now=0.0)
+        note_store.save(conn, "2026-01-01", "ab", now=100.0)
+        note_store.save(conn, "2026-01-01", "abc", now=110.0)
+
+    assert [v["version"] for v in db_manager.get_diary_text_versions("2026-01-01")] == [2, 1]
+    assert db_manager.get_diary_text_version("2026-01-01", 1) == "a"
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db_manager
+import tracing
+import write_behind
+
+
+def _fail_after_write(date):
+    db_manager.add_words([{"date": date, "word": "失敗", "meaning": "실패"}])
+    raise ValueError("boom")
+
+
+@pytest.fixture
+def writer(db):
+    db_manager.init_db()
+    # 첫 쓰기를 꺼낸 뒤 잠깐 기다려서, 아래에서 넣는 쓰기들이 한 묶음(트랜잭션)이 되게 합니다.
+    w = write_behind.WriteBehind(window=0.2)
+    yield w
+    w.close()
+
+
+def test_failed_write_rolls_back_only_its_savepoint(writer):
+    ok_before = writer.submit(db_manager.add_words, [{"date": "2026-01-01", "word": "前", "meaning": "앞"}])
+    failed = writer.submit(_fail_after_write, "2026-01-01")
+    ok_after = writer.submit(db_manager.save_diary_text, "2026-01-01", "메모")
+
+    assert ok_before.result(5) == ["inserted"]
+    with pytest.raises(ValueError):
+        failed.result(5)
+    assert ok_after.result(5) == 1
+
+    assert writer.stats["batches"] == 1
+    assert writer.stats["errors"] == 1
+    assert [w["word"] for w in db_manager.get_words_by_date("2026-01-01")] == ["前"]
+    assert db_manager.get_diary_text("2026-01-01") == "메모"
+
+
+def test_busy_batch_is_retried(writer, db, monkeypatch):
+    monkeypatch.setattr(write_behind, "BUSY_BACKOFF", 0.05)
+    db_manager.configure(pragmas={"busy_timeout": 50})
+    other = sqlite3.connect(db, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    # 묶음은 window(0.2초) 뒤에 쓰니까, 그보다 늦게 잠금을 풀어야 재시도가 일어나요.
+    release = threading.Timer(0.4, other.execute, args=("COMMIT",))
+    release.start()
+    try:
+        future = writer.submit(db_manager.save_diary_text, "2026-01-01", "잠금 뒤")
+        assert future.result(5) == 1
+    finally:
+        release.join()
+        other.close()
+
+    assert writer.stats["busy_retries"] >= 1
+    assert db_manager.get_diary_text("2026-01-01") == "잠금 뒤"
+
+
+def test_ops_trace_into_their_own_batch_trace(writer):
+    trace = tracing.start("rerun")
+    future = writer.submit(db_manager.save_diary_text, "2026-01-01", "추적")
+    rerun = tracing.finish(trace)
+    future.result(5)
+
+    assert rerun["children"] == [] and rerun["sql_count"] == 0
+    batch = writer.last_trace
+    assert batch["name"] == "write_behind.batch"
+    assert batch["attrs"]["links"] == [rerun["attrs"]["trace_id"]]
+    (op,) = batch["children"]
+    assert op["name"] == "write_behind.save_diary_text"
+    assert op["attrs"]["trace_id"] == rerun["attrs"]["trace_id"]
+    assert op["children"][0]["sql_count"] > 0
+
+
+def test_untraced_ops_open_no_trace(writer):
+    writer.submit(db_manager.save_diary_text, "2026-01-01", "추적 없음").result(5)
+
+    assert writer.last_trace is None
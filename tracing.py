@@ -0,0 +1,229 @@
+"""
+rerun마다 "어디서 시간이 걸렸는지"를 나무(span tree)로 기록하는 가벼운 추적 모듈입니다.
+
+    trace = tracing.start("rerun", page=menu)      # 스크립트 맨 위
+    with tracing.span("render.cards", cards=12):    # 재고 싶은 구간
+        ...
+    tracing.finish(trace)                            # 스크립트 맨 아래
+
+- span은 contextvars로 "지금 열려 있는 span" 아래에 자식으로 붙습니다.
+  (asyncio 태스크도 만들어질 때의 span을 부모로 이어받아요)
+- db_manager 연결에는 sqlite trace 콜백(sql_callback)을 걸어 두어서, 열린 span이 있으면
+  실행한 SQL 문 수와 문장을 그 span에 붙입니다.
+- 추적을 켜지 않았으면(start를 안 불렀으면) span()은 아무것도 하지 않고 바로 지나갑니다.
+- trace마다 trace_id가 붙어요. 다른 스레드에서 나중에 하는 일(write_behind)은 자기 trace를 따로 열고
+  links에 원래 trace_id를 적어 둡니다. (이미 끝난 trace 나무에는 아무것도 붙이지 않아요)
+- VOCA_TRACE_LOG=파일경로를 주면 끝난 trace를 한 줄에 하나씩(JSONL) 덧붙여 저장합니다.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# 환경변수로 켜 두면 앱 사이드바 토글의 기본값이 "켜짐"이 됩니다.
+ENABLED_BY_DEFAULT = os.environ.get("VOCA_TRACE", "") not in ("", "0", "false")
+LOG_PATH = os.environ.get("VOCA_TRACE_LOG") or None
+
+# span 하나에 붙여 둘 SQL 문장 수 (그 이상은 개수만 셉니다)
+MAX_SQL_PER_SPAN = 20
+
+_current = contextvars.ContextVar("voca_trace_span", default=None)
+_trace_id = contextvars.ContextVar("voca_trace_id", default=None)
+_log_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "children", "sql", "sql_count", "started", "duration_ms")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+        self.sql = []
+        self.sql_count = 0
+        self.started = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": None if self.duration_ms is None else round(self.duration_ms, 3),
+            "attrs": self.attrs,
+            "sql_count": self.sql_count,
+            "sql": self.sql,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NullSpan:
+    """추적이 꺼져 있을 때 쓰는 빈 span (set을 불러도 아무 일도 안 해요)"""
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def current():
+    return _current.get()
+
+
+def current_trace_id():
+    """지금 열려 있는 trace의 id (추적이 꺼져 있으면 None)"""
+    return _trace_id.get() if _current.get() is not None else None
+
+
+def reset():
+    """
+    열려 있는 trace를 버립니다. (st.rerun() 등으로 finish 없이 끝난 이전 rerun의 trace가
+    같은 스레드에 남아 있으면 그 밑에 span이 계속 쌓이므로, 스크립트 맨 위에서 불러 주세요)
+    """
+    _current.set(None)
+    _trace_id.set(None)
+
+
+def start(name="rerun", **attrs):
+    """새 trace(맨 위 span)를 시작합니다. 반환값을 finish()에 넘겨 주세요."""
+    root = Span(name, attrs)
+    root.attrs.setdefault("started_at", time.strftime("%Y-%m-%dT%H:%M:%S"))
+    root.attrs.setdefault("trace_id", uuid.uuid4().hex[:16])
+    _trace_id.set(root.attrs["trace_id"])
+    token = _current.set(root)
+    return root, token
+
+
+def finish(trace, log_path=LOG_PATH):
+    """trace를 닫고 dict(나무)로 돌려줍니다. log_path가 있으면 JSONL로도 덧붙여 저장해요."""
+    root, token = trace
+    root.duration_ms = (time.perf_counter() - root.started) * 1000
+    try:
+        _current.reset(token)
+    except ValueError:
+        # 다른 컨텍스트에서 닫는 경우(드물게)에는 그냥 비워 둡니다.
+        _current.set(None)
+    tree = root.to_dict()
+    if log_path:
+        dump(tree, log_path)
+    return tree
+
+
+@contextmanager
+def use(node):
+    """
+    블록 안에서 node를 "지금 열린 span"으로 씁니다. (None이면 추적을 끈 것처럼)
+    다른 스레드에서 그 span 밑에 자식을 붙일 때 써요. (write_behind 쓰기 스레드)
+    """
+    token = _current.set(node)
+    try:
+        yield node
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """구간 시간을 잽니다. 열린 trace가 없으면 아무것도 하지 않아요."""
+    parent = _current.get()
+    if parent is None:
+        yield _NULL_SPAN
+        return
+    node = Span(name, attrs)
+    parent.children.append(node)
+    token = _current.set(node)
+    try:
+        yield node
+    except BaseException as e:
+        node.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        node.duration_ms = (time.perf_counter() - node.started) * 1000
+        _current.reset(token)
+
+
+def traced(name=None, rows=False):
+    """
+    함수 전체를 span으로 감싸는 데코레이터입니다.
+
+    rows=True면 결과가 list/tuple일 때 길이를 "rows"로 기록합니다.
+    (keyset 페이지처럼 (rows, cursor)를 돌려주면 첫 번째 값의 길이)
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name) as node:
+                result = func(*args, **kwargs)
+                if rows:
+                    node.set(rows=_row_count(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def _row_count(result):
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None
+
+
+def sql_callback(statement):
+    """sqlite3 Connection.set_trace_callback에 넘기는 함수입니다."""
+    node = _current.get()
+    if node is None:
+        return
+    node.sql_count += 1
+    if len(node.sql) < MAX_SQL_PER_SPAN:
+        node.sql.append(" ".join(statement.split())[:300])
+
+
+def to_jsonl(tree) -> str:
+    return json.dumps(tree, ensure_ascii=False) + "\n"
+
+
+def dump(tree, path):
+    """trace 하나를 JSONL 파일에 한 줄로 덧붙입니다."""
+    line = to_jsonl(tree)
+    with _log_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def iter_lines(tree, depth=0):
+    """
+    화면 표시용으로 나무를 (깊이, 이름, ms, 부가 정보 글자)로 펼칩니다.
+    """
+    extras = [f"{k}={v}" for k, v in tree["attrs"].items() if k not in ("started_at", "trace_id")]
+    if tree["sql_count"]:
+        extras.append(f"sql={tree['sql_count']}")
+    yield depth, tree["name"], tree["duration_ms"], " ".join(extras)
+    for child in tree["children"]:
+        yield from iter_lines(child, depth + 1)
+
+
+def hot_spots(tree, limit=5):
+    """자식 시간을 뺀 "자기 시간(self time)"이 긴 span 순서로 돌려줍니다."""
+    totals = {}
+
+    def _walk(node):
+        own = (node["duration_ms"] or 0.0) - sum(c["duration_ms"] or 0.0 for c in node["children"])
+        totals[node["name"]] = totals.get(node["name"], 0.0) + max(0.0, own)
+        for child in node["children"]:
+            _walk(child)
+
+    _walk(tree)
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
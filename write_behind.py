@@ -0,0 +1,306 @@
+"""
+다꾸 쓰기(단어 저장/삭제, 노트/레이아웃 저장, 복습 기록)를 뒤에서 모아서 저장하는 write-behind 큐입니다.
+
+Streamlit 스크립트 스레드에서 바로 커밋하면, 다른 세션이 쓰는 중일 때 잠금을 기다리느라
+클릭 한 번이 느려집니다. VOCA_WRITE_BEHIND=1로 켜면
+
+- submit()은 쓰기를 큐에 넣고 바로 Future를 돌려주고,
+- 전용 쓰기 스레드 하나가 큐에 쌓인 쓰기를 꺼내서(최대 MAX_BATCH개) 트랜잭션 하나로 커밋합니다.
+  (db_manager.transaction() 안에서 부르면 각 쓰기는 SAVEPOINT가 돼서, 하나가 실패해도 그것만 되돌려요)
+  쓰는 스레드가 하나라서 프로세스 안에서는 쓰기 잠금을 두고 다툴 일이 없어요.
+- Future는 커밋이 끝난 뒤에 결과(함수 반환값)나 예외를 받습니다. durable=True로 넣은 쓰기가 있으면
+  그 묶음은 synchronous=FULL로 커밋해서, Future가 끝났을 때 디스크까지 닿아 있어요.
+- barrier(session): 그 세션이 넣은 쓰기가 모두 커밋될 때까지 기다립니다. (내가 쓴 걸 내가 읽기)
+  큐는 순서대로 처리되니까 세션의 마지막 Future만 기다리면 돼요.
+- flush(): 지금까지 넣은 쓰기가 모두 끝날 때까지 기다립니다. 프로세스가 끝날 때 close()가 자동으로 불려요.
+- 다른 프로세스(CLI 가져오기 등)가 쓰기 잠금을 쥐고 있어서 "database is locked"가 나면,
+  묶음 전체를 되돌리고 BUSY_RETRIES번까지 조금씩 더 기다렸다가 처음부터 다시 커밋합니다.
+
+쓰기를 넣을 때의 contextvars(사용자 DB 등)를 그대로 가지고 가서 그 안에서 실행합니다.
+추적(tracing)만은 예외예요. 넣은 rerun의 trace는 보통 이미 끝나서 기록까지 됐으니, 쓰기 스레드가
+묶음마다 "write_behind.batch" trace를 따로 열고 links에 넣은 쪽 trace_id를 적어 둡니다.
+(넣은 쪽에서 추적이 꺼져 있었으면 이 trace도 열지 않아요)
+"""
+import atexit
+import collections
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_futures
+
+import db_manager
+import tracing
+
+ENABLED = os.environ.get("VOCA_WRITE_BEHIND", "") not in ("", "0", "false")
+
+# 한 트랜잭션에 묶을 최대 쓰기 수
+MAX_BATCH = int(os.environ.get("VOCA_WRITE_BEHIND_MAX_BATCH", "64"))
+# 첫 쓰기를 꺼낸 뒤 더 모일 때까지 기다리는 시간(초). 0이면 이미 쌓여 있는 것만 묶어요.
+# (앞 묶음을 커밋하는 동안 쌓인 쓰기가 다음 묶음이 되므로, 바쁠수록 저절로 크게 묶입니다)
+BATCH_WINDOW = float(os.environ.get("VOCA_WRITE_BEHIND_WINDOW", "0"))
+# 큐 길이 한도. 꽉 차면 submit()이 자리가 날 때까지 기다립니다. (메모리 보호)
+MAX_QUEUE = 10_000
+# close()에서 남은 쓰기를 기다리는 최대 시간(초)
+CLOSE_TIMEOUT = 30.0
+# 묶음 커밋이 잠금(SQLITE_BUSY) 때문에 실패했을 때 다시 시도하는 횟수와 첫 대기 시간(초, 두 배씩)
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.1
+
+
+class _Op:
+    __slots__ = ("func", "args", "kwargs", "durable", "context", "db_key", "trace_id", "future")
+
+    def __init__(self, func, args, kwargs, durable, db_key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.durable = durable
+        self.context = contextvars.copy_context()
+        self.db_key = db_key
+        self.trace_id = tracing.current_trace_id()
+        self.future = Future()
+
+
+_STOP = object()
+
+
+class WriteBehind:
+    def __init__(self, max_batch=MAX_BATCH, window=BATCH_WINDOW, max_queue=MAX_QUEUE):
+        self.max_batch = max(1, int(max_batch))
+        self.window = window
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._sessions = {}
+        # 마지막으로 끝난 묶음의 trace 나무 (넣은 쪽에서 추적을 켰을 때만)
+        self.last_trace = None
+        self.stats = {
+            "submitted": 0, "batches": 0, "ops": 0, "errors": 0, "largest_batch": 0, "busy_retries": 0,
+        }
+
+    # --- 넣는 쪽 ---
+
+    def submit(self, func, *args, session=None, durable=False, **kwargs) -> Future:
+        """func(*args, **kwargs)를 쓰기 스레드에서 실행하도록 넣고 Future를 돌려줍니다."""
+        op = _Op(func, args, kwargs, durable, db_manager._cache_key_prefix())
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._start()
+                self.stats["submitted"] += 1
+                if session is not None:
+                    self._sessions[session] = op.future
+        if closed:
+            # 종료 중에 들어온 쓰기(atexit 순서 등)는 그냥 바로 저장합니다.
+            try:
+                op.future.set_result(op.context.run(func, *args, **kwargs))
+            except Exception as e:
+                op.future.set_exception(e)
+            return op.future
+        self._queue.put(op)
+        return op.future
+
+    def barrier(self, session, timeout=None) -> bool:
+        """session이 넣은 쓰기가 모두 끝날 때까지 기다립니다. 시간 안에 끝났으면 True"""
+        with self._lock:
+            future = self._sessions.get(session)
+        if future is None:
+            return True
+        done, _ = wait_futures([future], timeout=timeout)
+        if done:
+            with self._lock:
+                if self._sessions.get(session) is future:
+                    del self._sessions[session]
+        return bool(done)
+
+    def flush(self, timeout=None) -> bool:
+        """지금까지 넣은 쓰기가 모두 끝날 때까지 기다립니다."""
+        with self._lock:
+            if self._thread is None or self._closed:
+                return True
+        marker = _Op(None, (), {}, False, None)
+        self._queue.put(marker)
+        done, _ = wait_futures([marker.future], timeout=timeout)
+        return bool(done)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout=CLOSE_TIMEOUT) -> None:
+        """남은 쓰기를 모두 저장하고 쓰기 스레드를 멈춥니다."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        if thread is None or thread.is_alive():
+            return
+        # 닫히기 직전에 끼어든 쓰기가 남았으면 여기서 바로 저장합니다.
+        while True:
+            try:
+                op = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is not _STOP:
+                self._execute([op])
+
+    # --- 쓰기 스레드 ---
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="voca-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _fill(self, pending, stopping):
+        """큐에 이미 쌓인 쓰기를 pending으로 옮깁니다. (BATCH_WINDOW가 있으면 그만큼 더 기다려요)"""
+        deadline = time.monotonic() + (0 if stopping else self.window)
+        while len(pending) < self.max_batch * 4:
+            try:
+                remaining = deadline - time.monotonic()
+                pending.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+    def _take_batch(self, pending):
+        """
+        맨 앞 쓰기와 같은 DB 파일로 가는 쓰기를 순서대로 MAX_BATCH개까지 꺼냅니다.
+        다른 DB 파일 쓰기는 제자리에 남겨 두고(사용자가 번갈아 써도 사용자별로 묶여요),
+        flush 표시나 종료 신호는 앞지르지 않아요.
+        """
+        head = pending.popleft()
+        if head.func is None:
+            return [head]
+        batch, skipped = [head], []
+        while pending and len(batch) < self.max_batch:
+            op = pending.popleft()
+            if op is _STOP or op.func is None:
+                pending.appendleft(op)
+                break
+            (batch if op.db_key == head.db_key else skipped).append(op)
+        pending.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self):
+        pending = collections.deque()
+        stopping = False
+        while True:
+            if not pending:
+                if stopping:
+                    return
+                pending.append(self._queue.get())
+            self._fill(pending, stopping)
+            if pending[0] is _STOP:
+                # 종료 신호 뒤에 들어온 쓰기까지 마저 처리하고 끝냅니다.
+                pending.popleft()
+                stopping = True
+                continue
+            self._execute(self._take_batch(pending))
+
+    def _execute(self, batch):
+        work = [op for op in batch if op.func is not None and op.future.set_running_or_notify_cancel()]
+        outcomes = []
+        if work:
+            durable = any(op.durable for op in work)
+            links = list(dict.fromkeys(op.trace_id for op in work if op.trace_id))
+            trace = tracing.start("write_behind.batch", ops=len(work), links=links) if links else None
+            try:
+                try:
+                    # 트랜잭션은 첫 쓰기의 컨텍스트에서 엽니다. (그 세션이 고른 DB를 따라가요)
+                    work[0].context.copy().run(self._commit, work, durable, outcomes, trace[0] if trace else None)
+                finally:
+                    if trace is not None:
+                        self.last_trace = tracing.finish(trace)
+            except BaseException as e:
+                # 커밋 자체가 실패하면 이 묶음의 쓰기는 모두 실패입니다.
+                with self._lock:
+                    self.stats["errors"] += len(work)
+                for op in work:
+                    op.future.set_exception(e)
+            else:
+                with self._lock:
+                    self.stats["batches"] += 1
+                    self.stats["ops"] += len(work)
+                    self.stats["largest_batch"] = max(self.stats["largest_batch"], len(work))
+                    self.stats["errors"] += sum(1 for _, _, error in outcomes if error is not None)
+                for op, value, error in outcomes:
+                    if error is not None:
+                        op.future.set_exception(error)
+                    else:
+                        op.future.set_result(value)
+        # flush() 표시는 앞의 쓰기가 모두 끝난 뒤에 풀어 줍니다.
+        for op in batch:
+            if op.func is None:
+                op.future.set_result(None)
+
+    def _commit(self, work, durable, outcomes, root):
+        attempt = 0
+        while True:
+            del outcomes[:]
+            try:
+                # 읽기 캐시를 비울지는 안에서 부르는 쓰기 함수의 transaction()이 정합니다.
+                with tracing.use(root), db_manager.transaction(invalidate=False, durable=durable):
+                    for op in work:
+                        try:
+                            # 쓰기마다 SAVEPOINT로 감싸서, 실패한 쓰기만 되돌립니다.
+                            with db_manager.transaction(invalidate=False):
+                                value = op.context.run(_call, op, root)
+                        except Exception as e:
+                            outcomes.append((op, None, e))
+                        else:
+                            outcomes.append((op, value, None))
+                return
+            except sqlite3.OperationalError as e:
+                # 잠금 때문이면 묶음 전체가 되돌려졌으니 처음부터 다시 해도 됩니다.
+                if attempt >= BUSY_RETRIES or not _is_busy(e):
+                    raise
+                with self._lock:
+                    self.stats["busy_retries"] += 1
+                time.sleep(BUSY_BACKOFF * 2 ** attempt)
+                attempt += 1
+
+
+def _call(op, root):
+    """넣은 쪽 컨텍스트에서 쓰기 하나를 실행합니다. span은 넣은 쪽 trace가 아니라 이 묶음의 trace에 붙어요."""
+    with tracing.use(root), tracing.span(
+        f"write_behind.{getattr(op.func, '__name__', 'op')}", trace_id=op.trace_id
+    ):
+        return op.func(*op.args, **op.kwargs)
+
+
+def _is_busy(error) -> bool:
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehind:
+    """프로세스에 하나뿐인 쓰기 큐를 돌려줍니다. 처음 부를 때 만들어요."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind()
+        return _writer
+
+
+def submit(func, *args, session=None, durable=False, **kwargs) -> Future:
+    return get_writer().submit(func, *args, session=session, durable=durable, **kwargs)
+
+
+def barrier(session, timeout=None) -> bool:
+    return get_writer().barrier(session, timeout)
+
+
+def flush(timeout=None) -> bool:
+    return get_writer().flush(timeout)